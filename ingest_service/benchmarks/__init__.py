@@ -0,0 +1,3 @@
+"""
+Ad-hoc performance benchmarks for the ingestion pipelines.
+"""
@@ -0,0 +1,99 @@
+"""
+Wall-clock speedup of chunked transcription against worker count.
+
+Generates a synthetic multi-minute WAV (voiced bursts separated by short
+silences), then transcribes it once sequentially and once per worker count
+with the chunked path. Run from `ingest_service/`:
+
+    python -m benchmarks.bench_chunked_transcription --minutes 12 --model tiny
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# The modules package wires up the database on import; the benchmark never
+# touches it, so any URL will do.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from benchmarks.workloads import write_synthetic_wav  # noqa: E402
+from faster_whisper import WhisperModel  # noqa: E402
+from faster_whisper.audio import decode_audio  # noqa: E402
+
+from modules.audio_chunking import SAMPLING_RATE  # noqa: E402
+from modules.transcription import transcribe_audio  # noqa: E402
+
+
+def _worker_counts(cores: int) -> list:
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--minutes", type=float, default=12.0)
+    parser.add_argument("--model", default=os.getenv("WHISPER_MODEL_SIZE", "tiny"))
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = Path(tmp) / "synthetic.wav"
+        write_synthetic_wav(wav_path, seconds=args.minutes * 60)
+        audio = decode_audio(str(wav_path), sampling_rate=SAMPLING_RATE)
+
+    results = []
+    model = WhisperModel(args.model, device="cpu", compute_type=args.compute_type)
+    started = time.perf_counter()
+    baseline = transcribe_audio(model, audio)
+    baseline_sec = time.perf_counter() - started
+    results.append({"workers": 0, "mode": "sequential", "seconds": round(baseline_sec, 2)})
+
+    for workers in _worker_counts(min(args.max_workers, cores)):
+        model = WhisperModel(
+            args.model,
+            device="cpu",
+            compute_type=args.compute_type,
+            cpu_threads=max(1, cores // workers),
+            num_workers=workers,
+        )
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            started = time.perf_counter()
+            transcript = transcribe_audio(model, audio, chunk_executor=executor)
+            elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "workers": workers,
+                "mode": "chunked",
+                "seconds": round(elapsed, 2),
+                "speedup": round(baseline_sec / elapsed, 2),
+                "duration_matches": transcript.duration_sec == baseline.duration_sec,
+            }
+        )
+
+    print(
+        json.dumps(
+            {
+                "audio_minutes": args.minutes,
+                "model": args.model,
+                "cores": cores,
+                "runs": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Throughput, latency percentiles and peak memory of every ingestion pipeline.
+
+Generates synthetic inputs with `benchmarks.workloads` (survey exports, a
+large CSV, an XLSX workbook, multi-page PDFs and short WAV recordings) and
+feeds each case through its pipeline entry point: `process_survey_file`,
+`ingest_raw_file` or `handle_audio_upload`. Every case runs in a fresh
+subprocess so its peak RSS is its own. Each iteration gets a distinct file,
+so the blob store and the transcript cache never short-circuit the work,
+and the warm-up iterations (model load, pool start-up) are left out of
+the figures.
+
+By default every case gets its own embedded SQLite database. Pass
+`--database-url` to run against a scratch PostgreSQL instead; rows are
+left behind, so give every run an empty database. `--whisper stub` (the
+default) replaces the model with one that returns fixed segments, which
+measures everything around inference. Give a model size such as `tiny`
+to include the real model. Run from `ingest_service/`:
+
+    python -m benchmarks.bench_pipelines --iterations 10 --output bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from benchmarks.workloads import (
+    SAMPLING_RATE,
+    write_synthetic_csv,
+    write_synthetic_pdf,
+    write_synthetic_survey,
+    write_synthetic_wav,
+    write_synthetic_xlsx,
+)
+
+CASES = ("survey", "csv", "xlsx", "pdf", "audio")
+# Unit in which each case's throughput is reported.
+UNITS = {
+    "survey": "rows",
+    "csv": "rows",
+    "xlsx": "rows",
+    "pdf": "pages",
+    "audio": "audio_seconds",
+}
+SUFFIXES = {"survey": ".csv", "csv": ".csv", "xlsx": ".xlsx", "pdf": ".pdf", "audio": ".wav"}
+STUB_SEGMENT_SEC = 5.0
+
+
+class StubWhisperModel:
+    """
+    Stands in for a faster-whisper model: one fixed segment per five
+    seconds of audio, without running inference.
+    """
+
+    def transcribe(self, audio, **kwargs):
+        seconds = len(audio) / SAMPLING_RATE
+        starts = [index * STUB_SEGMENT_SEC for index in range(int(seconds // STUB_SEGMENT_SEC) + 1)]
+        segments = [
+            SimpleNamespace(
+                start=start,
+                end=min(start + STUB_SEGMENT_SEC, seconds),
+                text="synthetic speech",
+                words=None,
+            )
+            for start in starts
+            if start < seconds
+        ]
+        return iter(segments), None
+
+
+def write_inputs(case: str, directory: Path, count: int, args: argparse.Namespace) -> List[int]:
+    """
+    Write `count` distinct inputs for `case` into `directory`, named so
+    they sort in run order. Returns the size of each in the case's unit.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    units = []
+    for index in range(count):
+        path = directory / f"{case}-{index:04d}{SUFFIXES[case]}"
+        if case == "survey":
+            write_synthetic_survey(path, rows=args.survey_rows, teachers=args.teachers, seed=index)
+            units.append(args.survey_rows)
+        elif case == "csv":
+            units.append(write_synthetic_csv(path, size_mb=args.csv_mb, seed=index))
+        elif case == "xlsx":
+            write_synthetic_xlsx(path, rows=args.xlsx_rows, seed=index)
+            units.append(args.xlsx_rows)
+        elif case == "pdf":
+            write_synthetic_pdf(path, pages=args.pdf_pages, seed=index)
+            units.append(args.pdf_pages)
+        else:
+            write_synthetic_wav(path, seconds=args.audio_seconds, seed=index)
+            units.append(int(args.audio_seconds))
+    return units
+
+
+async def _run_files(case: str, files: List[Path], data_dir: Path) -> List[dict]:
+    from fastapi import UploadFile
+
+    from modules.audio_module import handle_audio_upload
+    from modules.db import SessionLocal
+    from modules.raw_module import ingest_raw_file
+    from modules.survey_module import process_survey_file
+
+    results = []
+    for index, path in enumerate(files):
+        with SessionLocal() as db, path.open("rb") as handle:
+            upload = UploadFile(file=handle, filename=path.name, size=path.stat().st_size)
+            started = time.perf_counter()
+            if case == "survey":
+                # A workshop per file keeps every row out of the others'
+                # fingerprints.
+                result = await asyncio.to_thread(
+                    process_survey_file,
+                    file_path=path,
+                    filename=path.name,
+                    workshop_id=index + 1,
+                    db=db,
+                )
+            elif case == "audio":
+                result = await handle_audio_upload(upload_file=upload, db=db, base_dir=data_dir)
+            else:
+                result = await ingest_raw_file(
+                    upload_file=upload,
+                    filename=path.name,
+                    doc_type=None,
+                    teacher_id=None,
+                    workshop_id=None,
+                    db=db,
+                    base_dir=data_dir,
+                )
+            seconds = time.perf_counter() - started
+        results.append({"seconds": seconds, "errors": [error.code for error in result.errors]})
+    return results
+
+
+def run_child(case: str, input_dir: Path, data_dir: Path, whisper: str) -> List[dict]:
+    from modules import pdf_extract, transcription
+    from modules.db import Base, engine
+
+    if whisper == "stub":
+        transcription.registry.get = lambda spec: StubWhisperModel()
+    Base.metadata.create_all(bind=engine)
+    try:
+        return asyncio.run(_run_files(case, sorted(input_dir.iterdir()), data_dir))
+    finally:
+        transcription.shutdown()
+        pdf_extract.shutdown()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    `q`-th percentile (0-100) of `values`, interpolated between the two
+    closest ranks.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(
+    case: str,
+    input_dir: Path,
+    data_dir: Path,
+    units: List[int],
+    args: argparse.Namespace,
+) -> dict:
+    env = dict(os.environ, INGEST_DATA_DIR=str(data_dir), WHISPER_PRELOAD_MODELS="")
+    env.pop("DATABASE_URL", None)
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    if args.whisper == "stub":
+        # The stub only replaces the model in this process's registry.
+        env["WHISPER_POOL"] = "thread"
+    else:
+        env["WHISPER_MODEL_SIZE"] = args.whisper
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_pipelines",
+            "--child",
+            case,
+            str(input_dir),
+            str(data_dir),
+            args.whisper,
+        ],
+        stdout=subprocess.PIPE,
+        env=env,
+    )
+    output = process.stdout.read()
+    process.stdout.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{case} run failed with exit code {process.returncode}")
+
+    files = json.loads(output)[args.warmup :]
+    units = units[args.warmup :]
+    latencies = [item["seconds"] for item in files]
+    total = sum(latencies)
+    error_codes = Counter(code for item in files for code in item["errors"])
+    return {
+        "case": case,
+        "files": len(files),
+        "failed_files": sum(1 for item in files if item["errors"]),
+        "error_codes": dict(error_codes),
+        "seconds": round(total, 3),
+        "files_per_sec": round(len(files) / total, 2) if total else None,
+        "unit": UNITS[case],
+        "units_per_sec": round(sum(units) / total, 1) if total else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "mean": round(total / len(latencies) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1),
+        },
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--survey-rows", type=int, default=5_000)
+    parser.add_argument("--teachers", type=int, default=200)
+    parser.add_argument("--csv-mb", type=float, default=20.0)
+    parser.add_argument("--xlsx-rows", type=int, default=20_000)
+    parser.add_argument("--pdf-pages", type=int, default=50)
+    parser.add_argument("--audio-seconds", type=float, default=30.0)
+    parser.add_argument("--whisper", default="stub", help="'stub' or a model size such as 'tiny'.")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCH_DATABASE_URL"),
+        help="Scratch database (default: an embedded SQLite file per case).",
+    )
+    parser.add_argument("--output", type=Path, help="Also write the report to this file.")
+    parser.add_argument("--child", nargs=4, metavar=("CASE", "INPUTS", "DATA", "WHISPER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        case, input_dir, data_dir, whisper = args.child
+        print(json.dumps(run_child(case, Path(input_dir), Path(data_dir), whisper)))
+        return
+
+    cases = [case for case in args.cases.split(",") if case]
+    unknown = sorted(set(cases) - set(CASES))
+    if unknown:
+        parser.error(f"unknown case(s) {', '.join(unknown)}; use any of {', '.join(CASES)}")
+    if args.iterations < 1 or args.warmup < 0:
+        parser.error("--iterations must be at least 1 and --warmup not negative")
+
+    runs: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for case in cases:
+            input_dir = Path(tmp) / case / "inputs"
+            units = write_inputs(case, input_dir, args.warmup + args.iterations, args)
+            runs.append(measure(case, input_dir, Path(tmp) / case / "data", units, args))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": args.database_url.split(":", 1)[0] if args.database_url else "sqlite",
+        "whisper": args.whisper,
+        "iterations": args.iterations,
+        "warmup": args.warmup,
+        "params": {
+            "survey_rows": args.survey_rows,
+            "teachers": args.teachers,
+            "csv_mb": args.csv_mb,
+            "xlsx_rows": args.xlsx_rows,
+            "pdf_pages": args.pdf_pages,
+            "audio_seconds": args.audio_seconds,
+        },
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Peak memory and throughput of raw table extraction on a large CSV.
+
+Generates a synthetic CSV of roughly `--size-mb` megabytes, then extracts it
+once per mode, each in a fresh subprocess so its peak RSS is measured on its
+own: `whole` loads the file with one `pd.read_csv` and converts it to
+records (the previous behaviour), `jsonb` and `parquet` stream it through
+`table_store.extract_tables`. Run from `ingest_service/`:
+
+    python -m benchmarks.bench_raw_tables --size-mb 1024 --modes whole,jsonb,parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.workloads import write_synthetic_csv
+
+
+def run_child(mode: str, csv_path: Path, work_dir: Path) -> dict:
+    started = time.perf_counter()
+    if mode == "whole":
+        import pandas as pd
+
+        from modules.table_store import _safe_table_records
+
+        records = _safe_table_records(pd.read_csv(csv_path))
+        rows = len(records)
+    else:
+        from modules import table_store
+
+        tables = table_store.extract_tables(
+            csv_path, ".csv", work_dir / mode, storage=mode
+        )
+        rows = tables.row_count
+    return {"rows": rows, "seconds": time.perf_counter() - started}
+
+
+def measure(mode: str, csv_path: Path, work_dir: Path) -> dict:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_raw_tables", "--child", mode, str(csv_path), str(work_dir)],
+        stdout=subprocess.PIPE,
+    )
+    output = process.stdout.read()
+    process.stdout.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{mode} run failed with exit code {process.returncode}")
+    result = json.loads(output)
+    return {
+        "mode": mode,
+        "rows": result["rows"],
+        "seconds": round(result["seconds"], 2),
+        "rows_per_sec": round(result["rows"] / result["seconds"]) if result["seconds"] else None,
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=float, default=1024.0)
+    parser.add_argument("--modes", default="whole,jsonb,parquet")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "CSV", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, csv_path, work_dir = args.child
+        print(json.dumps(run_child(mode, Path(csv_path), Path(work_dir))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        csv_path = work_dir / "table.csv"
+        rows = write_synthetic_csv(csv_path, size_mb=args.size_mb)
+        report = {
+            "file_mb": round(csv_path.stat().st_size / (1024 * 1024), 1),
+            "rows": rows,
+            "runs": [
+                measure(mode, csv_path, work_dir)
+                for mode in args.modes.split(",")
+                if mode
+            ],
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
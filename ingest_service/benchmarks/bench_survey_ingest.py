@@ -0,0 +1,103 @@
+"""
+Survey ingest throughput (rows per second) against write batch size.
+
+Generates a synthetic form export where a small set of teachers repeats
+across many rows, then ingests it with `batch_size=1` (one INSERT and commit
+per row, the previous behaviour) and with each requested batch size. Every
+run starts from empty `survey_response` / `teacher` tables, so point it at a
+scratch database. Each run then ingests the same file again to time the
+re-ingest path, where every row is skipped by its fingerprint. Run from `ingest_service/`:
+
+    python -m benchmarks.bench_survey_ingest --rows 20000 --batch-sizes 1,100,500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.workloads import write_synthetic_survey
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--teachers", type=int, default=30)
+    parser.add_argument("--batch-sizes", default="1,100,500,2000")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCH_DATABASE_URL"),
+        help="Scratch database (default: a temporary SQLite file).",
+    )
+    args = parser.parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp}/bench.db"
+
+        from sqlalchemy import delete
+
+        from modules.db import Base, SessionLocal, engine
+        from modules.models_db import SurveyResponse, Teacher
+        from modules.survey_module import process_survey_file
+
+        Base.metadata.create_all(bind=engine)
+        csv_path = Path(tmp) / "survey.csv"
+        write_synthetic_survey(csv_path, rows=args.rows, teachers=args.teachers)
+
+        runs = []
+        for batch_size in batch_sizes:
+            with SessionLocal() as db:
+                db.execute(delete(SurveyResponse))
+                db.execute(delete(Teacher))
+                db.commit()
+                started = time.perf_counter()
+                result = process_survey_file(
+                    file_path=csv_path,
+                    filename=csv_path.name,
+                    workshop_id=1,
+                    db=db,
+                    batch_size=batch_size,
+                )
+                elapsed = time.perf_counter() - started
+                started = time.perf_counter()
+                again = process_survey_file(
+                    file_path=csv_path,
+                    filename=csv_path.name,
+                    workshop_id=1,
+                    db=db,
+                    batch_size=batch_size,
+                )
+                reingest_elapsed = time.perf_counter() - started
+            runs.append(
+                {
+                    "batch_size": batch_size,
+                    "seconds": round(elapsed, 2),
+                    "rows_per_sec": round(result.inserted_rows / elapsed, 1),
+                    "inserted_rows": result.inserted_rows,
+                    "errors": len(result.errors),
+                    "reingest_seconds": round(reingest_elapsed, 2),
+                    "reingest_duplicate_rows": again.duplicate_rows,
+                }
+            )
+        dialect = engine.dialect.name
+
+    baseline = next((run for run in runs if run["batch_size"] == 1), None)
+    if baseline:
+        for run in runs:
+            run["speedup"] = round(run["rows_per_sec"] / baseline["rows_per_sec"], 2)
+
+    print(
+        json.dumps(
+            {"rows": args.rows, "teachers": args.teachers, "dialect": dialect, "runs": runs},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Fuzzy teacher matching throughput against a large `teacher` table.
+
+Fills a scratch database with synthetic teachers, builds the blocking index
+(`TeacherIndex.refresh`) and looks up name variants of random teachers:
+reordered tokens, an abbreviated first name and a one-letter typo, plus
+names that should not match anyone. The same queries are then timed
+against a naive scan that scores every teacher. Run from `ingest_service/`:
+
+    python -m benchmarks.bench_teacher_matching --teachers 100000 --queries 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+FIRST_NAMES = [
+    "Jan", "Jana", "Petr", "Petra", "Eva", "Tomáš", "Lucie", "Martin", "Tereza",
+    "Jiří", "Pavel", "Marie", "Jakub", "Kateřina", "Lukáš", "Veronika", "Ondřej",
+    "Markéta", "David", "Barbora", "Michal", "Hana", "Vojtěch", "Anna", "Filip",
+]
+SYLLABLES = ["no", "vak", "dvo", "rak", "pro", "chaz", "ka", "ku", "če", "ra",
+             "svo", "bo", "da", "ma", "rek", "ho", "lub", "ze", "ver", "ný"]
+
+
+def synthetic_names(count: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < count:
+        surname = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        names.add(f"{rng.choice(FIRST_NAMES)} {surname.capitalize()}")
+    return sorted(names)
+
+
+def variant(name: str, rng: random.Random) -> str:
+    first, last = name.split(" ", 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"{last} {first}"
+    if kind == 1:
+        return f"{first[0]}. {last}"
+    position = rng.randrange(1, len(last))
+    return f"{first} {last[:position]}{rng.choice(string.ascii_lowercase)}{last[position + 1:]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--teachers", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--naive-queries", type=int, default=50)
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCH_DATABASE_URL"),
+        help="Scratch database (default: a temporary SQLite file).",
+    )
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp}/bench.db"
+
+        from sqlalchemy import delete, insert, select
+
+        from modules.db import Base, SessionLocal, engine
+        from modules.models_db import Teacher
+        from modules.teacher_matching import (
+            MATCH_THRESHOLD,
+            TeacherIndex,
+            name_tokens,
+            similarity,
+        )
+        from modules.utils import normalize_name
+
+        Base.metadata.create_all(bind=engine)
+        names = synthetic_names(args.teachers, rng)
+        with SessionLocal() as db:
+            db.execute(delete(Teacher))
+            db.execute(
+                insert(Teacher),
+                [
+                    {"full_name": name, "normalized_name": normalize_name(name)}
+                    for name in names
+                ],
+            )
+            db.commit()
+            ids = dict(db.execute(select(Teacher.normalized_name, Teacher.id)).all())
+
+            index = TeacherIndex()
+            started = time.perf_counter()
+            index.refresh(db)
+            build_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            index.refresh(db)
+            noop_refresh_ms = (time.perf_counter() - started) * 1000
+        dialect = engine.dialect.name
+
+    queries = []
+    for _ in range(args.queries):
+        source = rng.choice(names)
+        if rng.random() < 0.2:
+            queries.append((f"{rng.choice(FIRST_NAMES)} Zzz{rng.randint(0, 10**6)}", None))
+        else:
+            queries.append((variant(source, rng), ids[normalize_name(source)]))
+    normalized = [(normalize_name(query), expected) for query, expected in queries]
+
+    found = ambiguous = correct = 0
+    started = time.perf_counter()
+    for query, expected in normalized:
+        match = index.match(query)
+        if match is None:
+            continue
+        found += 1
+        if match.ambiguous:
+            ambiguous += 1
+        elif match.keys[0] == expected:
+            correct += 1
+    indexed_seconds = time.perf_counter() - started
+    candidates = sum(len(index.candidates(name_tokens(query))) for query, _ in normalized)
+
+    table = [(teacher_id, name_tokens(name)) for name, teacher_id in ids.items()]
+    sample = normalized[: args.naive_queries]
+    naive_found = 0
+    started = time.perf_counter()
+    for query, _ in sample:
+        tokens = name_tokens(query)
+        hits = [
+            teacher_id
+            for teacher_id, other in table
+            if similarity(tokens, other) >= MATCH_THRESHOLD
+        ]
+        if hits:
+            naive_found += 1
+    naive_seconds = time.perf_counter() - started
+
+    indexed_rate = len(normalized) / indexed_seconds
+    naive_rate = len(sample) / naive_seconds
+    print(
+        json.dumps(
+            {
+                "teachers": len(names),
+                "dialect": dialect,
+                "threshold": MATCH_THRESHOLD,
+                "index_build_seconds": round(build_seconds, 2),
+                "noop_refresh_ms": round(noop_refresh_ms, 2),
+                "queries": len(normalized),
+                "mean_candidates": round(candidates / len(normalized), 1),
+                "lookups_per_sec": round(indexed_rate, 1),
+                "naive_lookups_per_sec": round(naive_rate, 2),
+                # Over the first `--naive-queries` queries only.
+                "naive_matched": naive_found,
+                "speedup": round(indexed_rate / naive_rate, 1),
+                "matched": found,
+                "matched_correct": correct,
+                "ambiguous": ambiguous,
+                "expected_matches": sum(1 for _, expected in normalized if expected),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
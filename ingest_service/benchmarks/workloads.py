@@ -0,0 +1,189 @@
+"""
+Synthetic inputs for the benchmarks: survey exports, large tables, PDFs and
+WAV recordings. Every generator is seeded, so the same arguments always
+produce the same file.
+"""
+
+from __future__ import annotations
+
+import csv
+import random
+import wave
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+
+FIRST_NAMES = ["Jana", "Petr", "Eva", "Tomáš", "Lucie", "Martin", "Tereza", "Jiří"]
+LAST_NAMES = ["Nováková", "Svoboda", "Dvořák", "Černá", "Procházka", "Kučera"]
+ANSWERS = ["Strongly agree", "Agree", "Neutral", "Disagree", "Strongly disagree"]
+CITIES = ["Praha", "Brno", "Ostrava", "Plzeň", "Liberec", "Olomouc", "Zlín"]
+TABLE_HEADER = ["id", "city", "pupils", "score", "visited", "note"]
+WORDS = (
+    "lesson pupils workshop reading numbers group feedback teacher class practice "
+    "question answer project science history garden music drawing report plan"
+).split()
+SAMPLING_RATE = 16000
+
+
+def write_synthetic_survey(
+    path: Path, *, rows: int, teachers: int = 30, seed: int = 0
+) -> None:
+    """
+    Google Forms style CSV with a day-first timestamp, teacher name/email,
+    five Likert answers and a free-text comment; `teachers` distinct people
+    repeat in random order.
+    """
+    rng = random.Random(seed)
+    people = []
+    for index in range(teachers):
+        first = FIRST_NAMES[index % len(FIRST_NAMES)]
+        last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        people.append((f"{first} {last}", f"teacher{index}@school.example"))
+    started = datetime(2024, 9, 1, 8, 0, 0)
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(
+            ["Timestamp", "Teacher name", "Email"]
+            + [f"Q{number}" for number in range(1, 6)]
+            + ["Comment"]
+        )
+        for row in range(rows):
+            name, email = rng.choice(people)
+            submitted = started + timedelta(minutes=row)
+            writer.writerow(
+                [submitted.strftime("%d/%m/%Y %H:%M:%S"), name, email]
+                + [rng.choice(ANSWERS) for _ in range(5)]
+                + [f"Comment {rng.randint(0, 10_000)}"]
+            )
+
+
+def _table_rows(rng: random.Random, first_id: int, count: int) -> List[list]:
+    return [
+        [
+            first_id + offset,
+            rng.choice(CITIES),
+            rng.randint(5, 40),
+            round(rng.uniform(0, 100), 3),
+            f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            f"Visit note {rng.randint(0, 1_000_000)}",
+        ]
+        for offset in range(count)
+    ]
+
+
+def write_synthetic_csv(path: Path, *, size_mb: float, seed: int = 0) -> int:
+    """
+    CSV with an id, a city, integer and float measurements, a date and a
+    free-text note, written until the file reaches `size_mb`. Returns the
+    number of data rows.
+    """
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    rows = 0
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(TABLE_HEADER)
+        while handle.tell() < target:
+            batch = _table_rows(rng, rows, 10_000)
+            writer.writerows(batch)
+            rows += len(batch)
+    return rows
+
+
+def write_synthetic_xlsx(path: Path, *, rows: int, sheets: int = 1, seed: int = 0) -> None:
+    """
+    Workbook with `sheets` worksheets of `rows` rows each, in the columns of
+    `write_synthetic_csv`.
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    for sheet in range(sheets):
+        worksheet = workbook.create_sheet(f"Sheet{sheet + 1}")
+        worksheet.append(TABLE_HEADER)
+        for first_id in range(0, rows, 10_000):
+            for row in _table_rows(rng, first_id, min(10_000, rows - first_id)):
+                worksheet.append(row)
+    workbook.save(path)
+
+
+def _pdf_page_text(rng: random.Random, page: int, lines: int) -> Iterator[str]:
+    yield f"Workshop report page {page + 1}"
+    for _ in range(lines - 1):
+        yield " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14)))
+
+
+def write_synthetic_pdf(path: Path, *, pages: int, lines_per_page: int = 45, seed: int = 0) -> None:
+    """
+    Text-only PDF of `pages` A4 pages, each holding `lines_per_page` lines
+    of filler words in Helvetica. Written by hand so no PDF library is
+    needed to produce it.
+    """
+    rng = random.Random(seed)
+    # Objects 1-3 are the catalog, the page tree and the font; each page
+    # then takes two: the page and its content stream.
+    page_ids = [4 + 2 * page for page in range(pages)]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (" ".join(f"{page_id} 0 R" for page_id in page_ids).encode("ascii"), pages),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page, page_id in enumerate(page_ids):
+        text = " T* ".join(f"({line}) Tj" for line in _pdf_page_text(rng, page, lines_per_page))
+        stream = f"BT /F1 11 Tf 14 TL 50 790 Td {text} ET".encode("ascii")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (page_id + 1)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    with path.open("wb") as handle:
+        handle.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(handle.tell())
+            handle.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = handle.tell()
+        handle.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            handle.write(b"%010d 00000 n \n" % offset)
+        handle.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+
+
+def write_synthetic_wav(
+    path: Path, *, seconds: float, seed: int = 0, sampling_rate: int = SAMPLING_RATE
+) -> None:
+    """
+    Voice-like bursts (harmonic stack with syllable-rate amplitude modulation
+    plus noise) of 4-10 s, separated by 0.6-1.5 s of near-silence, as 16-bit
+    mono PCM.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sampling_rate)
+    parts = []
+    produced = 0
+    while produced < total:
+        burst = int(rng.uniform(4, 10) * sampling_rate)
+        t = np.arange(burst) / sampling_rate
+        pitch = rng.uniform(100, 220)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 6) * t))
+        voice = 0.3 * voice * envelope + 0.02 * rng.standard_normal(burst)
+        gap = int(rng.uniform(0.6, 1.5) * sampling_rate)
+        parts.append(voice)
+        parts.append(0.001 * rng.standard_normal(gap))
+        produced += burst + gap
+    signal = np.concatenate(parts)[:total]
+    pcm = np.clip(signal / np.max(np.abs(signal)), -1, 1)
+    with wave.open(str(path), "wb") as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(sampling_rate)
+        handle.writeframes((pcm * 32767).astype(np.int16).tobytes())
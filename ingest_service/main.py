@@ -1,33 +1,132 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
+import socket
 from pathlib import Path
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from uuid import UUID
 
-from fastapi import Depends, FastAPI, File, Form, UploadFile
+from fastapi import Depends, FastAPI, File, Form, Query, Request, Response, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from modules import audio_module, raw_module, survey_module
-from modules.db import Base, engine, get_db
+from modules import (
+    audio_jobs,
+    audio_module,
+    batch_ingest,
+    listing,
+    metrics,
+    model_registry,
+    pdf_extract,
+    progress,
+    raw_module,
+    rollups,
+    search_index,
+    survey_module,
+    table_store,
+    transcript_cache,
+    transcription,
+)
+from modules.db import Base, SessionLocal, async_engine, engine, get_async_db, get_db, pool_status
 from modules.schemas import (
     AudioResult,
+    AudioSegments,
+    AudioStatus,
+    AudioStreamEvent,
+    BatchIngestResult,
+    DbPoolStats,
+    DbPoolStatus,
     HealthResponse,
+    IngestProgressStatus,
+    ListPage,
     RawIngestResult,
+    RawTable,
+    RollupSummary,
+    SearchResults,
     SurveyIngestResult,
+    WhisperModelInfo,
+    WhisperModelsResponse,
 )
+from modules.uploads import MAX_UPLOAD_BYTES, UploadTooLarge
+from modules.utils import build_error
 
 # Ensure models are registered
 from modules import models_db  # noqa: F401
 
+logger = logging.getLogger(__name__)
+
 DATA_DIR = Path(os.getenv("INGEST_DATA_DIR", Path(__file__).resolve().parent / "data"))
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 app = FastAPI(title="Ingestion Service", version="0.1.0")
 
+_audio_workers: List[asyncio.Task] = []
+
+# Room for multipart boundaries and form fields on top of the file itself.
+_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+@app.middleware("http")
+async def _reject_oversized_uploads(request: Request, call_next):
+    """
+    Refuse uploads whose declared size is over the limit before the body is
+    spooled to disk. Chunked uploads are still capped while streaming.
+    """
+    content_length = request.headers.get("content-length")
+    # Batches carry many files; each one is still capped on its own.
+    max_bytes = (
+        batch_ingest.MAX_REQUEST_BYTES
+        if request.url.path == "/batch/ingest"
+        else MAX_UPLOAD_BYTES
+    )
+    if (
+        max_bytes
+        and content_length
+        and content_length.isdigit()
+        and int(content_length) > max_bytes + _MULTIPART_OVERHEAD_BYTES
+    ):
+        error = UploadTooLarge(max_bytes)
+        return JSONResponse(
+            status_code=413,
+            content={
+                "success": False,
+                "errors": [build_error(code=error.code, message=str(error)).model_dump()],
+            },
+        )
+    return await call_next(request)
+
 
 @app.on_event("startup")
-def _startup() -> None:
+async def _startup() -> None:
     Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        transcript_cache.invalidate(db)
+    try:
+        await transcription.warm_up()
+    except Exception:
+        # Models still load lazily on first use; don't keep the service down.
+        logger.exception("Whisper model preload failed")
+    worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for index in range(audio_jobs.JOB_WORKERS):
+        _audio_workers.append(
+            asyncio.create_task(audio_module.run_job_worker(f"{worker_prefix}:{index}"))
+        )
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    for task in _audio_workers:
+        task.cancel()
+    await asyncio.gather(*_audio_workers, return_exceptions=True)
+    _audio_workers.clear()
+    transcription.shutdown()
+    pdf_extract.shutdown()
+    await async_engine.dispose()
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -35,34 +134,302 @@ def health() -> HealthResponse:
     return HealthResponse(status="ok")
 
 
+@app.get("/metrics")
+def get_metrics() -> Response:
+    """
+    Stage latencies, error counts, throughput, queue depth and pool gauges
+    in the Prometheus text format.
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/db/pool", response_model=DbPoolStatus)
+def get_db_pool() -> DbPoolStatus:
+    """
+    Connection pool occupancy and checkout waits, for sizing pools per replica.
+    """
+    return DbPoolStatus(pools=[DbPoolStats(**stats) for stats in pool_status()])
+
+
 @app.post("/audio/upload", response_model=AudioResult)
 async def upload_audio(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
     teacher_id: Optional[int] = Form(default=None),
     workshop_id: Optional[int] = Form(default=None),
+    wait: bool = Form(default=True),
+    model_size: Optional[str] = Form(default=None),
+    compute_type: Optional[str] = Form(default=None),
+    word_timestamps: bool = Form(default=False),
     db: Session = Depends(get_db),
 ) -> AudioResult:
-    return await audio_module.handle_audio_upload(
+    with metrics.stage(metrics.PIPELINE_AUDIO, "total"):
+        result = await audio_module.handle_audio_upload(
+            upload_file=file,
+            db=db,
+            base_dir=DATA_DIR,
+            teacher_id=teacher_id,
+            workshop_id=workshop_id,
+            is_disconnected=request.is_disconnected,
+            wait=wait,
+            model_size=model_size,
+            compute_type=compute_type,
+            word_timestamps=word_timestamps,
+        )
+    metrics.count_errors(metrics.PIPELINE_AUDIO, result.errors)
+    if result.status == audio_jobs.STATUS_QUEUED:
+        response.status_code = 202
+    return result
+
+
+async def _encode_events(
+    events: AsyncIterator[AudioStreamEvent], sse: bool
+) -> AsyncIterator[str]:
+    async for event in events:
+        if event.result is not None:
+            metrics.count_errors(metrics.PIPELINE_AUDIO, event.result.errors)
+        payload = event.model_dump_json(exclude_none=True)
+        if sse:
+            yield f"event: {event.event}\ndata: {payload}\n\n"
+        else:
+            yield payload + "\n"
+
+
+@app.post("/audio/upload/stream")
+async def upload_audio_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    teacher_id: Optional[int] = Form(default=None),
+    workshop_id: Optional[int] = Form(default=None),
+    model_size: Optional[str] = Form(default=None),
+    compute_type: Optional[str] = Form(default=None),
+    word_timestamps: bool = Form(default=False),
+) -> StreamingResponse:
+    """
+    Transcribe an upload and stream segments as they are decoded, as NDJSON
+    or as server-sent events when the client accepts `text/event-stream`.
+    """
+    events = await audio_module.start_audio_stream(
         upload_file=file,
-        db=db,
         base_dir=DATA_DIR,
         teacher_id=teacher_id,
         workshop_id=workshop_id,
+        model_size=model_size,
+        compute_type=compute_type,
+        word_timestamps=word_timestamps,
+    )
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        _encode_events(events, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+    )
+
+
+@app.get("/audio/models", response_model=WhisperModelsResponse)
+def list_audio_models() -> WhisperModelsResponse:
+    registry = transcription.registry
+    response = WhisperModelsResponse(
+        pool=transcription.POOL_KIND,
+        memory_budget_mb=registry.memory_budget_mb,
+        cpu_threads=registry.cpu_threads,
+        num_workers=registry.num_workers,
+        allowed_sizes=model_registry.ALLOWED_SIZES,
+    )
+    if transcription.POOL_KIND == "process":
+        # Each worker process keeps its own registry; this process's one is
+        # always empty, so report the state as unknown rather than empty.
+        return response
+    response.resident_mb = registry.resident_mb()
+    response.loaded = [
+        WhisperModelInfo(
+            size=entry.spec.size,
+            compute_type=entry.spec.compute_type,
+            device=entry.spec.device,
+            load_seconds=entry.load_seconds,
+            resident_mb=entry.resident_mb,
+            loaded_at=entry.loaded_at,
+            last_used_at=entry.last_used_at,
+            uses=entry.uses,
+        )
+        for entry in registry.stats()
+    ]
+    return response
+
+
+async def _list_page(
+    entity: str,
+    response: Response,
+    db: AsyncSession,
+    *,
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    fields: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+) -> ListPage:
+    selected = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    try:
+        return await listing.list_rows(
+            db,
+            entity,
+            teacher_id=teacher_id,
+            workshop_id=workshop_id,
+            since=since,
+            until=until,
+            fields=selected,
+            cursor=cursor,
+            limit=limit,
+        )
+    except listing.ListQueryError as exc:
+        response.status_code = 400
+        return ListPage(
+            entity=entity,
+            errors=[build_error(code=exc.code, message=str(exc))],
+        )
+
+
+@app.get("/audio", response_model=ListPage)
+async def list_audio(
+    response: Response,
+    teacher_id: Optional[int] = Query(default=None),
+    workshop_id: Optional[int] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    fields: Optional[str] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+) -> ListPage:
+    """
+    Recordings, newest first. `fields` is a comma separated projection;
+    `transcript_text` is only returned when named there.
+    """
+    return await _list_page(
+        listing.ENTITY_AUDIO,
+        response,
+        db,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        since=since,
+        until=until,
+        fields=fields,
+        cursor=cursor,
+        limit=limit,
     )
 
 
+@app.get("/audio/{audio_id}", response_model=AudioStatus)
+async def get_audio(
+    audio_id: UUID,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+) -> AudioStatus:
+    status = await audio_module.get_audio_status(db=db, audio_id=audio_id)
+    if status is None:
+        response.status_code = 404
+        return AudioStatus(
+            audio_id=str(audio_id),
+            status="not_found",
+            errors=[
+                build_error(code="AUDIO_NOT_FOUND", message="Unknown audio id.")
+            ],
+        )
+    return status
+
+
+@app.get("/audio/{audio_id}/segments", response_model=AudioSegments)
+async def get_audio_segments(
+    audio_id: UUID,
+    response: Response,
+    start: Optional[float] = Query(default=None, ge=0),
+    end: Optional[float] = Query(default=None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+) -> AudioSegments:
+    segments = await audio_module.get_audio_segments(
+        db=db, audio_id=audio_id, start=start, end=end
+    )
+    if segments is None:
+        response.status_code = 404
+        return AudioSegments(audio_id=str(audio_id))
+    return segments
+
+
 @app.post("/survey/ingest", response_model=SurveyIngestResult)
 async def ingest_survey(
     file: UploadFile = File(...),
     workshop_id: Optional[int] = Form(default=None),
+    ingest_id: Optional[str] = Form(default=None, max_length=128),
     db: Session = Depends(get_db),
 ) -> SurveyIngestResult:
-    file_bytes = await file.read()
-    return survey_module.process_survey_file(
-        file_bytes=file_bytes,
-        filename=file.filename or "survey.csv",
+    with metrics.stage(metrics.PIPELINE_SURVEY, "total"):
+        result = await survey_module.ingest_survey_upload(
+            upload_file=file,
+            workshop_id=workshop_id,
+            db=db,
+            base_dir=DATA_DIR,
+            ingest_id=ingest_id,
+        )
+    metrics.count_errors(metrics.PIPELINE_SURVEY, result.errors)
+    return result
+
+
+@app.get("/survey/responses", response_model=ListPage)
+async def list_survey_responses(
+    response: Response,
+    teacher_id: Optional[int] = Query(default=None),
+    workshop_id: Optional[int] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    fields: Optional[str] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+) -> ListPage:
+    """
+    Survey responses by `submitted_at`, newest first, undated ones last.
+    `raw_data` and `normalized_data` are only returned when named in `fields`.
+    """
+    return await _list_page(
+        listing.ENTITY_SURVEY,
+        response,
+        db,
+        teacher_id=teacher_id,
         workshop_id=workshop_id,
-        db=db,
+        since=since,
+        until=until,
+        fields=fields,
+        cursor=cursor,
+        limit=limit,
+    )
+
+
+@app.get("/survey/progress/{ingest_id}", response_model=IngestProgressStatus)
+def get_survey_progress(ingest_id: str):
+    entry = progress.registry.get(ingest_id)
+    if entry is None or entry.kind != "survey":
+        return JSONResponse(
+            status_code=404,
+            content={
+                "errors": [
+                    build_error(
+                        code="INGEST_NOT_FOUND", message="Unknown ingest id."
+                    ).model_dump()
+                ]
+            },
+        )
+    return IngestProgressStatus(
+        ingest_id=entry.ingest_id,
+        kind=entry.kind,
+        status=entry.status,
+        rows_seen=entry.rows_seen,
+        inserted_rows=entry.inserted_rows,
+        skipped_rows=entry.skipped_rows,
+        duplicate_rows=entry.duplicate_rows,
+        started_at=entry.started_at,
+        finished_at=entry.finished_at,
     )
 
 
@@ -74,13 +441,173 @@ async def ingest_raw(
     workshop_id: Optional[int] = Form(default=None),
     db: Session = Depends(get_db),
 ) -> RawIngestResult:
-    file_bytes = await file.read()
-    return raw_module.ingest_raw_file(
-        file_bytes=file_bytes,
-        filename=file.filename or "document.bin",
-        doc_type=doc_type,
+    with metrics.stage(metrics.PIPELINE_RAW, "total"):
+        result = await raw_module.ingest_raw_file(
+            upload_file=file,
+            filename=file.filename or "document.bin",
+            doc_type=doc_type,
+            teacher_id=teacher_id,
+            workshop_id=workshop_id,
+            db=db,
+            base_dir=DATA_DIR,
+        )
+    metrics.count_errors(metrics.PIPELINE_RAW, result.errors)
+    return result
+
+
+@app.get("/raw", response_model=ListPage)
+async def list_raw_documents(
+    response: Response,
+    teacher_id: Optional[int] = Query(default=None),
+    workshop_id: Optional[int] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    fields: Optional[str] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+) -> ListPage:
+    """
+    Raw documents by upload time, newest first. `text_content`,
+    `table_data` and `table_schema` are only returned when named in `fields`.
+    """
+    return await _list_page(
+        listing.ENTITY_RAW,
+        response,
+        db,
         teacher_id=teacher_id,
         workshop_id=workshop_id,
-        db=db,
+        since=since,
+        until=until,
+        fields=fields,
+        cursor=cursor,
+        limit=limit,
+    )
+
+
+@app.get("/raw/{raw_id}/table", response_model=RawTable)
+def get_raw_table(
+    raw_id: UUID,
+    response: Response,
+    sheet: Optional[str] = Query(default=None),
+    columns: Optional[str] = Query(default=None),
+    where: List[str] = Query(default=[]),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=0, le=table_store.MAX_SLICE_ROWS),
+    db: Session = Depends(get_db),
+) -> RawTable:
+    """
+    Read a slice of a raw document's table (the first worksheet unless
+    `sheet` names another). `columns` is a comma separated
+    projection; each `where` is `column:op:value` with op in eq, ne, lt, le,
+    gt, ge, and all of them must hold.
+    """
+    selected = [name.strip() for name in columns.split(",") if name.strip()] if columns else None
+    try:
+        table = raw_module.get_raw_table(
+            db=db,
+            raw_id=raw_id,
+            sheet=sheet,
+            columns=selected,
+            filters=where,
+            offset=offset,
+            limit=limit,
+        )
+    except table_store.TableQueryError as exc:
+        response.status_code = 400
+        return RawTable(
+            raw_id=str(raw_id),
+            errors=[build_error(code=exc.code, message=str(exc))],
+        )
+    if table is None:
+        response.status_code = 404
+        return RawTable(
+            raw_id=str(raw_id),
+            errors=[build_error(code="RAW_NOT_FOUND", message="Unknown raw document id.")],
+        )
+    if table.errors:
+        response.status_code = 404
+    return table
+
+
+@app.post("/batch/ingest", response_model=BatchIngestResult)
+async def ingest_batch(
+    response: Response,
+    files: List[UploadFile] = File(...),
+    teacher_id: Optional[int] = Form(default=None),
+    workshop_id: Optional[int] = Form(default=None),
+    table_pipeline: str = Form(default=batch_ingest.PIPELINE_SURVEY),
+) -> BatchIngestResult:
+    """
+    Ingest several files, or ZIP archives of them, in one request. Each file
+    goes to the audio (queued), survey or raw pipeline by extension, with
+    its own result in `files`.
+    """
+    result = await batch_ingest.ingest_batch(
+        uploads=files,
         base_dir=DATA_DIR,
+        session_factory=SessionLocal,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        table_pipeline=table_pipeline,
     )
+    # Per-file errors are counted under each file's pipeline.
+    metrics.count_errors(metrics.PIPELINE_BATCH, result.errors)
+    if result.errors:
+        response.status_code = 400
+    return result
+
+
+@app.get("/rollups/workshop/{workshop_id}", response_model=RollupSummary)
+async def get_workshop_rollup(
+    workshop_id: int, db: AsyncSession = Depends(get_async_db)
+) -> RollupSummary:
+    """
+    Survey, recording and document totals of a workshop, read from the
+    incrementally maintained counters.
+    """
+    return await rollups.get_summary(db, rollups.SCOPE_WORKSHOP, workshop_id)
+
+
+@app.get("/rollups/teacher/{teacher_id}", response_model=RollupSummary)
+async def get_teacher_rollup(
+    teacher_id: int, db: AsyncSession = Depends(get_async_db)
+) -> RollupSummary:
+    """
+    Survey, recording and document totals of a teacher.
+    """
+    return await rollups.get_summary(db, rollups.SCOPE_TEACHER, teacher_id)
+
+
+@app.get("/search", response_model=SearchResults)
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    teacher_id: Optional[int] = Query(default=None),
+    workshop_id: Optional[int] = Query(default=None),
+    source: Optional[str] = Query(default=None),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=search_index.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+) -> SearchResults:
+    """
+    Ranked full-text search over transcripts and raw document text. Every
+    word of `q` must match, accents and case ignored. `source` is `audio`
+    or `raw`.
+    """
+    try:
+        return search_index.search(
+            db,
+            query=q,
+            teacher_id=teacher_id,
+            workshop_id=workshop_id,
+            source=source,
+            offset=offset,
+            limit=limit,
+        )
+    except search_index.SearchQueryError as exc:
+        response.status_code = 400
+        return SearchResults(
+            query=q,
+            errors=[build_error(code=exc.code, message=str(exc))],
+        )
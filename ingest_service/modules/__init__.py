@@ -2,13 +2,56 @@
 Reusable modules for the ingestion service.
 """
 
-from . import audio_module, db, models_db, raw_module, survey_module, utils
+from . import (
+    audio_chunking,
+    audio_jobs,
+    audio_module,
+    batch_ingest,
+    blob_store,
+    db,
+    listing,
+    metrics,
+    model_registry,
+    models_db,
+    pdf_extract,
+    progress,
+    raw_module,
+    rollups,
+    search_index,
+    survey_module,
+    table_readers,
+    table_store,
+    teacher_matching,
+    teacher_resolver,
+    transcript_cache,
+    transcription,
+    uploads,
+    utils,
+)
 
 __all__ = [
+    "audio_chunking",
+    "audio_jobs",
     "audio_module",
+    "batch_ingest",
+    "blob_store",
     "db",
+    "listing",
+    "metrics",
+    "model_registry",
     "models_db",
+    "pdf_extract",
+    "progress",
     "raw_module",
+    "rollups",
+    "search_index",
     "survey_module",
+    "table_readers",
+    "table_store",
+    "teacher_matching",
+    "teacher_resolver",
+    "transcript_cache",
+    "transcription",
+    "uploads",
     "utils",
 ]
@@ -0,0 +1,67 @@
+"""
+Split long recordings at silence boundaries so chunks can be transcribed in
+parallel.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List, Tuple
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+SAMPLING_RATE = 16000
+CHUNK_TARGET_SEC = float(os.getenv("WHISPER_CHUNK_TARGET_SEC", "120"))
+# Silences shorter than this are not considered as cut points.
+MIN_SILENCE_MS = int(os.getenv("WHISPER_CHUNK_MIN_SILENCE_MS", "500"))
+
+
+def _silence_midpoints(audio: np.ndarray) -> List[int]:
+    speech = get_speech_timestamps(
+        audio,
+        VadOptions(min_silence_duration_ms=MIN_SILENCE_MS, speech_pad_ms=100),
+    )
+    cuts = []
+    for previous, following in zip(speech, speech[1:]):
+        cuts.append((previous["end"] + following["start"]) // 2)
+    return cuts
+
+
+def plan_chunks(
+    audio: np.ndarray, *, target_sec: float = CHUNK_TARGET_SEC
+) -> List[Tuple[int, int]]:
+    """
+    Return `(start_sample, end_sample)` ranges covering `audio` end to end.
+
+    Each range is closed at the first silence past `target_sec`. Stretches of
+    continuous speech longer than twice the target are cut hard so a single
+    chunk cannot swallow the whole recording.
+    """
+    total = len(audio)
+    target = int(target_sec * SAMPLING_RATE)
+    if total <= target:
+        return [(0, total)]
+
+    cuts = _silence_midpoints(audio)
+    if not cuts:
+        # Nothing recognised as speech (or no gaps at all): fixed windows.
+        cuts = list(range(target, total, target))
+
+    chunks = []
+    start = 0
+    for cut in cuts:
+        while cut - start > 2 * target:
+            chunks.append((start, start + target))
+            start += target
+        if cut - start >= target:
+            chunks.append((start, cut))
+            start = cut
+    while total - start > 2 * target:
+        chunks.append((start, start + target))
+        start += target
+    if chunks and total - start < target // 4:
+        # Fold a short tail into the previous chunk.
+        start = chunks.pop()[0]
+    chunks.append((start, total))
+    return chunks
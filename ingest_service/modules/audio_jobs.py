@@ -0,0 +1,294 @@
+"""
+Persistent audio transcription queue backed by the `audio_job` table.
+
+Jobs are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` on PostgreSQL and
+with a compare-and-set `UPDATE` elsewhere, so several service replicas can
+drain the same queue. Claims hold a lease that the worker renews while it
+transcribes; jobs whose lease ran out (e.g. after a crash or restart) are
+picked up again until `AUDIO_JOB_MAX_ATTEMPTS` is reached.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import blob_store, metrics
+from .model_registry import ModelSpec
+from .models_db import AudioJob
+
+JOB_WORKERS = max(0, int(os.getenv("AUDIO_JOB_WORKERS", "1")))
+POLL_INTERVAL_SEC = float(os.getenv("AUDIO_JOB_POLL_SEC", "2"))
+LEASE_SEC = float(os.getenv("AUDIO_JOB_LEASE_SEC", "60"))
+MAX_ATTEMPTS = max(1, int(os.getenv("AUDIO_JOB_MAX_ATTEMPTS", "3")))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class ClaimedJob:
+    id: UUID
+    worker_id: str
+    audio_path: Path
+    content_sha256: Optional[str]
+    teacher_id: Optional[int]
+    workshop_id: Optional[int]
+    attempts: int
+    model_size: Optional[str]
+    compute_type: Optional[str]
+    word_timestamps: bool = False
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _owned(job_id: UUID, worker_id: str):
+    # A worker whose lease ran out may still be running; once the job was
+    # claimed again (or finished) its updates must not touch it.
+    return and_(
+        AudioJob.id == job_id,
+        AudioJob.worker_id == worker_id,
+        AudioJob.status == STATUS_RUNNING,
+    )
+
+
+def _claimable(now: datetime):
+    return and_(
+        AudioJob.attempts < MAX_ATTEMPTS,
+        or_(
+            AudioJob.status == STATUS_QUEUED,
+            and_(
+                AudioJob.status == STATUS_RUNNING,
+                AudioJob.lease_expires_at < now,
+            ),
+        ),
+    )
+
+
+def enqueue(
+    db: Session,
+    *,
+    job_id: UUID,
+    audio_path: Path,
+    content_sha256: Optional[str],
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+    spec: ModelSpec,
+    word_timestamps: bool = False,
+) -> AudioJob:
+    job = AudioJob(
+        id=job_id,
+        status=STATUS_QUEUED,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        audio_path=str(audio_path),
+        content_sha256=content_sha256,
+        model_size=spec.size,
+        compute_type=spec.compute_type,
+        word_timestamps=word_timestamps,
+        created_at=_now(),
+        attempts=0,
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def claim_next(db: Session, worker_id: str) -> Optional[ClaimedJob]:
+    """
+    Atomically move the oldest claimable job to `running` for `worker_id`.
+    """
+    now = _now()
+    claim_values = {
+        "status": STATUS_RUNNING,
+        "worker_id": worker_id,
+        "started_at": now,
+        "lease_expires_at": now + timedelta(seconds=LEASE_SEC),
+        "attempts": AudioJob.attempts + 1,
+    }
+
+    if db.get_bind().dialect.name == "postgresql":
+        job_id = db.execute(
+            select(AudioJob.id)
+            .where(_claimable(now))
+            .order_by(AudioJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job_id is None:
+            db.rollback()
+            return None
+        db.execute(update(AudioJob).where(AudioJob.id == job_id).values(**claim_values))
+    else:
+        # No row locks: pick a candidate and only take it if nobody else
+        # changed it in between. Lost races simply retry with the next one.
+        job_id = None
+        for _ in range(5):
+            candidate = db.execute(
+                select(AudioJob.id)
+                .where(_claimable(now))
+                .order_by(AudioJob.created_at)
+                .limit(1)
+            ).scalar_one_or_none()
+            if candidate is None:
+                break
+            claimed = db.execute(
+                update(AudioJob)
+                .where(AudioJob.id == candidate, _claimable(now))
+                .values(**claim_values)
+            )
+            if claimed.rowcount == 1:
+                job_id = candidate
+                break
+        if job_id is None:
+            db.rollback()
+            return None
+
+    db.commit()
+    job = db.get(AudioJob, job_id)
+    return ClaimedJob(
+        id=job.id,
+        worker_id=worker_id,
+        audio_path=Path(job.audio_path),
+        content_sha256=job.content_sha256,
+        teacher_id=job.teacher_id,
+        workshop_id=job.workshop_id,
+        attempts=job.attempts,
+        model_size=job.model_size,
+        compute_type=job.compute_type,
+        word_timestamps=bool(job.word_timestamps),
+    )
+
+
+def renew_lease(db: Session, job_id: UUID, worker_id: str) -> bool:
+    result = db.execute(
+        update(AudioJob)
+        .where(_owned(job_id, worker_id))
+        .values(lease_expires_at=_now() + timedelta(seconds=LEASE_SEC))
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def release(db: Session, job_id: UUID, worker_id: str) -> None:
+    """
+    Hand a claimed job back to the queue without counting the attempt.
+    """
+    db.execute(
+        update(AudioJob)
+        .where(_owned(job_id, worker_id))
+        .values(
+            status=STATUS_QUEUED,
+            worker_id=None,
+            lease_expires_at=None,
+            attempts=AudioJob.attempts - 1,
+        )
+    )
+    db.commit()
+
+
+def mark_done(db: Session, job_id: UUID, worker_id: str) -> bool:
+    """
+    Flag the job as done. The caller commits, together with the recording.
+    Returns False when `worker_id` no longer holds the job.
+    """
+    result = db.execute(
+        update(AudioJob)
+        .where(_owned(job_id, worker_id))
+        .values(
+            status=STATUS_DONE,
+            finished_at=_now(),
+            lease_expires_at=None,
+            error_code=None,
+            error_message=None,
+        )
+    )
+    return result.rowcount == 1
+
+
+def _release_blobs(db: Session, hashes: Iterable[Optional[str]]) -> None:
+    # A failed job never turns into a recording; drop the reference it held.
+    for sha256 in hashes:
+        if sha256:
+            blob_store.release(db, sha256)
+
+
+def mark_failed(db: Session, job_id: UUID, worker_id: str, *, code: str, message: str) -> bool:
+    """
+    Flag the job as failed and release its blob. Returns False, and leaves
+    the job and its blob alone, when `worker_id` no longer holds the job.
+    """
+    hashes = db.execute(
+        update(AudioJob)
+        .where(_owned(job_id, worker_id))
+        .values(
+            status=STATUS_FAILED,
+            finished_at=_now(),
+            lease_expires_at=None,
+            error_code=code,
+            error_message=message,
+        )
+        .returning(AudioJob.content_sha256)
+    ).scalars().all()
+    _release_blobs(db, hashes)
+    db.commit()
+    if not hashes:
+        return False
+    metrics.count_error(metrics.PIPELINE_AUDIO, code)
+    return True
+
+
+def fail_exhausted(db: Session) -> int:
+    """
+    Fail jobs that lost their lease after using up every attempt, and
+    release their blobs.
+    """
+    hashes = db.execute(
+        update(AudioJob)
+        .where(
+            AudioJob.status == STATUS_RUNNING,
+            AudioJob.lease_expires_at < _now(),
+            AudioJob.attempts >= MAX_ATTEMPTS,
+        )
+        .values(
+            status=STATUS_FAILED,
+            finished_at=_now(),
+            lease_expires_at=None,
+            error_code="AUDIO_JOB_ABANDONED",
+            error_message=f"Worker lease expired after {MAX_ATTEMPTS} attempts.",
+        )
+        .returning(AudioJob.content_sha256)
+    ).scalars().all()
+    _release_blobs(db, hashes)
+    db.commit()
+    return len(hashes)
+
+
+def count_active(db: Session) -> Dict[str, int]:
+    """
+    Number of queued and running jobs.
+    """
+    counts = {STATUS_QUEUED: 0, STATUS_RUNNING: 0}
+    rows = db.execute(
+        select(AudioJob.status, func.count())
+        .where(AudioJob.status.in_(list(counts)))
+        .group_by(AudioJob.status)
+    )
+    counts.update({status: count for status, count in rows})
+    return counts
+
+
+async def get_job(db: AsyncSession, job_id: UUID) -> Optional[AudioJob]:
+    return await db.get(AudioJob, job_id)
@@ -5,38 +5,141 @@ Audio ingestion logic that stores files and runs local Whisper transcription.
 from __future__ import annotations
 
 import asyncio
-import os
+import logging
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
-from uuid import uuid4
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
 
 from fastapi import UploadFile
-from faster_whisper import WhisperModel
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .models_db import AudioRecording
-from .schemas import ApiError, AudioResult
+from . import (
+    audio_jobs,
+    blob_store,
+    metrics,
+    rollups,
+    search_index,
+    transcript_cache,
+    transcription,
+)
+from .db import SessionLocal
+from .model_registry import ModelNotAllowed, ModelSpec, resolve_spec
+from .models_db import AudioRecording, TranscriptSegment
+from .schemas import (
+    ApiError,
+    AudioResult,
+    AudioSegments,
+    AudioStatus,
+    AudioStreamEvent,
+    TranscriptSegmentOut,
+)
+from .uploads import StoredUpload, UploadTooLarge
 from .utils import build_error
 
-_model_lock = asyncio.Lock()
-_whisper_model: Optional[WhisperModel] = None
+logger = logging.getLogger(__name__)
 
+# Whisper never emits segments longer than its 30 s window, which bounds how
+# far before a requested range an overlapping segment can start.
+MAX_SEGMENT_SEC = 30.0
 
-async def _get_model() -> WhisperModel:
-    global _whisper_model
-    if _whisper_model is None:
-        async with _model_lock:
-            if _whisper_model is None:
-                model_name = os.getenv("WHISPER_MODEL_SIZE", "tiny")
-                device = os.getenv("WHISPER_DEVICE", "cpu")
-                compute_type = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
-                _whisper_model = WhisperModel(
-                    model_name,
-                    device=device,
-                    compute_type=compute_type,
-                )
-    return _whisper_model
+
+def _add_recording(
+    db: Session,
+    *,
+    audio_id: UUID,
+    audio_path: Path,
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+    transcript_text: str,
+    duration_sec: Optional[int],
+    content_sha256: Optional[str],
+    segments: Sequence[transcription.Segment] = (),
+) -> AudioRecording:
+    recording = AudioRecording(
+        id=audio_id,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        created_at=datetime.now(timezone.utc),
+        audio_path=str(audio_path),
+        transcript_text=transcript_text,
+        duration_sec=duration_sec,
+        content_sha256=content_sha256,
+    )
+    db.add(recording)
+    search_index.index_document(
+        db,
+        source=search_index.SOURCE_AUDIO,
+        source_id=audio_id,
+        text_content=transcript_text,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        created_at=recording.created_at,
+    )
+    rollups.record_recording(
+        db,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        transcript_text=transcript_text,
+        duration_sec=duration_sec,
+    )
+    if segments:
+        # The recording row must exist before its segments reference it.
+        db.flush()
+        db.execute(
+            insert(TranscriptSegment),
+            [
+                {
+                    "audio_id": audio_id,
+                    "seq": seq,
+                    "start_sec": segment.start,
+                    "end_sec": segment.end,
+                    "text": segment.text,
+                    "words": segment.words,
+                }
+                for seq, segment in enumerate(segments)
+            ],
+        )
+    return recording
+
+
+def _segment_out(seq: int, segment: transcription.Segment) -> TranscriptSegmentOut:
+    return TranscriptSegmentOut(
+        seq=seq,
+        start=segment.start,
+        end=segment.end,
+        text=segment.text,
+        words=segment.words,
+    )
+
+
+async def _save_audio(
+    upload_file: UploadFile,
+    *,
+    base_dir: Path,
+    model_size: Optional[str],
+    compute_type: Optional[str],
+) -> Tuple[Optional[ModelSpec], Optional[StoredUpload], List[ApiError]]:
+    """
+    Validate the model choice and store the upload in the blob store.
+    """
+    try:
+        spec = resolve_spec(model_size, compute_type)
+    except ModelNotAllowed as exc:
+        return None, None, [build_error(code=exc.code, message=str(exc))]
+
+    try:
+        with metrics.stage(metrics.PIPELINE_AUDIO, "save"):
+            stored = await blob_store.store_upload(upload_file, base_dir)
+    except UploadTooLarge as exc:
+        return spec, None, [build_error(code=exc.code, message=str(exc))]
+    except Exception as exc:
+        return spec, None, [
+            build_error(code="AUDIO_SAVE_ERROR", message=f"Failed to save audio: {exc}")
+        ]
+    return spec, stored, []
 
 
 async def handle_audio_upload(
@@ -46,42 +149,116 @@ async def handle_audio_upload(
     base_dir: Path,
     teacher_id: Optional[int] = None,
     workshop_id: Optional[int] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    wait: bool = True,
+    model_size: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    word_timestamps: bool = False,
 ) -> AudioResult:
+    """
+    Store an upload and transcribe it. With `wait=False` the file is queued
+    for the background workers and the result only carries the job id.
+    `model_size`/`compute_type` pick a registry model instead of the default.
+    """
     audio_id = uuid4()
-    suffix = Path(upload_file.filename or "audio").suffix or ".wav"
-    dest_dir = base_dir / "audio"
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    dest_path = dest_dir / f"{audio_id}{suffix}"
+    spec, stored, errors = await _save_audio(
+        upload_file,
+        base_dir=base_dir,
+        model_size=model_size,
+        compute_type=compute_type,
+    )
+    if errors:
+        return AudioResult(success=False, audio_id=str(audio_id), errors=errors)
 
-    errors: list[ApiError] = []
+    if not wait:
 
-    try:
-        file_bytes = await upload_file.read()
-        dest_path.write_bytes(file_bytes)
-    except Exception as exc:
-        errors.append(
-            build_error(code="AUDIO_SAVE_ERROR", message=f"Failed to save audio: {exc}")
-        )
+        def queue() -> None:
+            # The job and the recording it turns into share this reference.
+            blob_store.acquire(db, stored)
+            audio_jobs.enqueue(
+                db,
+                job_id=audio_id,
+                audio_path=stored.path,
+                content_sha256=stored.sha256,
+                teacher_id=teacher_id,
+                workshop_id=workshop_id,
+                spec=spec,
+                word_timestamps=word_timestamps,
+            )
+
+        try:
+            with metrics.stage(metrics.PIPELINE_AUDIO, "enqueue"):
+                await asyncio.to_thread(queue)
+        except Exception as exc:
+            db.rollback()
+            await asyncio.to_thread(blob_store.discard, db, stored)
+            errors.append(
+                build_error(code="AUDIO_DB_ERROR", message=f"Failed to queue audio: {exc}")
+            )
+            return AudioResult(success=False, audio_id=str(audio_id), errors=errors)
         return AudioResult(
-            success=False, audio_id=str(audio_id), transcript_length=0, errors=errors
+            success=True, audio_id=str(audio_id), status=audio_jobs.STATUS_QUEUED
         )
 
-    transcript_text = ""
-    duration_sec: Optional[int] = None
+    return await _transcribe_and_store(
+        db,
+        audio_id=audio_id,
+        stored=stored,
+        spec=spec,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        is_disconnected=is_disconnected,
+        word_timestamps=word_timestamps,
+    )
+
+
+async def _transcribe_and_store(
+    db: Session,
+    *,
+    audio_id: UUID,
+    stored: StoredUpload,
+    spec: ModelSpec,
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    word_timestamps: bool = False,
+    on_segment: Optional[transcription.SegmentCallback] = None,
+) -> AudioResult:
+    errors: list[ApiError] = []
+    transcript = transcription.Transcript(text="", duration_sec=None)
+
+    try:
+        with metrics.stage(metrics.PIPELINE_AUDIO, "cache_lookup"):
+            cached = await asyncio.to_thread(
+                transcript_cache.lookup, db, stored.sha256, spec, word_timestamps
+            )
+    except Exception:
+        # The cache is an optimisation; fall back to transcribing.
+        db.rollback()
+        cached = None
+
+    emitted = 0
+
+    def emit(segment: transcription.Segment) -> None:
+        nonlocal emitted
+        emitted += 1
+        on_segment(segment)
 
     try:
-        model = await _get_model()
-        segments, info = model.transcribe(
-            str(dest_path),
-            language=os.getenv("WHISPER_LANG", "cs"),
-            beam_size=5,
-        )
-        transcript_chunks = []
-        for segment in segments:
-            transcript_chunks.append(segment.text.strip())
-        transcript_text = " ".join(chunk for chunk in transcript_chunks if chunk)
-        if info and info.duration:
-            duration_sec = int(info.duration)
+        transcript = cached or await transcript_cache.share_in_flight(
+            stored.sha256,
+            spec,
+            lambda: transcription.transcribe(
+                stored.path,
+                spec=spec,
+                word_timestamps=word_timestamps,
+                on_segment=emit if on_segment is not None else None,
+                is_disconnected=is_disconnected,
+            ),
+            word_timestamps=word_timestamps,
+        )
+    except transcription.TranscriptionError as exc:
+        errors.append(build_error(code=exc.code, message=str(exc)))
     except Exception as exc:
         errors.append(
             build_error(
@@ -89,29 +266,49 @@ async def handle_audio_upload(
                 message=str(exc),
             )
         )
-        transcript_text = ""
 
-    try:
-        recording = AudioRecording(
-            id=audio_id,
+    if on_segment is not None:
+        # Cache hits and shared transcriptions did not stream anything yet.
+        for segment in transcript.segments[emitted:]:
+            on_segment(segment)
+
+    def save() -> None:
+        _add_recording(
+            db,
+            audio_id=audio_id,
+            audio_path=stored.path,
             teacher_id=teacher_id,
             workshop_id=workshop_id,
-            created_at=datetime.now(timezone.utc),
-            audio_path=str(dest_path),
-            transcript_text=transcript_text,
-            duration_sec=duration_sec,
+            transcript_text=transcript.text,
+            duration_sec=transcript.duration_sec,
+            content_sha256=stored.sha256,
+            segments=transcript.segments,
         )
-        db.add(recording)
+        blob_store.acquire(db, stored)
+        if not errors:
+            transcript_cache.record(
+                db,
+                content_sha256=stored.sha256,
+                audio_id=audio_id,
+                hit=cached is not None,
+                spec=spec,
+                word_timestamps=word_timestamps,
+            )
         db.commit()
+
+    try:
+        with metrics.stage(metrics.PIPELINE_AUDIO, "db_commit"):
+            await asyncio.to_thread(save)
     except Exception as exc:
         db.rollback()
+        await asyncio.to_thread(blob_store.discard, db, stored)
         errors.append(
             build_error(code="AUDIO_DB_ERROR", message=f"Failed to store audio: {exc}")
         )
         return AudioResult(
             success=False,
             audio_id=str(audio_id),
-            transcript_length=len(transcript_text),
+            transcript_length=len(transcript.text),
             errors=errors,
         )
 
@@ -119,6 +316,320 @@ async def handle_audio_upload(
     return AudioResult(
         success=success,
         audio_id=str(audio_id),
-        transcript_length=len(transcript_text),
+        transcript_length=len(transcript.text),
+        segment_count=len(transcript.segments),
+        cached=cached is not None,
         errors=errors,
     )
+
+
+async def start_audio_stream(
+    *,
+    upload_file: UploadFile,
+    base_dir: Path,
+    teacher_id: Optional[int] = None,
+    workshop_id: Optional[int] = None,
+    model_size: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    word_timestamps: bool = False,
+) -> AsyncIterator[AudioStreamEvent]:
+    """
+    Store an upload, then return an iterator that yields a `segment` event
+    per decoded segment and a closing `result` event.
+
+    The upload is saved before returning because the request body is gone
+    once the streaming response starts. The iterator uses its own session.
+    """
+    audio_id = uuid4()
+    spec, stored, errors = await _save_audio(
+        upload_file,
+        base_dir=base_dir,
+        model_size=model_size,
+        compute_type=compute_type,
+    )
+    if errors:
+        return _single_event(
+            AudioResult(success=False, audio_id=str(audio_id), errors=errors)
+        )
+    return _stream_events(
+        audio_id=audio_id,
+        stored=stored,
+        spec=spec,
+        teacher_id=teacher_id,
+        workshop_id=workshop_id,
+        word_timestamps=word_timestamps,
+    )
+
+
+async def _single_event(result: AudioResult) -> AsyncIterator[AudioStreamEvent]:
+    yield AudioStreamEvent(event="result", result=result)
+
+
+async def _stream_events(
+    *,
+    audio_id: UUID,
+    stored: StoredUpload,
+    spec: ModelSpec,
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+    word_timestamps: bool,
+) -> AsyncIterator[AudioStreamEvent]:
+    queue: "asyncio.Queue[Optional[transcription.Segment]]" = asyncio.Queue()
+    with SessionLocal() as db:
+        task = asyncio.create_task(
+            _transcribe_and_store(
+                db,
+                audio_id=audio_id,
+                stored=stored,
+                spec=spec,
+                teacher_id=teacher_id,
+                workshop_id=workshop_id,
+                word_timestamps=word_timestamps,
+                on_segment=queue.put_nowait,
+            )
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            seq = 0
+            while True:
+                segment = await queue.get()
+                if segment is None:
+                    break
+                yield AudioStreamEvent(event="segment", segment=_segment_out(seq, segment))
+                seq += 1
+            yield AudioStreamEvent(event="result", result=task.result())
+        finally:
+            # The client went away mid-stream: stop the transcription too.
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+
+async def get_audio_status(*, db: AsyncSession, audio_id: UUID) -> Optional[AudioStatus]:
+    """
+    Report job state and, once available, the transcript for `audio_id`.
+    """
+    job = await audio_jobs.get_job(db, audio_id)
+    recording = await db.get(AudioRecording, audio_id)
+    if job is None and recording is None:
+        return None
+
+    status = AudioStatus(
+        audio_id=str(audio_id),
+        status=job.status if job is not None else audio_jobs.STATUS_DONE,
+        attempts=job.attempts if job is not None else 0,
+    )
+    if recording is not None:
+        status.transcript_text = recording.transcript_text
+        status.transcript_length = len(recording.transcript_text)
+        status.duration_sec = recording.duration_sec
+    if job is not None and job.error_code:
+        status.errors.append(
+            build_error(code=job.error_code, message=job.error_message or "")
+        )
+    return status
+
+
+async def get_audio_segments(
+    *,
+    db: AsyncSession,
+    audio_id: UUID,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Optional[AudioSegments]:
+    """
+    Segments of `audio_id` overlapping `[start, end)` seconds, in order.
+    """
+    known = await db.scalar(select(AudioRecording.id).where(AudioRecording.id == audio_id))
+    if known is None:
+        return None
+
+    query = select(TranscriptSegment).where(TranscriptSegment.audio_id == audio_id)
+    if start is not None:
+        query = query.where(
+            TranscriptSegment.start_sec >= start - MAX_SEGMENT_SEC,
+            TranscriptSegment.end_sec > start,
+        )
+    if end is not None:
+        query = query.where(TranscriptSegment.start_sec < end)
+    rows = (await db.execute(query.order_by(TranscriptSegment.start_sec))).scalars()
+    return AudioSegments(
+        audio_id=str(audio_id),
+        start=start,
+        end=end,
+        segments=[
+            TranscriptSegmentOut(
+                seq=row.seq,
+                start=row.start_sec,
+                end=row.end_sec,
+                text=row.text,
+                words=row.words,
+            )
+            for row in rows
+        ],
+    )
+
+
+def _with_session(func: Callable, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+def _finish_job(
+    db: Session,
+    job: audio_jobs.ClaimedJob,
+    spec: ModelSpec,
+    transcript: transcription.Transcript,
+    cache_hit: bool,
+) -> None:
+    try:
+        with metrics.stage(metrics.PIPELINE_AUDIO, "db_commit"):
+            if not audio_jobs.mark_done(db, job.id, job.worker_id):
+                # Our lease ran out and another worker owns (or finished)
+                # the job; its result wins.
+                db.rollback()
+                logger.warning("Audio job %s was taken over; dropping our result", job.id)
+                return
+            _add_recording(
+                db,
+                audio_id=job.id,
+                audio_path=job.audio_path,
+                teacher_id=job.teacher_id,
+                workshop_id=job.workshop_id,
+                transcript_text=transcript.text,
+                duration_sec=transcript.duration_sec,
+                content_sha256=job.content_sha256,
+                segments=transcript.segments,
+            )
+            transcript_cache.record(
+                db,
+                content_sha256=job.content_sha256,
+                audio_id=job.id,
+                hit=cache_hit,
+                spec=spec,
+                word_timestamps=job.word_timestamps,
+            )
+            db.commit()
+    except Exception as exc:
+        db.rollback()
+        audio_jobs.mark_failed(
+            db,
+            job.id,
+            job.worker_id,
+            code="AUDIO_DB_ERROR",
+            message=f"Failed to store audio: {exc}",
+        )
+
+
+async def _keep_lease(job_id: UUID, worker_id: str, lost: asyncio.Event) -> None:
+    """
+    Renew the job's lease until cancelled. Sets `lost` and stops once
+    another worker has taken the job over.
+    """
+    while True:
+        await asyncio.sleep(audio_jobs.LEASE_SEC / 3)
+        try:
+            renewed = await asyncio.to_thread(
+                _with_session, audio_jobs.renew_lease, job_id, worker_id
+            )
+        except Exception:
+            logger.exception("Failed to renew lease for audio job %s", job_id)
+            continue
+        if not renewed:
+            logger.warning("Lost the lease on audio job %s; stopping", job_id)
+            lost.set()
+            return
+
+
+async def _run_job(job: audio_jobs.ClaimedJob, worker_id: str) -> None:
+    try:
+        spec = resolve_spec(job.model_size, job.compute_type)
+    except ModelNotAllowed as exc:
+        await asyncio.to_thread(
+            _with_session,
+            audio_jobs.mark_failed,
+            job.id,
+            worker_id,
+            code=exc.code,
+            message=str(exc),
+        )
+        return
+
+    cached = await asyncio.to_thread(
+        _with_session,
+        transcript_cache.lookup,
+        job.content_sha256,
+        spec,
+        job.word_timestamps,
+    )
+    if cached is not None:
+        await asyncio.to_thread(_with_session, _finish_job, job, spec, cached, True)
+        return
+
+    lease_lost = asyncio.Event()
+    heartbeat = asyncio.create_task(_keep_lease(job.id, worker_id, lease_lost))
+
+    async def _lease_lost() -> bool:
+        return lease_lost.is_set()
+
+    try:
+        transcript = await transcript_cache.share_in_flight(
+            job.content_sha256,
+            spec,
+            lambda: transcription.transcribe(
+                job.audio_path,
+                spec=spec,
+                word_timestamps=job.word_timestamps,
+                is_disconnected=_lease_lost,
+            ),
+            word_timestamps=job.word_timestamps,
+        )
+    except transcription.TranscriptionQueueFull:
+        # Synchronous uploads saturated the pool; give the job back and retry later.
+        await asyncio.to_thread(_with_session, audio_jobs.release, job.id, worker_id)
+        await asyncio.sleep(audio_jobs.POLL_INTERVAL_SEC)
+        return
+    except Exception as exc:
+        if lease_lost.is_set():
+            # Whoever holds the job now reports its outcome.
+            return
+        code = (
+            exc.code
+            if isinstance(exc, transcription.TranscriptionError)
+            else "AUDIO_TRANSCRIBE_ERROR"
+        )
+        await asyncio.to_thread(
+            _with_session,
+            audio_jobs.mark_failed,
+            job.id,
+            worker_id,
+            code=code,
+            message=str(exc),
+        )
+        return
+    finally:
+        heartbeat.cancel()
+
+    await asyncio.to_thread(_with_session, _finish_job, job, spec, transcript, False)
+
+
+async def run_job_worker(worker_id: str) -> None:
+    """
+    Background loop that drains the `audio_job` queue until cancelled.
+    """
+    while True:
+        try:
+            job = await asyncio.to_thread(_with_session, audio_jobs.claim_next, worker_id)
+            if job is None:
+                await asyncio.to_thread(_with_session, audio_jobs.fail_exhausted)
+                await asyncio.sleep(audio_jobs.POLL_INTERVAL_SEC)
+                continue
+            await _run_job(job, worker_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Audio job worker %s failed; backing off", worker_id)
+            await asyncio.sleep(audio_jobs.POLL_INTERVAL_SEC)
@@ -0,0 +1,251 @@
+"""
+Batch ingestion of many files, uploaded side by side or inside ZIP archives.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import zipfile
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Callable, List, Optional, Sequence
+
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import audio_module, metrics, raw_module, survey_module
+from .schemas import ApiError, BatchFileResult, BatchIngestResult
+from .uploads import MAX_UPLOAD_BYTES
+from .utils import build_error
+
+CONCURRENCY = max(1, int(os.getenv("BATCH_INGEST_CONCURRENCY", "4")))
+MAX_FILES = max(1, int(os.getenv("BATCH_INGEST_MAX_FILES", "1000")))
+# Whole request; each file inside is still held to INGEST_MAX_UPLOAD_MB.
+MAX_REQUEST_BYTES = int(os.getenv("BATCH_INGEST_MAX_MB", "8192")) * 1024 * 1024
+
+PIPELINE_AUDIO = "audio"
+PIPELINE_SURVEY = "survey"
+PIPELINE_RAW = "raw"
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".oga", ".opus", ".flac", ".aac", ".webm"}
+TABLE_EXTENSIONS = {".csv", ".xlsx", ".xls", ".json"}
+ARCHIVE_EXTENSIONS = {".zip"}
+
+
+class TooManyFiles(ValueError):
+    code = "BATCH_TOO_MANY_FILES"
+
+    def __init__(self, max_files: int) -> None:
+        super().__init__(f"Batch holds more than {max_files} files.")
+
+
+@dataclass
+class _Entry:
+    filename: str
+    # Opens the entry as an `UploadFile`; called once a worker slot is free.
+    open: Optional[Callable[[], UploadFile]] = None
+    size: Optional[int] = None
+    # Set instead of `open` for files that cannot be ingested at all.
+    error: Optional[ApiError] = None
+
+
+def route(filename: str, table_pipeline: str = PIPELINE_SURVEY) -> str:
+    suffix = Path(filename).suffix.lower()
+    if suffix in AUDIO_EXTENSIONS:
+        return PIPELINE_AUDIO
+    if suffix in TABLE_EXTENSIONS:
+        return table_pipeline
+    return PIPELINE_RAW
+
+
+def _skip_member(info: zipfile.ZipInfo) -> bool:
+    path = PurePosixPath(info.filename)
+    return (
+        info.is_dir()
+        or path.parts[0] == "__MACOSX"
+        or any(part.startswith(".") for part in path.parts)
+    )
+
+
+def _archive_entries(archive: zipfile.ZipFile) -> List[_Entry]:
+    def opener(info: zipfile.ZipInfo) -> Callable[[], UploadFile]:
+        return lambda: UploadFile(
+            file=archive.open(info),
+            filename=PurePosixPath(info.filename).name,
+            size=info.file_size,
+        )
+
+    return [
+        _Entry(filename=info.filename, open=opener(info), size=info.file_size)
+        for info in archive.infolist()
+        if not _skip_member(info)
+    ]
+
+
+async def _ingest_one(
+    entry: _Entry,
+    *,
+    pipeline: str,
+    base_dir: Path,
+    session_factory: Callable[[], Session],
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+) -> BatchFileResult:
+    result = BatchFileResult(filename=entry.filename, pipeline=pipeline, success=False)
+    if entry.error is not None:
+        result.errors.append(entry.error)
+        return result
+    try:
+        upload = entry.open()
+    except Exception as exc:
+        result.errors.append(
+            build_error(code="BATCH_READ_ERROR", message=f"Failed to read entry: {exc}")
+        )
+        return result
+
+    # Each file gets its own session and transaction, so one bad file does
+    # not roll back the others.
+    with closing(upload.file), session_factory() as db:
+        if pipeline == PIPELINE_AUDIO:
+            audio = await audio_module.handle_audio_upload(
+                upload_file=upload,
+                db=db,
+                base_dir=base_dir,
+                teacher_id=teacher_id,
+                workshop_id=workshop_id,
+                wait=False,
+            )
+            result.audio = audio
+            result.id = audio.audio_id
+            result.success = audio.success
+            result.errors = audio.errors
+        elif pipeline == PIPELINE_SURVEY:
+            survey = await survey_module.ingest_survey_upload(
+                upload_file=upload,
+                workshop_id=workshop_id,
+                db=db,
+                base_dir=base_dir,
+            )
+            result.survey = survey
+            result.id = survey.ingest_id
+            result.success = survey.success
+            result.errors = survey.errors
+        else:
+            raw = await raw_module.ingest_raw_file(
+                upload_file=upload,
+                filename=upload.filename or "document.bin",
+                doc_type=None,
+                teacher_id=teacher_id,
+                workshop_id=workshop_id,
+                db=db,
+                base_dir=base_dir,
+            )
+            result.raw = raw
+            result.id = raw.raw_id
+            result.success = raw.success
+            result.errors = raw.errors
+    metrics.count_errors(pipeline, result.errors)
+    return result
+
+
+async def ingest_batch(
+    *,
+    uploads: Sequence[UploadFile],
+    base_dir: Path,
+    session_factory: Callable[[], Session],
+    teacher_id: Optional[int] = None,
+    workshop_id: Optional[int] = None,
+    table_pipeline: str = PIPELINE_SURVEY,
+    concurrency: int = CONCURRENCY,
+    max_files: int = MAX_FILES,
+) -> BatchIngestResult:
+    """
+    Route every uploaded file, and every member of uploaded ZIP archives, to
+    the audio, survey or raw pipeline by extension and run up to
+    `concurrency` of them at a time. Audio is queued for the background
+    workers. CSV/XLSX/JSON go to `table_pipeline` ("survey" or "raw").
+    Archive members are streamed from the archive, never unpacked whole.
+    """
+    result = BatchIngestResult(success=False)
+    if table_pipeline not in {PIPELINE_SURVEY, PIPELINE_RAW}:
+        result.errors.append(
+            build_error(
+                code="BATCH_BAD_REQUEST",
+                message="table_pipeline must be 'survey' or 'raw'.",
+            )
+        )
+        return result
+
+    entries: List[_Entry] = []
+    archives: List[zipfile.ZipFile] = []
+    try:
+        for upload in uploads:
+            filename = upload.filename or "upload.bin"
+            if Path(filename).suffix.lower() not in ARCHIVE_EXTENSIONS:
+                entries.append(_Entry(filename=filename, open=lambda upload=upload: upload))
+                continue
+            try:
+                await upload.seek(0)
+                archive = await run_in_threadpool(zipfile.ZipFile, upload.file)
+            except (zipfile.BadZipFile, OSError) as exc:
+                entries.append(
+                    _Entry(
+                        filename=filename,
+                        error=build_error(
+                            code="BATCH_BAD_ARCHIVE", message=f"Unreadable ZIP: {exc}"
+                        ),
+                    )
+                )
+                continue
+            archives.append(archive)
+            for member in _archive_entries(archive):
+                if MAX_UPLOAD_BYTES and member.size > MAX_UPLOAD_BYTES:
+                    # Refused from the declared size, before anything is inflated.
+                    member.open = None
+                    member.error = build_error(
+                        code="UPLOAD_TOO_LARGE",
+                        message=f"Entry exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit.",
+                    )
+                entries.append(member)
+        if len(entries) > max_files:
+            raise TooManyFiles(max_files)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(entry: _Entry) -> BatchFileResult:
+            pipeline = route(entry.filename, table_pipeline)
+            async with semaphore:
+                try:
+                    return await _ingest_one(
+                        entry,
+                        pipeline=pipeline,
+                        base_dir=base_dir,
+                        session_factory=session_factory,
+                        teacher_id=teacher_id,
+                        workshop_id=workshop_id,
+                    )
+                except Exception as exc:
+                    return BatchFileResult(
+                        filename=entry.filename,
+                        pipeline=pipeline,
+                        success=False,
+                        errors=[build_error(code="BATCH_INGEST_ERROR", message=str(exc))],
+                    )
+
+        files = list(await asyncio.gather(*(run(entry) for entry in entries)))
+    except TooManyFiles as exc:
+        result.errors.append(build_error(code=exc.code, message=str(exc)))
+        return result
+    finally:
+        for archive in archives:
+            archive.close()
+
+    result.files = files
+    result.file_count = len(result.files)
+    result.succeeded = sum(1 for item in result.files if item.success)
+    result.failed = result.file_count - result.succeeded
+    result.success = result.failed == 0
+    return result
@@ -0,0 +1,192 @@
+"""
+Content-addressed, deduplicated storage for uploaded files.
+
+Each distinct file is kept once under `blobs/<aa>/<bb>/<sha256>`, where
+`aa`/`bb` are the first two byte pairs of its hash, so no directory grows
+past a few hundred entries. Uploads are streamed to `blobs/tmp` first and
+renamed into place, so a blob path never exposes a partially written file.
+The `blob` table counts the rows that point at each file, and
+`python -m modules.blob_store gc` deletes the files nothing points at.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+from uuid import uuid4
+
+from fastapi import UploadFile
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .db import dialect_insert
+from .models_db import Blob
+from .uploads import MAX_UPLOAD_BYTES, StoredUpload, save_upload
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = "blobs"
+# Untracked files younger than this may belong to an upload still in flight.
+GC_MIN_AGE_SEC = 3600
+GC_LOOKUP_CHUNK = 500
+
+
+def blob_root(base_dir: Path) -> Path:
+    return base_dir / BLOB_DIR
+
+
+def blob_path(base_dir: Path, sha256: str) -> Path:
+    return blob_root(base_dir) / sha256[:2] / sha256[2:4] / sha256
+
+
+def _move_into_place(stored: StoredUpload, base_dir: Path) -> StoredUpload:
+    dest = blob_path(base_dir, stored.sha256)
+    if dest.exists():
+        # Same content is already stored; keep the existing file.
+        stored.path.unlink(missing_ok=True)
+    else:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(stored.path, dest)
+    return StoredUpload(path=dest, size_bytes=stored.size_bytes, sha256=stored.sha256)
+
+
+async def store_upload(
+    upload_file: UploadFile,
+    base_dir: Path,
+    *,
+    max_bytes: Optional[int] = MAX_UPLOAD_BYTES,
+) -> StoredUpload:
+    """
+    Stream an upload into the blob store and return its blob path and hash.
+
+    The file is not referenced yet; callers `acquire` it in the same
+    transaction as the row that stores the path.
+    """
+    tmp_dir = blob_root(base_dir) / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    stored = await save_upload(upload_file, tmp_dir / uuid4().hex, max_bytes=max_bytes)
+    try:
+        return await run_in_threadpool(_move_into_place, stored, base_dir)
+    except BaseException:
+        stored.path.unlink(missing_ok=True)
+        raise
+
+
+def acquire(db: Session, stored: StoredUpload) -> None:
+    """
+    Add a reference to a stored blob. Does not commit.
+    """
+    db.execute(
+        dialect_insert(db)(Blob)
+        .values(
+            sha256=stored.sha256,
+            size_bytes=stored.size_bytes,
+            ref_count=1,
+        )
+        .on_conflict_do_update(
+            index_elements=["sha256"],
+            set_={"ref_count": Blob.ref_count + 1},
+        )
+    )
+
+
+def release(db: Session, sha256: str) -> None:
+    """
+    Drop a reference to a blob. Does not commit; files are only removed by
+    `collect_garbage`, after the release is durable.
+    """
+    db.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256, Blob.ref_count > 0)
+        .values(ref_count=Blob.ref_count - 1)
+    )
+
+
+def discard(db: Session, stored: StoredUpload) -> None:
+    """
+    For an upload whose row was rolled back, so its reference was never
+    taken: track the blob with no references unless something else already
+    holds it, so `collect_garbage` can remove the file. Commits. Failures
+    are only logged; the garbage collector also finds untracked files.
+    """
+    try:
+        db.execute(
+            dialect_insert(db)(Blob)
+            .values(sha256=stored.sha256, size_bytes=stored.size_bytes, ref_count=0)
+            .on_conflict_do_nothing(index_elements=["sha256"])
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Could not mark blob %s as unused", stored.sha256, exc_info=True)
+
+
+def _blob_files(base_dir: Path) -> Iterator[Path]:
+    for first in blob_root(base_dir).glob("??"):
+        yield from (path for path in first.glob("??/*") if path.is_file())
+
+
+def collect_garbage(db: Session, base_dir: Path, *, min_age_sec: float = GC_MIN_AGE_SEC) -> int:
+    """
+    Delete blobs nobody references any more, with their files, and return
+    how many files were removed. Files with no `blob` row at all (left by a
+    crash between storing an upload and committing its row) and abandoned
+    `blobs/tmp` files are removed once older than `min_age_sec`. An upload
+    of the same content racing with this can lose its file, so run it while
+    ingestion is idle.
+    """
+    removed = (
+        db.execute(delete(Blob).where(Blob.ref_count <= 0).returning(Blob.sha256))
+        .scalars()
+        .all()
+    )
+    db.commit()
+    for sha256 in removed:
+        blob_path(base_dir, sha256).unlink(missing_ok=True)
+    count = len(removed)
+
+    cutoff = time.time() - min_age_sec
+    old = [path for path in _blob_files(base_dir) if path.stat().st_mtime < cutoff]
+    for start in range(0, len(old), GC_LOOKUP_CHUNK):
+        chunk = {path.name: path for path in old[start : start + GC_LOOKUP_CHUNK]}
+        tracked = set(
+            db.execute(select(Blob.sha256).where(Blob.sha256.in_(list(chunk)))).scalars()
+        )
+        for sha256, path in chunk.items():
+            if sha256 not in tracked:
+                path.unlink(missing_ok=True)
+                count += 1
+    db.rollback()
+    for path in (blob_root(base_dir) / "tmp").glob("*"):
+        if path.is_file() and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Blob store maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gc = commands.add_parser("gc", help="Delete blobs that nothing references.")
+    gc.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(os.getenv("INGEST_DATA_DIR", Path(__file__).resolve().parent.parent / "data")),
+    )
+    gc.add_argument("--min-age-sec", type=float, default=GC_MIN_AGE_SEC)
+    args = parser.parse_args()
+
+    from .db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        removed = collect_garbage(db, args.data_dir, min_age_sec=args.min_age_sec)
+    print(f"Removed {removed} unreferenced blobs.")
+
+
+if __name__ == "__main__":
+    main()
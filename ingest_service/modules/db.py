@@ -5,26 +5,247 @@ Database helpers shared across the ingestion service.
 from __future__ import annotations
 
 import os
-from typing import Generator
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Generator, List
 
-from sqlalchemy import create_engine
-from sqlalchemy.engine.url import make_url
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
-    raise RuntimeError(
-        "DATABASE_URL environment variable is required for the ingestion service."
+    # Embedded mode: a SQLite file next to the uploads, no server needed.
+    _data_dir = Path(
+        os.getenv("INGEST_DATA_DIR", Path(__file__).resolve().parent.parent / "data")
     )
+    _data_dir.mkdir(parents=True, exist_ok=True)
+    DATABASE_URL = f"sqlite:///{_data_dir / 'ingest.db'}"
+
+# Per engine (the sync and the async one each get a pool of this size).
+POOL_SIZE = max(1, int(os.getenv("DB_POOL_SIZE", "5")))
+MAX_OVERFLOW = max(0, int(os.getenv("DB_MAX_OVERFLOW", "10")))
+POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "30"))
+# Connections older than this are replaced on checkout (-1 = never).
+POOL_RECYCLE_SEC = int(os.getenv("DB_POOL_RECYCLE_SEC", "1800"))
+# PostgreSQL `statement_timeout` for every connection (0 = none).
+STATEMENT_TIMEOUT_MS = max(0, int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0")))
+# Checkouts slower than this are counted as having waited for a connection.
+POOL_WAIT_THRESHOLD_SEC = float(os.getenv("DB_POOL_WAIT_THRESHOLD_MS", "5")) / 1000
+
+# SQLite tuning; see `_sqlite_pragmas`.
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_MMAP_BYTES = max(0, int(os.getenv("SQLITE_MMAP_MB", "256"))) * 1024 * 1024
+SQLITE_CACHE_KIB = max(0, int(os.getenv("SQLITE_CACHE_MB", "64"))) * 1024
+SQLITE_BUSY_TIMEOUT_MS = max(0, int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000")))
+SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "1").lower() not in {"0", "false", "no"}
+
+if SQLITE_SYNCHRONOUS not in {"OFF", "NORMAL", "FULL", "EXTRA"}:
+    raise RuntimeError("SQLITE_SYNCHRONOUS must be OFF, NORMAL, FULL or EXTRA.")
 
 url = make_url(DATABASE_URL)
 if url.drivername in {"postgresql", "postgresql+psycopg2"}:
     url = url.set(drivername="postgresql+psycopg")
 
-engine = create_engine(url, pool_pre_ping=True, future=True)
+
+class PoolStats:
+    """
+    Checkout counters for one connection pool.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, seconds: float, *, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            if seconds >= POOL_WAIT_THRESHOLD_SEC:
+                self.waits += 1
+            self.wait_seconds_total += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        queued = isinstance(pool, QueuePool)
+        size = pool.size() if queued else 0
+        max_overflow = pool._max_overflow if queued else 0
+        checked_out = pool.checkedout() if queued else 0
+        capacity = size + max(0, max_overflow)
+        with self._lock:
+            return {
+                "name": self.name,
+                "pool_class": type(pool).__name__,
+                "size": size,
+                "max_overflow": max_overflow,
+                "checked_out": checked_out,
+                "overflow": max(0, pool.overflow()) if queued else 0,
+                "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+
+
+def _timed_pool(base: type, stats: PoolStats) -> type:
+    """
+    `base` with its checkout timed into `stats`. `Pool.recreate()` builds a
+    new instance of the same class, so the counters survive `dispose()`.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = base._do_get(self)
+        except sa_exc.TimeoutError:
+            stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        stats.record(time.perf_counter() - started)
+        return connection
+
+    return type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get})
+
+
+def _is_file_sqlite(engine_url: URL) -> bool:
+    return engine_url.get_backend_name() == "sqlite" and engine_url.database not in {
+        None,
+        "",
+        ":memory:",
+    }
+
+
+def _engine_options(engine_url: URL, pool_class: type, stats: PoolStats) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"pool_pre_ping": True}
+    if engine_url.get_backend_name() == "sqlite" and not _is_file_sqlite(engine_url):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's pool.
+        return options
+    options.update(
+        poolclass=_timed_pool(pool_class, stats),
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT_SEC,
+        pool_recycle=POOL_RECYCLE_SEC,
+    )
+    if STATEMENT_TIMEOUT_MS and engine_url.get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+class WriterBusy(RuntimeError):
+    code = "DB_WRITER_BUSY"
+
+
+_WRITE_RE = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+_sqlite_writer = threading.Lock()
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    WAL lets readers run alongside the writer, and with it
+    `synchronous=NORMAL` only syncs at checkpoints: a power loss can drop
+    the last commits but never corrupts the file.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+    finally:
+        cursor.close()
+
+
+def _take_writer(conn, cursor, statement, parameters, context, executemany) -> None:
+    """
+    Queue the connection for the process-wide writer lock before its first
+    write. pysqlite only opens a transaction at that first write, so the
+    lock covers exactly SQLite's write transaction, and writers take turns
+    here instead of polling SQLite's busy handler.
+    """
+    if conn.info.get("sqlite_writer") or not _WRITE_RE.match(statement):
+        return
+    timeout = SQLITE_BUSY_TIMEOUT_MS / 1000 if SQLITE_BUSY_TIMEOUT_MS else -1
+    if not _sqlite_writer.acquire(timeout=timeout):
+        raise WriterBusy(f"No SQLite write slot within {SQLITE_BUSY_TIMEOUT_MS} ms.")
+    conn.info["sqlite_writer"] = True
+
+
+def _release_writer(info: Dict[str, Any]) -> None:
+    if info.pop("sqlite_writer", False):
+        _sqlite_writer.release()
+
+
+def _release_on_end(conn) -> None:
+    _release_writer(conn.info)
+
+
+def _release_on_reset(dbapi_connection, connection_record, reset_state) -> None:
+    _release_writer(connection_record.info)
+
+
+def _release_on_invalidate(dbapi_connection, connection_record, exception) -> None:
+    _release_writer(connection_record.info)
+
+
+def _configure_sqlite(sync_engine, *, single_writer: bool) -> None:
+    event.listen(sync_engine, "connect", _sqlite_pragmas)
+    if not single_writer:
+        return
+    event.listen(sync_engine, "before_cursor_execute", _take_writer)
+    # Fired just before COMMIT/ROLLBACK; anyone who slips in before it
+    # completes waits in SQLite's busy handler.
+    event.listen(sync_engine, "commit", _release_on_end)
+    event.listen(sync_engine, "rollback", _release_on_end)
+    # Connections returned or discarded mid-transaction.
+    event.listen(sync_engine.pool, "reset", _release_on_reset)
+    event.listen(sync_engine.pool, "invalidate", _release_on_invalidate)
+
+
+def _async_url(engine_url: URL) -> URL:
+    if engine_url.get_backend_name() == "sqlite":
+        return engine_url.set(drivername="sqlite+aiosqlite")
+    # psycopg 3 serves both the sync and the asyncio dialect.
+    return engine_url
+
+
+sync_pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
+
+engine = create_engine(url, future=True, **_engine_options(url, QueuePool, sync_pool_stats))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+async_url = _async_url(url)
+async_engine = create_async_engine(
+    async_url, **_engine_options(async_url, AsyncAdaptedQueuePool, async_pool_stats)
+)
+if _is_file_sqlite(url):
+    _configure_sqlite(engine, single_writer=SQLITE_SINGLE_WRITER)
+    # Read handlers only; they never wait for the writer lock.
+    _configure_sqlite(async_engine.sync_engine, single_writer=False)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -37,3 +258,29 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency that yields an `AsyncSession`, for handlers that
+    query the database without blocking the event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_status() -> List[Dict[str, Any]]:
+    return [
+        sync_pool_stats.snapshot(engine.pool),
+        async_pool_stats.snapshot(async_engine.sync_engine.pool),
+    ]
+
+
+def dialect_insert(db: Session):
+    """
+    Return the dialect's `insert` construct so callers can use
+    `on_conflict_do_nothing` / `on_conflict_do_update`.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
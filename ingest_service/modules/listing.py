@@ -0,0 +1,168 @@
+"""
+Paginated listings of recordings, survey responses and raw documents.
+
+Rows come newest first, ordered by (time, id), and pages are chained with
+an opaque cursor holding the last row's key, so every page is an index
+range scan no matter how deep the caller pages. Heavy text and JSON
+columns are only read when asked for in `fields`.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, FrozenSet, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Table, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models_db import AudioRecording, RawDocument, SurveyResponse
+from .schemas import ListPage
+
+ENTITY_AUDIO = "audio"
+ENTITY_SURVEY = "survey"
+ENTITY_RAW = "raw"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class ListQueryError(ValueError):
+    code = "LIST_BAD_QUERY"
+
+
+@dataclass(frozen=True)
+class _Listing:
+    table: Table
+    time_column: str
+    # Left out unless named in `fields`.
+    heavy: FrozenSet[str]
+
+    @property
+    def default_fields(self) -> List[str]:
+        return [name for name in self.table.columns.keys() if name not in self.heavy]
+
+
+LISTINGS = {
+    ENTITY_AUDIO: _Listing(
+        AudioRecording.__table__, "created_at", frozenset({"transcript_text"})
+    ),
+    ENTITY_SURVEY: _Listing(
+        SurveyResponse.__table__, "submitted_at", frozenset({"raw_data", "normalized_data"})
+    ),
+    ENTITY_RAW: _Listing(
+        RawDocument.__table__,
+        "uploaded_at",
+        frozenset({"text_content", "table_data", "table_schema"}),
+    ),
+}
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Naive datetimes are taken as UTC, which is how they are stored.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc)
+
+
+def encode_cursor(time_value: Optional[datetime], row_id: Any) -> str:
+    payload = json.dumps([time_value.isoformat() if time_value else None, str(row_id)])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, listing: _Listing) -> Tuple[Optional[datetime], Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        time_raw, id_raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        time_value = datetime.fromisoformat(time_raw) if time_raw is not None else None
+        row_id = listing.table.c.id.type.python_type(id_raw)
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as exc:
+        raise ListQueryError("Invalid cursor.") from exc
+    return time_value, row_id
+
+
+def _columns(listing: _Listing, fields: Optional[Sequence[str]]) -> List[str]:
+    if not fields:
+        names = listing.default_fields
+    else:
+        unknown = [name for name in fields if name not in listing.table.c]
+        if unknown:
+            raise ListQueryError(
+                f"Unknown field(s) {', '.join(unknown)}; use any of "
+                f"{', '.join(listing.table.columns.keys())}."
+            )
+        names = list(dict.fromkeys(fields))
+    # The cursor is built from these two.
+    return [name for name in ("id", listing.time_column) if name not in names] + names
+
+
+async def list_rows(
+    db: AsyncSession,
+    entity: str,
+    *,
+    teacher_id: Optional[int] = None,
+    workshop_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[Sequence[str]] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> ListPage:
+    """
+    One page of `entity` rows with time in `[since, until)`, newest first.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
+    Raises `ListQueryError` for unknown fields or a malformed cursor.
+    """
+    listing = LISTINGS[entity]
+    table = listing.table
+    time_column, id_column = table.c[listing.time_column], table.c.id
+    names = _columns(listing, fields)
+
+    filters = []
+    if teacher_id is not None:
+        filters.append(table.c.teacher_id == teacher_id)
+    if workshop_id is not None:
+        filters.append(table.c.workshop_id == workshop_id)
+    if since is not None:
+        filters.append(time_column >= _utc(since))
+    if until is not None:
+        filters.append(time_column < _utc(until))
+    if cursor:
+        after_time, after_id = decode_cursor(cursor, listing)
+        if after_time is None:
+            # Only rows without a time are left, ordered by id.
+            filters.append(and_(time_column.is_(None), id_column < after_id))
+        else:
+            after = or_(
+                time_column < after_time,
+                and_(time_column == after_time, id_column < after_id),
+            )
+            if time_column.nullable:
+                after = or_(after, time_column.is_(None))
+            filters.append(after)
+
+    time_order = time_column.desc()
+    if time_column.nullable:
+        # PostgreSQL sorts NULL first in descending order, SQLite last.
+        time_order = time_order.nulls_last()
+    rows = (
+        await db.execute(
+            select(*(table.c[name] for name in names))
+            .where(*filters)
+            .order_by(time_order, id_column.desc())
+            .limit(limit + 1)
+        )
+    ).mappings().all()
+
+    page = ListPage(entity=entity, limit=limit, fields=names)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        page.next_cursor = encode_cursor(last[listing.time_column], last["id"])
+    page.items = [dict(row) for row in rows]
+    return page
@@ -0,0 +1,192 @@
+"""
+Prometheus metrics for the ingestion pipelines, served at `/metrics`.
+
+Stage timings are histograms labelled by pipeline and stage, so a slow
+upload can be attributed to the disk write, the model load, decoding or
+the database commit. Queue depths and connection pool figures are read
+when scraped rather than kept up to date on every request.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .schemas import ApiError
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_AUDIO = "audio"
+PIPELINE_SURVEY = "survey"
+PIPELINE_RAW = "raw"
+PIPELINE_BATCH = "batch"
+
+# From a cached model lookup up to an hour-long transcription.
+STAGE_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600,
+)
+
+STAGE_SECONDS = Histogram(
+    "ingest_stage_seconds",
+    "Time spent in one stage of an ingestion pipeline.",
+    ["pipeline", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+ERRORS = Counter(
+    "ingest_errors",
+    "ApiErrors returned by the ingestion pipelines, by code.",
+    ["pipeline", "code"],
+)
+SURVEY_ROWS = Counter(
+    "ingest_survey_rows",
+    "Survey rows processed, by outcome.",
+    ["outcome"],
+)
+SURVEY_ROWS_PER_SECOND = Histogram(
+    "ingest_survey_rows_per_second",
+    "Throughput of each survey file, rows read per second of processing.",
+    buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+)
+AUDIO_REAL_TIME_FACTOR = Histogram(
+    "ingest_audio_real_time_factor",
+    "Decoding plus transcription time divided by the audio duration.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 4, 8),
+)
+AUDIO_SECONDS = Counter(
+    "ingest_audio_transcribed_seconds",
+    "Seconds of audio transcribed.",
+)
+
+
+@contextmanager
+def stage(pipeline: str, name: str) -> Iterator[None]:
+    """
+    Time the enclosed block into `ingest_stage_seconds`, failed runs
+    included.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(pipeline, name).observe(time.perf_counter() - started)
+
+
+def count_error(pipeline: str, code: str) -> None:
+    ERRORS.labels(pipeline, code).inc()
+
+
+def count_errors(pipeline: str, errors: Iterable[ApiError]) -> None:
+    for error in errors:
+        ERRORS.labels(pipeline, error.code).inc()
+
+
+def observe_survey(
+    *, seen: int, inserted: int, duplicates: int, skipped: int, seconds: float
+) -> None:
+    SURVEY_ROWS.labels("inserted").inc(inserted)
+    SURVEY_ROWS.labels("duplicate").inc(duplicates)
+    SURVEY_ROWS.labels("skipped").inc(skipped)
+    if seen and seconds > 0:
+        SURVEY_ROWS_PER_SECOND.observe(seen / seconds)
+
+
+def observe_transcription(
+    timings: Dict[str, float], duration_sec: Optional[float], wall_seconds: float
+) -> None:
+    """
+    Record the stages of one transcription as measured by the worker, the
+    time it spent waiting for a worker, and its real-time factor.
+    """
+    for name, seconds in timings.items():
+        STAGE_SECONDS.labels(PIPELINE_AUDIO, name).observe(seconds)
+    STAGE_SECONDS.labels(PIPELINE_AUDIO, "transcribe_wait").observe(
+        max(0.0, wall_seconds - sum(timings.values()))
+    )
+    if duration_sec:
+        AUDIO_SECONDS.inc(duration_sec)
+        compute = timings.get("decode", 0.0) + timings.get("transcribe", 0.0)
+        AUDIO_REAL_TIME_FACTOR.observe(compute / duration_sec)
+
+
+class _RuntimeCollector:
+    """
+    Queue depths and connection pool state, read at scrape time.
+    """
+
+    def describe(self):
+        # Keeps `register` from calling `collect` while modules still import.
+        return []
+
+    def collect(self):
+        from . import audio_jobs, transcription
+        from .db import SessionLocal, pool_status
+
+        in_flight = GaugeMetricFamily(
+            "ingest_transcriptions_in_flight",
+            "Transcriptions running or waiting for a Whisper worker.",
+        )
+        in_flight.add_metric([], transcription.queue_depth())
+        yield in_flight
+        limit = GaugeMetricFamily(
+            "ingest_transcriptions_limit",
+            "In-flight transcriptions accepted before uploads are refused.",
+        )
+        limit.add_metric([], transcription.POOL_WORKERS + transcription.MAX_QUEUE_DEPTH)
+        yield limit
+
+        try:
+            with SessionLocal() as db:
+                counts = audio_jobs.count_active(db)
+        except Exception:
+            logger.exception("Failed to count audio jobs for metrics")
+        else:
+            jobs = GaugeMetricFamily(
+                "ingest_audio_jobs", "Background transcription jobs by status.", labels=["status"]
+            )
+            for status, count in counts.items():
+                jobs.add_metric([status], count)
+            yield jobs
+
+        gauges = {
+            "size": GaugeMetricFamily(
+                "ingest_db_pool_size", "Configured pool size.", labels=["pool"]
+            ),
+            "checked_out": GaugeMetricFamily(
+                "ingest_db_pool_checked_out", "Connections in use.", labels=["pool"]
+            ),
+            "overflow": GaugeMetricFamily(
+                "ingest_db_pool_overflow", "Connections open beyond the pool size.", labels=["pool"]
+            ),
+            "saturation": GaugeMetricFamily(
+                "ingest_db_pool_saturation",
+                "Connections in use over pool size plus max overflow.",
+                labels=["pool"],
+            ),
+        }
+        counters = {
+            "checkouts": CounterMetricFamily(
+                "ingest_db_pool_checkouts", "Connection checkouts.", labels=["pool"]
+            ),
+            "waits": CounterMetricFamily(
+                "ingest_db_pool_waits", "Checkouts that had to wait for a connection.", labels=["pool"]
+            ),
+            "timeouts": CounterMetricFamily(
+                "ingest_db_pool_timeouts", "Checkouts that timed out.", labels=["pool"]
+            ),
+            "wait_seconds_total": CounterMetricFamily(
+                "ingest_db_pool_wait_seconds", "Time spent checking out connections.", labels=["pool"]
+            ),
+        }
+        for pool in pool_status():
+            for key, family in {**gauges, **counters}.items():
+                family.add_metric([pool["name"]], pool[key])
+        yield from gauges.values()
+        yield from counters.values()
+
+
+REGISTRY.register(_RuntimeCollector())
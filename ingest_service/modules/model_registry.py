@@ -0,0 +1,211 @@
+"""
+Registry of loaded Whisper models with warm preload and LRU eviction under a
+memory budget.
+"""
+
+from __future__ import annotations
+
+import os
+import resource
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from faster_whisper import WhisperModel
+
+DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+DEFAULT_SIZE = os.getenv("WHISPER_MODEL_SIZE", "tiny")
+DEFAULT_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+ALLOWED_SIZES = [
+    size.strip()
+    for size in os.getenv(
+        "WHISPER_ALLOWED_MODELS", "tiny,base,small,medium,large-v2,large-v3"
+    ).split(",")
+    if size.strip()
+]
+ALLOWED_COMPUTE_TYPES = {
+    "default",
+    "int8",
+    "int8_float16",
+    "int8_float32",
+    "int16",
+    "float16",
+    "float32",
+}
+# 0 disables the budget; otherwise least recently used models are unloaded
+# once the measured resident size of all loaded models goes above it.
+MEMORY_BUDGET_MB = float(os.getenv("WHISPER_MODEL_MEMORY_MB", "0"))
+PRELOAD = os.getenv("WHISPER_PRELOAD_MODELS", f"{DEFAULT_SIZE}:{DEFAULT_COMPUTE_TYPE}")
+
+
+class ModelNotAllowed(ValueError):
+    code = "AUDIO_MODEL_NOT_ALLOWED"
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    size: str = DEFAULT_SIZE
+    compute_type: str = DEFAULT_COMPUTE_TYPE
+    device: str = DEVICE
+
+    @property
+    def key(self) -> str:
+        return f"{self.size}/{self.compute_type}"
+
+
+def resolve_spec(
+    size: Optional[str] = None, compute_type: Optional[str] = None
+) -> ModelSpec:
+    """
+    Build a spec from optional per-request choices, validated against
+    `WHISPER_ALLOWED_MODELS` and the known compute types.
+    """
+    spec = ModelSpec(
+        size=size or DEFAULT_SIZE,
+        compute_type=compute_type or DEFAULT_COMPUTE_TYPE,
+    )
+    if spec.size not in ALLOWED_SIZES:
+        raise ModelNotAllowed(
+            f"Model '{spec.size}' is not enabled. "
+            f"Choose one of: {', '.join(ALLOWED_SIZES)}."
+        )
+    if spec.compute_type not in ALLOWED_COMPUTE_TYPES:
+        raise ModelNotAllowed(f"Unknown compute type '{spec.compute_type}'.")
+    return spec
+
+
+def parse_specs(value: str) -> List[ModelSpec]:
+    """
+    Parse `size[:compute_type]` entries separated by commas.
+    """
+    specs = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        size, _, compute_type = item.partition(":")
+        specs.append(resolve_spec(size, compute_type or None))
+    return specs
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as handle:
+            resident_pages = int(handle.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak RSS only; good enough where /proc is not available.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class LoadedModel:
+    spec: ModelSpec
+    model: WhisperModel
+    load_seconds: float
+    resident_mb: float
+    loaded_at: datetime
+    last_used_at: datetime
+    uses: int = 0
+
+
+class ModelRegistry:
+    """
+    Thread-safe cache of `WhisperModel` instances keyed by `ModelSpec`.
+
+    Evicted models are only dropped from the registry; transcriptions that
+    still hold a reference finish normally and the memory is released after.
+    """
+
+    def __init__(
+        self,
+        *,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        memory_budget_mb: float = MEMORY_BUDGET_MB,
+    ) -> None:
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.memory_budget_mb = memory_budget_mb
+        self._models: "OrderedDict[ModelSpec, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[ModelSpec, threading.Lock] = {}
+
+    def get(self, spec: ModelSpec) -> WhisperModel:
+        with self._lock:
+            entry = self._models.get(spec)
+            if entry is not None:
+                self._touch(entry)
+                return entry.model
+            load_lock = self._load_locks.setdefault(spec, threading.Lock())
+
+        # Load outside the registry lock so other models keep serving.
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(spec)
+                if entry is not None:
+                    self._touch(entry)
+                    return entry.model
+            entry = self._load(spec)
+            with self._lock:
+                self._models[spec] = entry
+                self._touch(entry)
+                self._evict_over_budget(keep=spec)
+            return entry.model
+
+    def preload(self, specs: Iterable[ModelSpec]) -> None:
+        for spec in specs:
+            self.get(spec)
+
+    def evict(self, spec: ModelSpec) -> bool:
+        with self._lock:
+            return self._models.pop(spec, None) is not None
+
+    def stats(self) -> List[LoadedModel]:
+        with self._lock:
+            return list(self._models.values())
+
+    def resident_mb(self) -> float:
+        with self._lock:
+            return sum(entry.resident_mb for entry in self._models.values())
+
+    def _touch(self, entry: LoadedModel) -> None:
+        entry.uses += 1
+        entry.last_used_at = datetime.now(timezone.utc)
+        self._models.move_to_end(entry.spec)
+
+    def _load(self, spec: ModelSpec) -> LoadedModel:
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        model = WhisperModel(
+            spec.size,
+            device=spec.device,
+            compute_type=spec.compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.num_workers,
+        )
+        load_seconds = time.perf_counter() - started
+        resident_mb = max(0, _rss_bytes() - rss_before) / (1024 * 1024)
+        now = datetime.now(timezone.utc)
+        return LoadedModel(
+            spec=spec,
+            model=model,
+            load_seconds=round(load_seconds, 3),
+            resident_mb=round(resident_mb, 1),
+            loaded_at=now,
+            last_used_at=now,
+        )
+
+    def _evict_over_budget(self, keep: ModelSpec) -> None:
+        if not self.memory_budget_mb:
+            return
+        total = sum(entry.resident_mb for entry in self._models.values())
+        for spec in list(self._models):
+            if total <= self.memory_budget_mb:
+                break
+            if spec == keep:
+                continue
+            total -= self._models.pop(spec).resident_mb
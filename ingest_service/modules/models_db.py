@@ -6,13 +6,48 @@ from __future__ import annotations
 
 import uuid
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text
-from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    JSON,
+    Integer,
+    Text,
+    UniqueConstraint,
+    Uuid,
+    event,
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from .db import Base
 
+# Portable column types: PostgreSQL keeps JSONB, native UUID and tsvector;
+# SQLite stores JSON text, 32-character hex UUIDs and plain text.
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+UUIDKey = Uuid(as_uuid=True)
+SearchVector = Text().with_variant(TSVECTOR(), "postgresql")
+
+
+class Blob(Base):
+    """
+    A deduplicated upload in the blob store, keyed by its SHA-256, with the
+    number of rows whose path points at it.
+    """
+
+    __tablename__ = "blob"
+
+    sha256 = Column(Text, primary_key=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
 
 class Teacher(Base):
     __tablename__ = "teacher"
@@ -27,18 +62,110 @@ class Teacher(Base):
     raw_documents = relationship("RawDocument", back_populates="teacher")
 
 
+# Case-insensitive email lookups (`lower(email) = ...`) use this index.
+Index("ux_teacher_email_lower", func.lower(Teacher.email), unique=True)
+
+
 class AudioRecording(Base):
     __tablename__ = "audio_recording"
+    # Newest-first listings, optionally narrowed to a teacher or workshop.
+    __table_args__ = (
+        Index("ix_audio_recording_created", "created_at", "id"),
+        Index("ix_audio_recording_teacher_created", "teacher_id", "created_at", "id"),
+        Index("ix_audio_recording_workshop_created", "workshop_id", "created_at", "id"),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUIDKey, primary_key=True, default=uuid.uuid4)
     teacher_id = Column(Integer, ForeignKey("teacher.id"), nullable=True)
     workshop_id = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     audio_path = Column(Text, nullable=False)
     transcript_text = Column(Text, nullable=False)
     duration_sec = Column(Integer, nullable=True)
+    content_sha256 = Column(Text, nullable=True, index=True)
 
     teacher = relationship("Teacher", back_populates="audio_recordings")
+    segments = relationship(
+        "TranscriptSegment",
+        back_populates="recording",
+        order_by="TranscriptSegment.seq",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class TranscriptSegment(Base):
+    """
+    One timed Whisper segment of a recording's transcript.
+    """
+
+    __tablename__ = "transcript_segment"
+    __table_args__ = (
+        Index("ix_transcript_segment_audio_start", "audio_id", "start_sec"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    audio_id = Column(
+        UUIDKey,
+        ForeignKey("audio_recording.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    seq = Column(Integer, nullable=False)
+    start_sec = Column(Float, nullable=False)
+    end_sec = Column(Float, nullable=False)
+    text = Column(Text, nullable=False)
+    words = Column(JSONDocument, nullable=True)
+
+    recording = relationship("AudioRecording", back_populates="segments")
+
+
+class AudioJob(Base):
+    """
+    Durable transcription queue entry. The id doubles as the id of the
+    `AudioRecording` the job produces once it is done.
+    """
+
+    __tablename__ = "audio_job"
+    __table_args__ = (Index("ix_audio_job_status_created", "status", "created_at"),)
+
+    id = Column(UUIDKey, primary_key=True, default=uuid.uuid4)
+    status = Column(Text, nullable=False, default="queued")
+    teacher_id = Column(Integer, ForeignKey("teacher.id"), nullable=True)
+    workshop_id = Column(Integer, nullable=True)
+    audio_path = Column(Text, nullable=False)
+    content_sha256 = Column(Text, nullable=True)
+    model_size = Column(Text, nullable=True)
+    compute_type = Column(Text, nullable=True)
+    word_timestamps = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    worker_id = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error_code = Column(Text, nullable=True)
+    error_message = Column(Text, nullable=True)
+
+
+class TranscriptCacheEntry(Base):
+    """
+    Points an (audio content hash, transcription settings) pair at the
+    `AudioRecording` whose transcript can be reused for it.
+    """
+
+    __tablename__ = "transcript_cache"
+
+    cache_key = Column(Text, primary_key=True)
+    content_sha256 = Column(Text, nullable=False)
+    config_key = Column(Text, nullable=False, index=True)
+    audio_id = Column(
+        UUIDKey,
+        ForeignKey("audio_recording.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    hit_count = Column(Integer, nullable=False, default=0)
 
 
 class SurveyResponse(Base):
@@ -48,16 +175,60 @@ class SurveyResponse(Base):
     teacher_id = Column(Integer, ForeignKey("teacher.id"), nullable=True)
     workshop_id = Column(Integer, nullable=True)
     submitted_at = Column(DateTime(timezone=True), nullable=True)
-    raw_data = Column(JSONB, nullable=False)
-    normalized_data = Column(JSONB, nullable=False)
+    raw_data = Column(JSONDocument, nullable=False)
+    normalized_data = Column(JSONDocument, nullable=False)
+    # sha256 of the canonical raw_data JSON + workshop_id; NULL for legacy rows.
+    fingerprint = Column(Text, nullable=True, unique=True)
 
     teacher = relationship("Teacher", back_populates="survey_responses")
 
 
+# Survey listings order by `submitted_at DESC NULLS LAST`. SQLite already
+# sorts NULL last when descending but cannot spell it in an index;
+# PostgreSQL needs it spelled out to walk the index in that order.
+Index(
+    "ix_survey_response_submitted", SurveyResponse.submitted_at, SurveyResponse.id
+).ddl_if(dialect="sqlite")
+Index(
+    "ix_survey_response_teacher_submitted",
+    SurveyResponse.teacher_id,
+    SurveyResponse.submitted_at,
+    SurveyResponse.id,
+).ddl_if(dialect="sqlite")
+Index(
+    "ix_survey_response_workshop_submitted",
+    SurveyResponse.workshop_id,
+    SurveyResponse.submitted_at,
+    SurveyResponse.id,
+).ddl_if(dialect="sqlite")
+Index(
+    "ix_survey_response_submitted_pg",
+    SurveyResponse.submitted_at.desc().nulls_last(),
+    SurveyResponse.id.desc(),
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_survey_response_teacher_submitted_pg",
+    SurveyResponse.teacher_id,
+    SurveyResponse.submitted_at.desc().nulls_last(),
+    SurveyResponse.id.desc(),
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_survey_response_workshop_submitted_pg",
+    SurveyResponse.workshop_id,
+    SurveyResponse.submitted_at.desc().nulls_last(),
+    SurveyResponse.id.desc(),
+).ddl_if(dialect="postgresql")
+
+
 class RawDocument(Base):
     __tablename__ = "raw_document"
+    __table_args__ = (
+        Index("ix_raw_document_uploaded", "uploaded_at", "id"),
+        Index("ix_raw_document_teacher_uploaded", "teacher_id", "uploaded_at", "id"),
+        Index("ix_raw_document_workshop_uploaded", "workshop_id", "uploaded_at", "id"),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUIDKey, primary_key=True, default=uuid.uuid4)
     doc_type = Column(Text, nullable=True)
     teacher_id = Column(Integer, ForeignKey("teacher.id"), nullable=True)
     workshop_id = Column(Integer, nullable=True)
@@ -65,7 +236,73 @@ class RawDocument(Base):
     original_filename = Column(Text, nullable=False)
     mime_type = Column(Text, nullable=True)
     file_path = Column(Text, nullable=False)
+    content_sha256 = Column(Text, nullable=True, index=True)
     text_content = Column(Text, nullable=True)
-    table_data = Column(JSONB, nullable=True)
+    table_data = Column(JSONDocument, nullable=True)
+    # Parquet sidecar used instead of `table_data` when RAW_TABLE_STORAGE=parquet.
+    table_path = Column(Text, nullable=True)
+    table_schema = Column(JSONDocument, nullable=True)
+    table_row_count = Column(Integer, nullable=True)
+    # "complete", "partial" (page limit, timeout or unreadable pages) or "failed".
+    extraction_status = Column(Text, nullable=True)
+    page_count = Column(Integer, nullable=True)
+    extracted_pages = Column(Integer, nullable=True)
 
     teacher = relationship("Teacher", back_populates="raw_documents")
+
+
+class RollupCounter(Base):
+    """
+    A running total for one workshop or teacher, e.g. its survey response
+    count or recorded seconds. Incremented in the transaction of every
+    insert it covers; `python -m modules.rollups` recomputes them all.
+    """
+
+    __tablename__ = "rollup_counter"
+
+    # "workshop" or "teacher".
+    scope = Column(Text, primary_key=True)
+    scope_id = Column(Integer, primary_key=True)
+    metric = Column(Text, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class SearchDocument(Base):
+    """
+    Full-text index entry for a transcript or a raw document's text.
+
+    On PostgreSQL `search_vector` holds the accent-folded `tsvector` behind a
+    GIN index. On SQLite the folded text goes to the `search_document_fts`
+    FTS5 table instead, under this row's id.
+    """
+
+    __tablename__ = "search_document"
+    __table_args__ = (
+        UniqueConstraint("source", "source_id", name="ux_search_document_source"),
+        Index("ix_search_document_teacher", "teacher_id"),
+        Index("ix_search_document_workshop", "workshop_id"),
+        Index(
+            "ix_search_document_vector", "search_vector", postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # "audio" or "raw".
+    source = Column(Text, nullable=False)
+    source_id = Column(UUIDKey, nullable=False)
+    teacher_id = Column(Integer, nullable=True)
+    workshop_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    title = Column(Text, nullable=True)
+    search_vector = Column(SearchVector, nullable=True)
+
+
+event.listen(
+    SearchDocument.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_document_fts "
+        "USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+    ).execute_if(dialect="sqlite"),
+)
+
@@ -0,0 +1,204 @@
+"""
+PDF text extraction in a process pool, split into page ranges.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pdfplumber
+
+POOL_WORKERS = max(1, int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1))))
+# Minimum pages handed to a worker at a time. Every range re-reads the page
+# tree, so documents are cut into at most RANGES_PER_WORKER ranges per worker.
+PAGES_PER_TASK = max(1, int(os.getenv("PDF_PAGES_PER_TASK", "20")))
+RANGES_PER_WORKER = 4
+# Pages beyond this are not extracted (0 = no limit).
+MAX_PAGES = max(0, int(os.getenv("PDF_MAX_PAGES", "500")))
+TIMEOUT_SEC = float(os.getenv("PDF_TIMEOUT_SEC", "120"))
+
+STATUS_COMPLETE = "complete"
+STATUS_PARTIAL = "partial"
+STATUS_FAILED = "failed"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class PdfExtractionError(Exception):
+    code = "RAW_PARSE_ERROR"
+
+
+@dataclass
+class PdfExtraction:
+    text: Optional[str]
+    status: str
+    page_count: int = 0
+    extracted_pages: int = 0
+    reason: Optional[str] = None
+
+
+def _page_count(path: str) -> int:
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[Optional[str]]:
+    """
+    Text of pages `start..stop` (0-based, exclusive), `None` for pages that
+    failed. Each page is closed right after extraction so its layout
+    objects are freed before the next one is parsed.
+    """
+    texts: List[Optional[str]] = []
+    with pdfplumber.open(path, pages=list(range(start + 1, stop + 1))) as pdf:
+        for page in pdf.pages:
+            try:
+                texts.append((page.extract_text() or "").strip())
+            except Exception:
+                texts.append(None)
+            finally:
+                page.close()
+    return texts
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def page_ranges(page_count: int) -> List[Tuple[int, int]]:
+    per_task = max(PAGES_PER_TASK, -(-page_count // (POOL_WORKERS * RANGES_PER_WORKER)))
+    return [
+        (start, min(start + per_task, page_count))
+        for start in range(0, page_count, per_task)
+    ]
+
+
+async def extract_pdf_text(
+    path: Path,
+    *,
+    max_pages: int = MAX_PAGES,
+    timeout_sec: float = TIMEOUT_SEC,
+) -> PdfExtraction:
+    """
+    Extract the text of a PDF without blocking the event loop.
+
+    Page ranges run in parallel worker processes and are joined in page
+    order. Pages past `max_pages`, ranges still running at `timeout_sec`
+    and pages that fail to parse are left out, and the result is marked
+    `partial` instead of failing. Ranges already running when the timeout
+    hits cannot be interrupted; they finish unobserved in their worker.
+
+    Raises `PdfExtractionError` when the file cannot be opened at all.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout_sec
+    executor = _get_executor()
+    try:
+        page_count = await asyncio.wait_for(
+            asyncio.wrap_future(executor.submit(_page_count, str(path))),
+            timeout=timeout_sec,
+        )
+    except asyncio.TimeoutError:
+        return PdfExtraction(
+            text=None,
+            status=STATUS_FAILED,
+            reason=f"Opening the PDF exceeded {timeout_sec:g}s.",
+        )
+    except BrokenProcessPool as exc:
+        _discard_executor(executor)
+        raise PdfExtractionError(f"PDF worker crashed: {exc}") from exc
+    except Exception as exc:
+        raise PdfExtractionError(f"Failed to open PDF: {exc}") from exc
+
+    limit = min(page_count, max_pages) if max_pages else page_count
+    futures: Dict[Future, Tuple[int, int]] = {
+        executor.submit(_extract_range, str(path), start, stop): (start, stop)
+        for start, stop in page_ranges(limit)
+    }
+    wrapped = {asyncio.wrap_future(future): future for future in futures}
+    for task in wrapped:
+        # Abandoned ranges still finish (or raise) in the worker; swallow that.
+        task.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    pages: Dict[int, Optional[str]] = {}
+    broken = False
+    try:
+        done, pending = (
+            await asyncio.wait(wrapped, timeout=max(0.0, deadline - loop.time()))
+            if wrapped
+            else (set(), set())
+        )
+    except asyncio.CancelledError:
+        for future in futures:
+            future.cancel()
+        raise
+    for task in done:
+        start, _ = futures[wrapped[task]]
+        try:
+            texts = task.result()
+        except BrokenProcessPool:
+            broken = True
+            continue
+        except Exception:
+            continue
+        for offset, text in enumerate(texts):
+            pages[start + offset] = text
+    for task in pending:
+        wrapped[task].cancel()
+    if broken:
+        _discard_executor(executor)
+
+    extracted = [pages[number] for number in sorted(pages) if pages[number] is not None]
+    parts = [text for text in extracted if text]
+    reasons = []
+    if limit < page_count:
+        reasons.append(f"page limit {max_pages} of {page_count} pages")
+    if pending:
+        reasons.append(f"timed out after {timeout_sec:g}s")
+    if len(extracted) < limit and not pending:
+        reasons.append(f"{limit - len(extracted)} page(s) failed to parse")
+    if not reasons:
+        status = STATUS_COMPLETE
+    elif extracted:
+        status = STATUS_PARTIAL
+    else:
+        status = STATUS_FAILED
+    return PdfExtraction(
+        text="\n\n".join(parts) if parts else None,
+        status=status,
+        page_count=page_count,
+        extracted_pages=len(extracted),
+        reason="; ".join(reasons) or None,
+    )
@@ -0,0 +1,83 @@
+"""
+In-process progress tracking for long-running ingests.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Finished entries stay visible this long so clients can read the outcome.
+RETENTION_SEC = float(os.getenv("INGEST_PROGRESS_RETENTION_SEC", "900"))
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class IngestIdInUse(ValueError):
+    code = "INGEST_ID_IN_USE"
+
+
+@dataclass
+class IngestProgress:
+    ingest_id: str
+    kind: str
+    status: str = STATUS_RUNNING
+    rows_seen: int = 0
+    inserted_rows: int = 0
+    skipped_rows: int = 0
+    duplicate_rows: int = 0
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+    _finished_monotonic: Optional[float] = field(default=None, repr=False)
+
+
+class ProgressRegistry:
+    """
+    Thread-safe map of ingest id to progress. Counters are written by the
+    worker thread running the ingest and read by the status endpoint.
+    """
+
+    def __init__(self, retention_sec: float = RETENTION_SEC) -> None:
+        self.retention_sec = retention_sec
+        self._entries: Dict[str, IngestProgress] = {}
+        self._lock = threading.Lock()
+
+    def start(self, ingest_id: str, kind: str) -> IngestProgress:
+        with self._lock:
+            self._prune()
+            current = self._entries.get(ingest_id)
+            if current is not None and current.status == STATUS_RUNNING:
+                raise IngestIdInUse(f"Ingest '{ingest_id}' is already running.")
+            progress = IngestProgress(ingest_id=ingest_id, kind=kind)
+            self._entries[ingest_id] = progress
+            return progress
+
+    def finish(self, progress: IngestProgress, *, success: bool) -> None:
+        with self._lock:
+            progress.status = STATUS_DONE if success else STATUS_FAILED
+            progress.finished_at = datetime.now(timezone.utc)
+            progress._finished_monotonic = time.monotonic()
+
+    def get(self, ingest_id: str) -> Optional[IngestProgress]:
+        with self._lock:
+            self._prune()
+            return self._entries.get(ingest_id)
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.retention_sec
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if entry._finished_monotonic is not None and entry._finished_monotonic < cutoff
+        ]
+        for key in expired:
+            del self._entries[key]
+
+
+registry = ProgressRegistry()
@@ -4,33 +4,141 @@ Generic raw file ingestion helpers.
 
 from __future__ import annotations
 
-import io
-import json
 import mimetypes
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
-from uuid import uuid4
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID, uuid4
 
-import pandas as pd
-import pdfplumber
+from fastapi import UploadFile
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from . import blob_store, metrics, rollups, search_index, table_store
 from .models_db import RawDocument
-from .schemas import ApiError, RawIngestResult
+from .pdf_extract import (
+    STATUS_COMPLETE,
+    STATUS_FAILED,
+    STATUS_PARTIAL,
+    PdfExtractionError,
+    extract_pdf_text,
+)
+from .schemas import ApiError, RawIngestResult, RawTable, RawTableColumn
+from .table_store import ExtractedTables
+from .uploads import UploadTooLarge, read_text
 from .utils import build_error
 
 TEXT_EXTENSIONS = {".txt", ".md", ".rtf"}
 TABLE_EXTENSIONS = {".csv", ".tsv", ".xlsx", ".xls", ".json"}
+# Earlier documents with the same content checked for reusable extraction.
+REUSE_CANDIDATES = 20
 
+_EXTRACTED_FIELDS = (
+    "text_content",
+    "table_data",
+    "table_path",
+    "table_schema",
+    "table_row_count",
+    "extraction_status",
+    "page_count",
+    "extracted_pages",
+)
 
-def _safe_table_records(df: pd.DataFrame) -> list:
-    return df.where(pd.notnull(df), None).to_dict(orient="records")
 
+def _find_extracted(db: Session, content_sha256: str, suffix: str) -> Optional[RawDocument]:
+    """
+    The latest fully extracted document with this content and extension.
+    """
+    candidates = db.execute(
+        select(RawDocument)
+        .where(
+            RawDocument.content_sha256 == content_sha256,
+            RawDocument.extraction_status == STATUS_COMPLETE,
+        )
+        .order_by(RawDocument.uploaded_at.desc())
+        .limit(REUSE_CANDIDATES)
+    ).scalars()
+    for candidate in candidates:
+        if Path(candidate.original_filename or "").suffix.lower() == suffix:
+            return candidate
+    return None
+
+
+async def _extract_content(
+    dest_path: Path,
+    suffix: str,
+    sidecar_stem: Path,
+    errors: List[ApiError],
+    warnings: List[ApiError],
+) -> Dict[str, Any]:
+    """
+    Extract text or tables from a stored upload into `RawDocument` fields,
+    appending problems to `errors` / `warnings`.
+    """
+    text_content: Optional[str] = None
+    tables: Optional[ExtractedTables] = None
+    extraction_status = STATUS_COMPLETE
+    page_count: Optional[int] = None
+    extracted_pages: Optional[int] = None
+
+    try:
+        if suffix in TEXT_EXTENSIONS:
+            text_content = read_text(dest_path, errors="ignore")
+        elif suffix == ".pdf":
+            extraction = await extract_pdf_text(dest_path)
+            text_content = extraction.text
+            extraction_status = extraction.status
+            page_count = extraction.page_count
+            extracted_pages = extraction.extracted_pages
+            if extraction.status == STATUS_FAILED:
+                errors.append(
+                    build_error(
+                        code=PdfExtractionError.code,
+                        message=f"Failed to extract content: {extraction.reason}",
+                    )
+                )
+            elif extraction.status == STATUS_PARTIAL:
+                warnings.append(
+                    build_error(code="RAW_PDF_PARTIAL", message=extraction.reason or "")
+                )
+        elif suffix in TABLE_EXTENSIONS:
+            tables = await run_in_threadpool(
+                table_store.extract_tables, dest_path, suffix, sidecar_stem
+            )
+            warnings.extend(tables.warnings)
+            if tables.warnings:
+                extraction_status = STATUS_PARTIAL
+        else:
+            try:
+                text_content = read_text(dest_path)
+            except UnicodeDecodeError:
+                text_content = None
+    except Exception as exc:
+        extraction_status = STATUS_FAILED
+        errors.append(
+            build_error(
+                code="RAW_PARSE_ERROR",
+                message=f"Failed to extract content: {exc}",
+            )
+        )
+
+    has_tables = bool(tables and tables.sheets)
+    return {
+        "text_content": text_content,
+        "table_data": tables.table_data if tables else None,
+        "table_path": tables.sheets[0]["path"] if has_tables else None,
+        "table_schema": tables.sheets if has_tables else None,
+        "table_row_count": tables.row_count if has_tables else None,
+        "extraction_status": extraction_status,
+        "page_count": page_count,
+        "extracted_pages": extracted_pages,
+    }
 
-def ingest_raw_file(
+
+async def ingest_raw_file(
     *,
-    file_bytes: bytes,
+    upload_file: UploadFile,
     filename: str,
     doc_type: Optional[str],
     teacher_id: Optional[int],
@@ -42,19 +150,23 @@ def ingest_raw_file(
     suffix = Path(filename or "raw").suffix.lower()
     dest_dir = base_dir / "raw"
     dest_dir.mkdir(parents=True, exist_ok=True)
-    dest_path = dest_dir / f"{raw_id}{suffix or '.bin'}"
 
     errors: list[ApiError] = []
+    warnings: list[ApiError] = []
 
     try:
-        dest_path.write_bytes(file_bytes)
+        with metrics.stage(metrics.PIPELINE_RAW, "save"):
+            stored = await blob_store.store_upload(upload_file, base_dir)
     except Exception as exc:
-        errors.append(
-            build_error(
-                code="RAW_SAVE_ERROR",
-                message=f"Failed to persist uploaded file: {exc}",
+        if isinstance(exc, UploadTooLarge):
+            errors.append(build_error(code=exc.code, message=str(exc)))
+        else:
+            errors.append(
+                build_error(
+                    code="RAW_SAVE_ERROR",
+                    message=f"Failed to persist uploaded file: {exc}",
+                )
             )
-        )
         return RawIngestResult(
             success=False,
             raw_id=str(raw_id),
@@ -63,50 +175,23 @@ def ingest_raw_file(
             errors=errors,
         )
 
-    text_content: Optional[str] = None
-    table_data: Optional[list] = None
-
     try:
-        if suffix in TEXT_EXTENSIONS:
-            text_content = file_bytes.decode("utf-8", errors="ignore")
-        elif suffix == ".pdf":
-            with pdfplumber.open(str(dest_path)) as pdf:
-                parts = []
-                for page in pdf.pages:
-                    content = page.extract_text() or ""
-                    if content:
-                        parts.append(content.strip())
-                if parts:
-                    text_content = "\n\n".join(parts)
-        elif suffix in {".csv", ".tsv"}:
-            sep = "," if suffix == ".csv" else "\t"
-            df = pd.read_csv(io.BytesIO(file_bytes), sep=sep)
-            table_data = _safe_table_records(df)
-        elif suffix in {".xlsx", ".xls"}:
-            df = pd.read_excel(io.BytesIO(file_bytes))
-            table_data = _safe_table_records(df)
-        elif suffix == ".json":
-            payload = json.loads(file_bytes.decode("utf-8"))
-            if isinstance(payload, list):
-                table_data = payload
-            elif isinstance(payload, dict):
-                table_data = payload.get("rows") or payload.get("data") or [payload]
-            else:
-                table_data = [payload]
-        else:
-            try:
-                text_content = file_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                text_content = None
-    except Exception as exc:
-        errors.append(
-            build_error(
-                code="RAW_PARSE_ERROR",
-                message=f"Failed to extract content: {exc}",
+        with metrics.stage(metrics.PIPELINE_RAW, "reuse_lookup"):
+            known = await run_in_threadpool(_find_extracted, db, stored.sha256, suffix)
+    except Exception:
+        db.rollback()
+        known = None
+    if known is not None:
+        # Same bytes, same extension: the earlier extraction still holds.
+        extracted = {name: getattr(known, name) for name in _EXTRACTED_FIELDS}
+    else:
+        with metrics.stage(metrics.PIPELINE_RAW, "extract"):
+            extracted = await _extract_content(
+                stored.path, suffix, dest_dir / str(raw_id), errors, warnings
             )
-        )
 
     mime_type, _ = mimetypes.guess_type(filename)
+    has_table_data = bool(extracted["table_path"]) or extracted["table_data"] is not None
 
     document = RawDocument(
         id=raw_id,
@@ -116,16 +201,38 @@ def ingest_raw_file(
         uploaded_at=datetime.now(timezone.utc),
         original_filename=filename,
         mime_type=mime_type,
-        file_path=str(dest_path),
-        text_content=text_content,
-        table_data=table_data,
+        file_path=str(stored.path),
+        content_sha256=stored.sha256,
+        **extracted,
     )
 
-    try:
+    def save() -> None:
         db.add(document)
+        blob_store.acquire(db, stored)
+        search_index.index_document(
+            db,
+            source=search_index.SOURCE_RAW,
+            source_id=raw_id,
+            text_content=document.text_content,
+            teacher_id=teacher_id,
+            workshop_id=workshop_id,
+            created_at=document.uploaded_at,
+            title=filename,
+        )
+        rollups.record_document(
+            db,
+            teacher_id=teacher_id,
+            workshop_id=workshop_id,
+            doc_type=document.doc_type,
+        )
         db.commit()
+
+    try:
+        with metrics.stage(metrics.PIPELINE_RAW, "db_commit"):
+            await run_in_threadpool(save)
     except Exception as exc:
         db.rollback()
+        await run_in_threadpool(blob_store.discard, db, stored)
         errors.append(
             build_error(
                 code="RAW_DB_ERROR",
@@ -135,15 +242,104 @@ def ingest_raw_file(
         return RawIngestResult(
             success=False,
             raw_id=str(raw_id),
-            has_text=bool(text_content),
-            has_table_data=table_data is not None,
+            has_text=bool(extracted["text_content"]),
+            has_table_data=has_table_data,
+            extraction_status=extracted["extraction_status"],
+            page_count=extracted["page_count"],
+            extracted_pages=extracted["extracted_pages"],
             errors=errors,
+            warnings=warnings,
         )
 
     return RawIngestResult(
         success=len(errors) == 0,
         raw_id=str(raw_id),
-        has_text=bool(text_content),
-        has_table_data=table_data is not None,
+        has_text=bool(extracted["text_content"]),
+        has_table_data=has_table_data,
+        extraction_status=extracted["extraction_status"],
+        page_count=extracted["page_count"],
+        extracted_pages=extracted["extracted_pages"],
+        reused_extraction=known is not None,
         errors=errors,
+        warnings=warnings,
+    )
+
+
+def _table_entries(document: RawDocument) -> list:
+    if document.table_schema and isinstance(document.table_schema, list):
+        return document.table_schema
+    # Documents stored before per-sheet metadata: one unnamed table.
+    if document.table_path or document.table_data is not None:
+        return [{"sheet": None, "path": document.table_path}]
+    return []
+
+
+def get_raw_table(
+    *,
+    db: Session,
+    raw_id: UUID,
+    sheet: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    filters: Sequence[str] = (),
+    offset: int = 0,
+    limit: int = 100,
+) -> Optional[RawTable]:
+    """
+    A column projection and row slice of one of a document's tables (the
+    first sheet unless `sheet` is given), read from its Parquet sidecar when
+    there is one and from `table_data` otherwise. Raises
+    `table_store.TableQueryError` for unknown sheets, columns or bad filters.
+    """
+    document = db.get(RawDocument, raw_id)
+    if document is None:
+        return None
+    entries = _table_entries(document)
+    if not entries:
+        return RawTable(
+            raw_id=str(raw_id),
+            errors=[
+                build_error(code="RAW_TABLE_NOT_FOUND", message="Document has no table data.")
+            ],
+        )
+    sheets = [entry["sheet"] for entry in entries if entry.get("sheet") is not None]
+    if sheet is None:
+        entry = entries[0]
+    else:
+        matches = [entry for entry in entries if entry.get("sheet") == sheet]
+        if not matches:
+            raise table_store.TableQueryError(f"Unknown sheet '{sheet}'.")
+        entry = matches[0]
+
+    if entry.get("path"):
+        storage = "parquet"
+        result = table_store.read_parquet_slice(
+            entry["path"],
+            columns=columns,
+            filters=filters,
+            offset=offset,
+            limit=limit,
+        )
+    else:
+        storage = "jsonb"
+        records = document.table_data
+        if isinstance(records, dict) and len(entries) > 1:
+            records = records.get(entry["sheet"], [])
+        result = table_store.read_records_slice(
+            records or [],
+            columns=columns,
+            filters=filters,
+            offset=offset,
+            limit=limit,
+        )
+    return RawTable(
+        raw_id=str(raw_id),
+        sheet=entry.get("sheet"),
+        sheets=sheets,
+        storage=storage,
+        row_count=result.row_count,
+        offset=offset,
+        limit=limit,
+        has_more=result.has_more,
+        columns=[RawTableColumn(**field) for field in result.schema],
+        rows=result.rows,
     )
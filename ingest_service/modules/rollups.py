@@ -0,0 +1,215 @@
+"""
+Per-workshop and per-teacher totals kept up to date as data is ingested.
+
+Every insert of a recording, survey response or raw document adds its
+contribution to the `rollup_counter` rows of its workshop and teacher in
+the same transaction, so reading a summary is a primary key lookup however
+much history exists. `python -m modules.rollups` recomputes every counter
+from the source tables to repair drift.
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .db import dialect_insert
+from .models_db import AudioRecording, RawDocument, RollupCounter, SurveyResponse
+from .schemas import RollupSummary
+
+SCOPE_WORKSHOP = "workshop"
+SCOPE_TEACHER = "teacher"
+SCOPES = (SCOPE_WORKSHOP, SCOPE_TEACHER)
+
+METRIC_SURVEY_RESPONSES = "survey_responses"
+METRIC_AUDIO_RECORDINGS = "audio_recordings"
+METRIC_TRANSCRIPT_CHARS = "transcript_chars"
+METRIC_AUDIO_SECONDS = "audio_seconds"
+# Followed by the document's `doc_type`.
+METRIC_DOCUMENTS_PREFIX = "documents:"
+
+CounterKey = Tuple[str, int, str]
+
+
+def _contributions(
+    teacher_id: Optional[int], workshop_id: Optional[int], metrics: Dict[str, int]
+) -> Counter:
+    deltas: Counter = Counter()
+    for scope, scope_id in ((SCOPE_WORKSHOP, workshop_id), (SCOPE_TEACHER, teacher_id)):
+        if scope_id is None:
+            continue
+        for metric, value in metrics.items():
+            deltas[(scope, scope_id, metric)] += value
+    return deltas
+
+
+def apply(db: Session, deltas: Counter) -> None:
+    """
+    Add `deltas` to the stored counters, creating missing ones. Does not
+    commit.
+    """
+    rows = [
+        {"scope": scope, "scope_id": scope_id, "metric": metric, "value": value}
+        # Sorted so concurrent transactions lock counter rows in the same
+        # order and cannot deadlock.
+        for (scope, scope_id, metric), value in sorted(deltas.items())
+        if value
+    ]
+    if not rows:
+        return
+    statement = dialect_insert(db)(RollupCounter)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["scope", "scope_id", "metric"],
+            set_={"value": RollupCounter.value + statement.excluded.value},
+        ),
+        rows,
+    )
+
+
+def record_recording(
+    db: Session,
+    *,
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+    transcript_text: Optional[str],
+    duration_sec: Optional[int],
+) -> None:
+    apply(
+        db,
+        _contributions(
+            teacher_id,
+            workshop_id,
+            {
+                METRIC_AUDIO_RECORDINGS: 1,
+                METRIC_TRANSCRIPT_CHARS: len(transcript_text or ""),
+                METRIC_AUDIO_SECONDS: duration_sec or 0,
+            },
+        ),
+    )
+
+
+def record_survey_responses(
+    db: Session, owners: Iterable[Tuple[Optional[int], Optional[int]]]
+) -> None:
+    """
+    Count inserted survey responses, given as `(teacher_id, workshop_id)`
+    pairs.
+    """
+    deltas: Counter = Counter()
+    for teacher_id, workshop_id in owners:
+        deltas.update(_contributions(teacher_id, workshop_id, {METRIC_SURVEY_RESPONSES: 1}))
+    apply(db, deltas)
+
+
+def record_document(
+    db: Session,
+    *,
+    teacher_id: Optional[int],
+    workshop_id: Optional[int],
+    doc_type: str,
+) -> None:
+    apply(db, _contributions(teacher_id, workshop_id, {METRIC_DOCUMENTS_PREFIX + doc_type: 1}))
+
+
+def summarize(scope: str, scope_id: int, counters: Dict[str, int]) -> RollupSummary:
+    recordings = counters.get(METRIC_AUDIO_RECORDINGS, 0)
+    documents_by_type = {
+        metric[len(METRIC_DOCUMENTS_PREFIX) :]: value
+        for metric, value in counters.items()
+        if metric.startswith(METRIC_DOCUMENTS_PREFIX)
+    }
+    return RollupSummary(
+        scope=scope,
+        scope_id=scope_id,
+        survey_responses=counters.get(METRIC_SURVEY_RESPONSES, 0),
+        audio_recordings=recordings,
+        recorded_minutes=round(counters.get(METRIC_AUDIO_SECONDS, 0) / 60, 2),
+        average_transcript_length=(
+            round(counters.get(METRIC_TRANSCRIPT_CHARS, 0) / recordings, 1)
+            if recordings
+            else None
+        ),
+        documents=sum(documents_by_type.values()),
+        documents_by_type=documents_by_type,
+    )
+
+
+async def get_summary(db: AsyncSession, scope: str, scope_id: int) -> RollupSummary:
+    rows = await db.execute(
+        select(RollupCounter.metric, RollupCounter.value).where(
+            RollupCounter.scope == scope, RollupCounter.scope_id == scope_id
+        )
+    )
+    return summarize(scope, scope_id, {metric: value for metric, value in rows})
+
+
+def rebuild(db: Session) -> int:
+    """
+    Recompute every counter from the source tables in one transaction and
+    return how many were written. Inserts committed while this runs can be
+    counted twice or not at all, so run it while ingestion is idle.
+    """
+    owners = {SCOPE_WORKSHOP: "workshop_id", SCOPE_TEACHER: "teacher_id"}
+    deltas: Counter = Counter()
+    for scope, column in owners.items():
+        audio_owner = getattr(AudioRecording, column)
+        for scope_id, recordings, chars, seconds in db.execute(
+            select(
+                audio_owner,
+                func.count(),
+                func.coalesce(func.sum(func.length(AudioRecording.transcript_text)), 0),
+                func.coalesce(func.sum(AudioRecording.duration_sec), 0),
+            )
+            .where(audio_owner.is_not(None))
+            .group_by(audio_owner)
+        ):
+            deltas[(scope, scope_id, METRIC_AUDIO_RECORDINGS)] = recordings
+            deltas[(scope, scope_id, METRIC_TRANSCRIPT_CHARS)] = chars
+            deltas[(scope, scope_id, METRIC_AUDIO_SECONDS)] = seconds
+
+        survey_owner = getattr(SurveyResponse, column)
+        for scope_id, responses in db.execute(
+            select(survey_owner, func.count())
+            .where(survey_owner.is_not(None))
+            .group_by(survey_owner)
+        ):
+            deltas[(scope, scope_id, METRIC_SURVEY_RESPONSES)] = responses
+
+        raw_owner = getattr(RawDocument, column)
+        for scope_id, doc_type, documents in db.execute(
+            select(raw_owner, RawDocument.doc_type, func.count())
+            .where(raw_owner.is_not(None))
+            .group_by(raw_owner, RawDocument.doc_type)
+        ):
+            deltas[(scope, scope_id, METRIC_DOCUMENTS_PREFIX + (doc_type or "unknown"))] = documents
+
+    rows = [
+        {"scope": scope, "scope_id": scope_id, "metric": metric, "value": value}
+        for (scope, scope_id, metric), value in sorted(deltas.items())
+        if value
+    ]
+    db.execute(delete(RollupCounter))
+    if rows:
+        db.execute(insert(RollupCounter), rows)
+    db.commit()
+    return len(rows)
+
+
+def main() -> None:
+    argparse.ArgumentParser(description="Recompute the per-workshop and per-teacher rollups.").parse_args()
+
+    from .db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        print(f"Rebuilt {rebuild(db)} rollup counters.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ Pydantic schemas for API requests and responses.
 
 from __future__ import annotations
 
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -20,14 +21,98 @@ class AudioResult(BaseModel):
     success: bool
     audio_id: Optional[str] = None
     transcript_length: int = 0
+    segment_count: int = 0
+    status: Optional[str] = None
+    cached: bool = False
     errors: List[ApiError] = Field(default_factory=list)
 
 
+class AudioStatus(BaseModel):
+    audio_id: str
+    status: str
+    attempts: int = 0
+    transcript_text: Optional[str] = None
+    transcript_length: int = 0
+    duration_sec: Optional[int] = None
+    errors: List[ApiError] = Field(default_factory=list)
+
+
+class TranscriptWord(BaseModel):
+    start: float
+    end: float
+    word: str
+    probability: Optional[float] = None
+
+
+class TranscriptSegmentOut(BaseModel):
+    seq: int
+    start: float
+    end: float
+    text: str
+    words: Optional[List[TranscriptWord]] = None
+
+
+class AudioSegments(BaseModel):
+    audio_id: str
+    start: Optional[float] = None
+    end: Optional[float] = None
+    segments: List[TranscriptSegmentOut] = Field(default_factory=list)
+
+
+class AudioStreamEvent(BaseModel):
+    """
+    One line of `POST /audio/upload/stream`: a decoded `segment`, then a
+    final `result`.
+    """
+
+    event: str
+    segment: Optional[TranscriptSegmentOut] = None
+    result: Optional[AudioResult] = None
+
+
+class WhisperModelInfo(BaseModel):
+    size: str
+    compute_type: str
+    device: str
+    load_seconds: float
+    resident_mb: float
+    loaded_at: datetime
+    last_used_at: datetime
+    uses: int = 0
+
+
+class WhisperModelsResponse(BaseModel):
+    pool: str = "thread"
+    memory_budget_mb: float
+    # None when models live in worker processes this API cannot inspect.
+    resident_mb: Optional[float] = None
+    cpu_threads: int
+    num_workers: int
+    allowed_sizes: List[str] = Field(default_factory=list)
+    loaded: Optional[List[WhisperModelInfo]] = None
+
+
 class SurveyIngestResult(BaseModel):
     success: bool
+    ingest_id: Optional[str] = None
     inserted_rows: int = 0
     skipped_rows: int = 0
+    duplicate_rows: int = 0
     errors: List[ApiError] = Field(default_factory=list)
+    # Teachers merged by fuzzy matching; the rows are stored.
+    warnings: List[ApiError] = Field(default_factory=list)
+
+
+class IngestProgressStatus(BaseModel):
+    ingest_id: str
+    kind: str
+    status: str
+    rows_seen: int = 0
+    inserted_rows: int = 0
+    skipped_rows: int = 0
+    duplicate_rows: int = 0
+    started_at: datetime
+    finished_at: Optional[datetime] = None
 
 
 class RawIngestResult(BaseModel):
@@ -35,7 +120,122 @@ class RawIngestResult(BaseModel):
     raw_id: Optional[str] = None
     has_text: bool = False
     has_table_data: bool = False
+    extraction_status: Optional[str] = None
+    page_count: Optional[int] = None
+    extracted_pages: Optional[int] = None
+    # True when the content was already extracted for an earlier upload.
+    reused_extraction: bool = False
     errors: List[ApiError] = Field(default_factory=list)
+    warnings: List[ApiError] = Field(default_factory=list)
+
+
+class RawTableColumn(BaseModel):
+    name: str
+    type: str
+
+
+class RawTable(BaseModel):
+    raw_id: str
+    sheet: Optional[str] = None
+    sheets: List[str] = Field(default_factory=list)
+    storage: Optional[str] = None
+    row_count: int = 0
+    offset: int = 0
+    limit: int = 0
+    has_more: bool = False
+    columns: List[RawTableColumn] = Field(default_factory=list)
+    rows: List[Dict[str, Any]] = Field(default_factory=list)
+    errors: List[ApiError] = Field(default_factory=list)
+
+
+class BatchFileResult(BaseModel):
+    # Path of the file, inside its archive for ZIP members.
+    filename: str
+    # "audio", "survey" or "raw"; the matching result field is set.
+    pipeline: str
+    success: bool
+    id: Optional[str] = None
+    audio: Optional[AudioResult] = None
+    survey: Optional[SurveyIngestResult] = None
+    raw: Optional[RawIngestResult] = None
+    errors: List[ApiError] = Field(default_factory=list)
+
+
+class BatchIngestResult(BaseModel):
+    success: bool
+    file_count: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    files: List[BatchFileResult] = Field(default_factory=list)
+    errors: List[ApiError] = Field(default_factory=list)
+
+
+class SearchHit(BaseModel):
+    # "audio" (id is an audio id) or "raw" (id is a raw document id).
+    source: str
+    id: str
+    teacher_id: Optional[int] = None
+    workshop_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    title: Optional[str] = None
+    rank: float = 0.0
+    snippet: Optional[str] = None
+
+
+class SearchResults(BaseModel):
+    query: str
+    offset: int = 0
+    limit: int = 0
+    has_more: bool = False
+    hits: List[SearchHit] = Field(default_factory=list)
+    errors: List[ApiError] = Field(default_factory=list)
+
+
+class ListPage(BaseModel):
+    # "audio", "survey" or "raw".
+    entity: str
+    limit: int = 0
+    fields: List[str] = Field(default_factory=list)
+    items: List[Dict[str, Any]] = Field(default_factory=list)
+    # Pass back as `cursor` for the next page; None on the last page.
+    next_cursor: Optional[str] = None
+    errors: List[ApiError] = Field(default_factory=list)
+
+
+class RollupSummary(BaseModel):
+    # "workshop" or "teacher".
+    scope: str
+    scope_id: int
+    survey_responses: int = 0
+    audio_recordings: int = 0
+    recorded_minutes: float = 0.0
+    # Characters per transcript; None until a recording exists.
+    average_transcript_length: Optional[float] = None
+    documents: int = 0
+    documents_by_type: Dict[str, int] = Field(default_factory=dict)
+    errors: List[ApiError] = Field(default_factory=list)
+
+
+class DbPoolStats(BaseModel):
+    # "sync" (SessionLocal) or "async" (AsyncSessionLocal).
+    name: str
+    pool_class: str
+    size: int = 0
+    max_overflow: int = 0
+    checked_out: int = 0
+    overflow: int = 0
+    # checked_out / (size + max_overflow).
+    saturation: float = 0.0
+    checkouts: int = 0
+    # Checkouts slower than DB_POOL_WAIT_THRESHOLD_MS.
+    waits: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class DbPoolStatus(BaseModel):
+    pools: List[DbPoolStats] = Field(default_factory=list)
 
 
 class HealthResponse(BaseModel):
@@ -0,0 +1,315 @@
+"""
+Full-text search over audio transcripts and raw document text.
+
+Text is folded like `utils.normalize_name` (lowercase, accents stripped) so
+"prijimaci zkousky" finds "Přijímací zkoušky". PostgreSQL indexes the folded
+text as a `tsvector` with a GIN index; SQLite uses an FTS5 table. Entries
+are written in the same transaction as the recording or document.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import Float, bindparam, delete, func, insert, null, select, text
+from sqlalchemy.orm import Session
+
+from .models_db import AudioRecording, RawDocument, SearchDocument
+from .schemas import SearchHit, SearchResults
+from .utils import normalize_name
+
+SOURCE_AUDIO = "audio"
+SOURCE_RAW = "raw"
+SOURCES = (SOURCE_AUDIO, SOURCE_RAW)
+
+# No stemming: stock PostgreSQL ships no Czech dictionary.
+TS_CONFIG = "simple"
+MAX_PAGE_SIZE = 100
+SNIPPET_CHARS = 160
+# Only this much of a text is scanned for the snippet.
+SNIPPET_SCAN_CHARS = 200_000
+REBUILD_CHUNK = 500
+
+TOKEN_RE = re.compile(r"\w+")
+
+_fold_table: Dict[str, str] = {}
+
+
+class SearchQueryError(ValueError):
+    code = "SEARCH_BAD_QUERY"
+
+
+def query_terms(query: str) -> List[str]:
+    return TOKEN_RE.findall(normalize_name(query) or "")
+
+
+def _fold_same_length(value: str) -> str:
+    """
+    `normalize_name`-style folding that keeps every character in place, so
+    positions found in the result can be cut from the original text.
+    """
+    for char in set(value) - _fold_table.keys():
+        if char.isascii():
+            folded = char.lower()
+        else:
+            folded = (
+                unicodedata.normalize("NFKD", char.lower())
+                .encode("ascii", "ignore")
+                .decode("ascii")
+            )
+        _fold_table[char] = folded if len(folded) == 1 else char
+    return value.translate({ord(char): _fold_table[char] for char in set(value)})
+
+
+def snippet(value: Optional[str], terms: Sequence[str]) -> Optional[str]:
+    """
+    About `SNIPPET_CHARS` characters of `value` around the first query term.
+    """
+    if not value:
+        return None
+    value = value[:SNIPPET_SCAN_CHARS]
+    match = re.search(
+        r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")",
+        _fold_same_length(value),
+    )
+    start = max(0, match.start() - SNIPPET_CHARS // 3) if match else 0
+    end = min(len(value), start + SNIPPET_CHARS)
+    text_part = " ".join(value[start:end].split())
+    return f"{'…' if start else ''}{text_part}{'…' if end < len(value) else ''}"
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def remove_document(db: Session, source: str, source_id: UUID) -> None:
+    where = (SearchDocument.source == source, SearchDocument.source_id == source_id)
+    if _is_sqlite(db):
+        ids = db.execute(select(SearchDocument.id).where(*where)).scalars().all()
+        if ids:
+            db.execute(
+                text("DELETE FROM search_document_fts WHERE rowid IN :ids").bindparams(
+                    bindparam("ids", expanding=True)
+                ),
+                {"ids": ids},
+            )
+    db.execute(delete(SearchDocument).where(*where))
+
+
+def index_document(
+    db: Session,
+    *,
+    source: str,
+    source_id: UUID,
+    text_content: Optional[str],
+    teacher_id: Optional[int] = None,
+    workshop_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+    title: Optional[str] = None,
+) -> None:
+    """
+    Add or replace the index entry for one transcript or document. Does not
+    commit.
+    """
+    remove_document(db, source, source_id)
+    folded = normalize_name(text_content)
+    if not folded:
+        return
+    values = {
+        "source": source,
+        "source_id": source_id,
+        "teacher_id": teacher_id,
+        "workshop_id": workshop_id,
+        "created_at": created_at,
+        "title": title,
+    }
+    if _is_sqlite(db):
+        document_id = db.execute(
+            insert(SearchDocument).values(**values).returning(SearchDocument.id)
+        ).scalar_one()
+        db.execute(
+            text("INSERT INTO search_document_fts (rowid, body) VALUES (:id, :body)"),
+            {"id": document_id, "body": folded},
+        )
+    else:
+        db.execute(
+            insert(SearchDocument).values(
+                **values, search_vector=func.to_tsvector(TS_CONFIG, folded)
+            )
+        )
+
+
+def _source_texts(db: Session, source: str, ids: Iterable[UUID]) -> Dict[UUID, str]:
+    model, column = (
+        (AudioRecording, AudioRecording.transcript_text)
+        if source == SOURCE_AUDIO
+        else (RawDocument, RawDocument.text_content)
+    )
+    ids = list(ids)
+    if not ids:
+        return {}
+    rows = db.execute(
+        select(model.id, func.substr(column, 1, SNIPPET_SCAN_CHARS)).where(model.id.in_(ids))
+    )
+    return {row[0]: row[1] for row in rows}
+
+
+def search(
+    db: Session,
+    *,
+    query: str,
+    teacher_id: Optional[int] = None,
+    workshop_id: Optional[int] = None,
+    source: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 20,
+) -> SearchResults:
+    """
+    Documents containing every term of `query`, best match first.
+    Raises `SearchQueryError` when the query has no searchable terms.
+    """
+    terms = query_terms(query)
+    if not terms:
+        raise SearchQueryError("Query has no searchable words.")
+    if source is not None and source not in SOURCES:
+        raise SearchQueryError(f"Unknown source '{source}'; use one of {', '.join(SOURCES)}.")
+
+    filters = []
+    if teacher_id is not None:
+        filters.append(SearchDocument.teacher_id == teacher_id)
+    if workshop_id is not None:
+        filters.append(SearchDocument.workshop_id == workshop_id)
+    if source is not None:
+        filters.append(SearchDocument.source == source)
+
+    if _is_sqlite(db):
+        # bm25() is lower for better matches.
+        fts = (
+            text(
+                "SELECT rowid AS id, -bm25(search_document_fts) AS rank "
+                "FROM search_document_fts WHERE search_document_fts MATCH :match"
+            )
+            .bindparams(match=" ".join(f'"{term}"' for term in terms))
+            .columns(id=SearchDocument.id.type, rank=Float())
+            .subquery("fts")
+        )
+        statement = select(SearchDocument, fts.c.rank).join(fts, fts.c.id == SearchDocument.id)
+        rank = fts.c.rank
+    else:
+        ts_query = func.plainto_tsquery(TS_CONFIG, " ".join(terms))
+        rank = func.ts_rank_cd(SearchDocument.search_vector, ts_query)
+        statement = select(SearchDocument, rank.label("rank")).where(
+            SearchDocument.search_vector.op("@@")(ts_query)
+        )
+    rows = db.execute(
+        statement.where(*filters)
+        .order_by(rank.desc(), SearchDocument.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    texts: Dict[UUID, str] = {}
+    for name in SOURCES:
+        texts.update(
+            _source_texts(db, name, (row[0].source_id for row in rows if row[0].source == name))
+        )
+    return SearchResults(
+        query=query,
+        offset=offset,
+        limit=limit,
+        has_more=has_more,
+        hits=[
+            SearchHit(
+                source=document.source,
+                id=str(document.source_id),
+                teacher_id=document.teacher_id,
+                workshop_id=document.workshop_id,
+                created_at=document.created_at,
+                title=document.title,
+                rank=float(score or 0.0),
+                snippet=snippet(texts.get(document.source_id), terms),
+            )
+            for document, score in rows
+        ],
+    )
+
+
+def rebuild(db: Session, *, chunk_size: int = REBUILD_CHUNK) -> int:
+    """
+    Re-index every transcript and document with text, `chunk_size` rows per
+    read and commit. Returns the number of rows visited.
+    """
+    sources = [
+        (
+            SOURCE_AUDIO,
+            AudioRecording.id,
+            select(
+                AudioRecording.id,
+                AudioRecording.transcript_text,
+                AudioRecording.teacher_id,
+                AudioRecording.workshop_id,
+                AudioRecording.created_at,
+                null(),
+            ),
+        ),
+        (
+            SOURCE_RAW,
+            RawDocument.id,
+            select(
+                RawDocument.id,
+                RawDocument.text_content,
+                RawDocument.teacher_id,
+                RawDocument.workshop_id,
+                RawDocument.uploaded_at,
+                RawDocument.original_filename,
+            ),
+        ),
+    ]
+    visited = 0
+    for source, id_column, statement in sources:
+        last_id: Optional[UUID] = None
+        while True:
+            page = statement.order_by(id_column).limit(chunk_size)
+            if last_id is not None:
+                page = page.where(id_column > last_id)
+            rows = db.execute(page).all()
+            if not rows:
+                break
+            for source_id, text_content, teacher_id, workshop_id, created_at, title in rows:
+                index_document(
+                    db,
+                    source=source,
+                    source_id=source_id,
+                    text_content=text_content,
+                    teacher_id=teacher_id,
+                    workshop_id=workshop_id,
+                    created_at=created_at,
+                    title=title,
+                )
+            db.commit()
+            visited += len(rows)
+            last_id = rows[-1][0]
+    return visited
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the full-text search index.")
+    parser.add_argument("--chunk-size", type=int, default=REBUILD_CHUNK)
+    args = parser.parse_args()
+
+    from .db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        print(f"Re-indexed {rebuild(db, chunk_size=args.chunk_size)} rows.")
+
+
+if __name__ == "__main__":
+    main()
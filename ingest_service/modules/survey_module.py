@@ -4,19 +4,51 @@ Survey ingestion pipeline: load Google Form exports, normalize, and store rows.
 
 from __future__ import annotations
 
-import io
+import hashlib
 import json
+import os
+import re
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from uuid import uuid4
 
 import pandas as pd
 import numpy as np
+from pandas.tseries.api import guess_datetime_format
+from fastapi import UploadFile
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from . import progress as progress_registry
+from . import metrics, rollups
+from .db import dialect_insert
 from .models_db import SurveyResponse
+from .progress import IngestIdInUse, IngestProgress
 from .schemas import ApiError, SurveyIngestResult
-from .utils import build_error, clean_email, find_or_create_teacher, normalize_name
+from .table_readers import ColumnTypes, iter_json, iter_xlsx
+from .teacher_resolver import TeacherKey, TeacherResolver
+from .uploads import UploadTooLarge, save_upload
+from .utils import build_error, clean_email, normalize_name
+
+# Rows written per INSERT ... executemany and transaction.
+BATCH_SIZE = max(1, int(os.getenv("SURVEY_BATCH_SIZE", "500")))
+# Fingerprints looked up per `IN (...)` query when skipping known rows.
+FINGERPRINT_LOOKUP_CHUNK = 500
+# Rows read, normalized and released at a time; bounds memory per ingest.
+CHUNK_ROWS = max(1, int(os.getenv("SURVEY_CHUNK_ROWS", "10000")))
 
 TEACHER_COLUMNS = [
     "teacher",
@@ -54,125 +86,520 @@ def _match_column(columns: List[str], candidates: List[str]) -> Optional[str]:
     return None
 
 
-def _load_dataframe(file_bytes: bytes, filename: str) -> pd.DataFrame:
+def _iter_frames(
+    file_path: Path, filename: str, chunk_rows: int = CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the survey as DataFrames of at most `chunk_rows` rows, indexed by
+    their position in the whole file.
+    """
     suffix = Path(filename).suffix.lower()
     if suffix == ".csv":
-        return pd.read_csv(io.BytesIO(file_bytes))
-    if suffix in {".xlsx", ".xls"}:
-        return pd.read_excel(io.BytesIO(file_bytes))
+        with pd.read_csv(file_path, chunksize=chunk_rows) as reader:
+            yield from reader
+        return
+    if suffix == ".xlsx":
+        yield from iter_xlsx(file_path, chunk_rows)
+        return
+    if suffix == ".xls":
+        # xlrd has no row-streaming reader for the legacy format.
+        yield pd.read_excel(file_path)
+        return
     if suffix == ".json":
-        payload = json.loads(file_bytes.decode("utf-8"))
-        if isinstance(payload, list):
-            return pd.DataFrame(payload)
-        if isinstance(payload, dict):
-            return pd.DataFrame(payload.get("rows") or payload.get("data") or [])
-        raise ValueError("JSON payload must be a list or contain 'rows'/'data'.")
+        yield from iter_json(file_path, chunk_rows)
+        return
     raise ValueError("Unsupported survey file format. Use CSV, Excel, or JSON.")
 
 
-def _row_to_dict(row: pd.Series) -> dict:
-    result = {}
-    for key, value in row.items():
-        if pd.isna(value):
-            result[key] = None
+_NUMBER_RE = re.compile(r"\d+")
+
+
+class _NormalizedRow(NamedTuple):
+    index: Hashable
+    raw: Dict[str, Any]
+    teacher_name: Optional[str]
+    teacher_email: Optional[str]
+    normalized_teacher: Optional[str]
+    # None when there is no timestamp; NaT when it could not be parsed.
+    submitted: Optional[pd.Timestamp]
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _map_memoized(values: List[Any], func: Callable[[Any], Any]) -> List[Any]:
+    """
+    Apply `func` once per distinct value; survey columns repeat a lot.
+    """
+    cache: Dict[Any, Any] = {}
+    result = []
+    for value in values:
+        try:
+            mapped = cache[value]
+        except KeyError:
+            mapped = cache[value] = func(value)
+        except TypeError:
+            mapped = func(value)
+        result.append(mapped)
+    return result
+
+
+def _format_key(value: str) -> str:
+    # dateutil resolves day/month/year from each number's length and range,
+    # so strings that agree on these (and everything else) share a format.
+    def number_class(match: "re.Match[str]") -> str:
+        number = int(match.group())
+        size = "m" if number <= 12 else "d" if number <= 31 else "y"
+        return f"<{len(match.group())}{size}>"
+
+    return _NUMBER_RE.sub(number_class, value)
+
+
+def _parse_timestamp(value: Any) -> pd.Timestamp:
+    return pd.to_datetime(value, dayfirst=True, errors="coerce")
+
+
+def _parse_timestamps(values: List[Any]) -> List[Optional[pd.Timestamp]]:
+    """
+    Same result as `pd.to_datetime(value, dayfirst=True, errors="coerce")`
+    per value, but the format is guessed once per shape of string and whole
+    groups are parsed with it in one vectorized call.
+    """
+    parsed: Dict[Any, Optional[pd.Timestamp]] = {}
+    groups: Dict[str, List[str]] = {}
+    for value in values:
+        if isinstance(value, str):
+            if value not in parsed:
+                parsed[value] = None
+                groups.setdefault(_format_key(value), []).append(value)
+
+    for members in groups.values():
+        fmt = guess_datetime_format(members[0], dayfirst=True)
+        if fmt is None or "%z" in fmt or "%Z" in fmt:
+            # No common format, or per-value offsets that must stay per value.
+            for value in members:
+                parsed[value] = _parse_timestamp(value)
+            continue
+        for value, stamp in zip(
+            members, pd.to_datetime(pd.Index(members), format=fmt, errors="coerce")
+        ):
+            parsed[value] = stamp
+
+    result: List[Optional[pd.Timestamp]] = []
+    for value in values:
+        if isinstance(value, str):
+            result.append(parsed[value])
+        elif pd.isna(value):
+            result.append(None)
         elif isinstance(value, pd.Timestamp):
-            result[key] = value.isoformat()
-        elif isinstance(value, datetime):
-            result[key] = value.isoformat()
-        elif isinstance(value, np.generic):
-            result[key] = value.item()
+            result.append(value)
         else:
-            result[key] = value
+            result.append(_parse_timestamp(value))
     return result
 
 
-def process_survey_file(
+def _optional_str(value: Any) -> Optional[str]:
+    return None if pd.isna(value) else str(value)
+
+
+def _clean_name(value: Any) -> Optional[str]:
+    return None if pd.isna(value) else str(value).strip()
+
+
+def _normalize_frame(
+    df: pd.DataFrame,
     *,
-    file_bytes: bytes,
-    filename: str,
-    workshop_id: Optional[int],
+    teacher_col: Optional[str],
+    email_col: Optional[str],
+    timestamp_col: Optional[str],
+) -> List[_NormalizedRow]:
+    """
+    Column-wise equivalent of normalizing `df.iterrows()` row by row.
+
+    Values come from `df.values`, like `iterrows`; callers hold chunk types
+    steady with `ColumnTypes` first.
+    """
+    values = df.values
+    columns = list(df.columns)
+    cells: Dict[Any, List[Any]] = {}
+    raw_columns = []
+    for position, column in enumerate(columns):
+        series = pd.Series(values[:, position], dtype=values.dtype)
+        cells[column] = series.tolist()
+        if series.dtype.kind == "f":
+            raw_columns.append(
+                [None if value != value else value for value in cells[column]]
+            )
+        elif series.dtype.kind in "iub":
+            raw_columns.append(cells[column])
+        else:
+            raw_columns.append([_json_value(value) for value in cells[column]])
+    raw_records = [dict(zip(columns, row)) for row in zip(*raw_columns)]
+
+    size = len(df)
+    teacher_names: List[Optional[str]] = [None] * size
+    if teacher_col:
+        teacher_names = _map_memoized(cells[teacher_col], _clean_name)
+    teacher_emails: List[Optional[str]] = [None] * size
+    if email_col:
+        teacher_emails = _map_memoized(
+            cells[email_col], lambda value: clean_email(_optional_str(value))
+        )
+    normalized = _map_memoized(teacher_names, normalize_name)
+    submitted: List[Optional[pd.Timestamp]] = [None] * size
+    if timestamp_col:
+        submitted = _parse_timestamps(cells[timestamp_col])
+
+    return [
+        _NormalizedRow(*row)
+        for row in zip(
+            df.index, raw_records, teacher_names, teacher_emails, normalized, submitted
+        )
+    ]
+
+
+def _fingerprint_value(value: Any) -> Any:
+    # NaN and None, 3.0 and 3, numpy and Python scalars hash alike, however
+    # pandas typed the column; `raw_data` itself keeps the values as read.
+    if isinstance(value, dict):
+        return {str(key): _fingerprint_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint_value(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def _row_fingerprint(raw_data: Dict[Any, Any], workshop_id: Optional[int]) -> str:
+    """
+    Stable identity of a survey row: sha256 over the canonical JSON of its
+    `raw_data` (sorted keys, no whitespace, values normalized by
+    `_fingerprint_value`) and the workshop it belongs to.
+    """
+    canonical = json.dumps(
+        _fingerprint_value(raw_data),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(f"{workshop_id}|{canonical}".encode("utf-8")).hexdigest()
+
+
+def _drop_known_rows(
+    db: Session, batch: List[Tuple[Any, Dict[str, Any], TeacherKey]]
+) -> List[Tuple[Any, Dict[str, Any], TeacherKey]]:
+    """
+    Remove rows whose fingerprint is already stored or repeats earlier in
+    the batch, using one `IN` query per chunk of fingerprints.
+    """
+    fingerprints = list({values["fingerprint"] for _, values, _ in batch})
+    known = set()
+    for start in range(0, len(fingerprints), FINGERPRINT_LOOKUP_CHUNK):
+        chunk = fingerprints[start : start + FINGERPRINT_LOOKUP_CHUNK]
+        known.update(
+            db.execute(
+                select(SurveyResponse.fingerprint).where(
+                    SurveyResponse.fingerprint.in_(chunk)
+                )
+            ).scalars()
+        )
+    fresh = []
+    for item in batch:
+        fingerprint = item[1]["fingerprint"]
+        if fingerprint not in known:
+            known.add(fingerprint)
+            fresh.append(item)
+    return fresh
+
+
+def _insert_rows(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert rows, ignoring fingerprints stored concurrently in the meantime,
+    and count them in the rollups. Returns how many rows were actually
+    inserted.
+    """
+    insert = dialect_insert(db)
+    inserted = db.execute(
+        insert(SurveyResponse)
+        .on_conflict_do_nothing(index_elements=["fingerprint"])
+        .returning(SurveyResponse.teacher_id, SurveyResponse.workshop_id),
+        rows,
+    ).all()
+    rollups.record_survey_responses(db, inserted)
+    return len(inserted)
+
+
+def _flush_rows(
+    db: Session, batch: List[Tuple[Any, Dict[str, Any]]]
+) -> Tuple[int, int, List[ApiError]]:
+    """
+    Insert a batch of survey rows with one executemany and commit it.
+    Returns `(inserted, duplicates, errors)`.
+
+    When the batch fails it is retried row by row, each row in its own
+    savepoint, so only the offending rows are reported and skipped. A
+    failed commit loses the whole transaction, so it is rolled back first.
+    """
+    if not batch:
+        return 0, 0, []
+    try:
+        with db.begin_nested():
+            inserted = _insert_rows(db, [values for _, values in batch])
+    except Exception:
+        # Only the savepoint is gone; the transaction is still usable.
+        pass
+    else:
+        try:
+            db.commit()
+            return inserted, len(batch) - inserted, []
+        except Exception:
+            db.rollback()
+
+    inserted = 0
+    duplicates = 0
+    errors: List[ApiError] = []
+    for idx, values in batch:
+        try:
+            with db.begin_nested():
+                if _insert_rows(db, [values]):
+                    inserted += 1
+                else:
+                    duplicates += 1
+        except Exception as exc:
+            errors.append(
+                build_error(
+                    code="SURVEY_DB_ERROR",
+                    message=f"Unable to store survey row: {exc}",
+                    row_index=idx,
+                )
+            )
+    try:
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        return 0, 0, [
+            build_error(
+                code="SURVEY_DB_ERROR",
+                message=f"Unable to store survey row: {exc}",
+                row_index=idx,
+            )
+            for idx, _ in batch
+        ]
+    return inserted, duplicates, errors
+
+
+def _write_batch(
     db: Session,
-) -> SurveyIngestResult:
+    resolver: TeacherResolver,
+    batch: List[Tuple[Any, Dict[str, Any], TeacherKey]],
+) -> Tuple[int, int, List[ApiError], List[ApiError]]:
+    """
+    Skip rows that are already stored, resolve the teachers of the rest in
+    bulk, then insert them. Returns `(inserted, duplicates, errors,
+    warnings)`.
+    """
+    if not batch:
+        return 0, 0, [], []
+    fresh = _drop_known_rows(db, batch)
+    duplicates = len(batch) - len(fresh)
+    if not fresh:
+        # Nothing to write; end the read-only transaction.
+        db.commit()
+        return 0, duplicates, [], []
+
     errors: List[ApiError] = []
-    inserted = 0
-    skipped = 0
+    warnings: List[ApiError] = []
+    resolved = resolver.resolve_many([key for _, _, key in fresh])
+    rows = []
+    for (idx, values, _), resolution in zip(fresh, resolved):
+        values["teacher_id"] = resolution.teacher_id
+        if resolution.error:
+            errors.append(resolution.error.copy(update={"row_index": idx}))
+        if resolution.warning:
+            warnings.append(resolution.warning.copy(update={"row_index": idx}))
+        rows.append((idx, values))
+    inserted, conflicts, insert_errors = _flush_rows(db, rows)
+    return inserted, duplicates + conflicts, errors + insert_errors, warnings
+
 
+async def ingest_survey_upload(
+    *,
+    upload_file: UploadFile,
+    workshop_id: Optional[int],
+    db: Session,
+    base_dir: Path,
+    ingest_id: Optional[str] = None,
+) -> SurveyIngestResult:
+    """
+    Stream a survey upload to a scratch file, process it, and remove it.
+    Progress is published under `ingest_id` (generated when omitted).
+    """
+    ingest_id = ingest_id or uuid4().hex
     try:
-        df = _load_dataframe(file_bytes, filename)
-    except Exception as exc:
+        progress = progress_registry.registry.start(ingest_id, "survey")
+    except IngestIdInUse as exc:
         return SurveyIngestResult(
             success=False,
-            inserted_rows=0,
-            skipped_rows=0,
-            errors=[
-                build_error(
-                    code="SURVEY_LOAD_ERROR",
-                    message=str(exc),
-                )
-            ],
+            ingest_id=ingest_id,
+            errors=[build_error(code=exc.code, message=str(exc))],
         )
 
-    if df.empty:
-        return SurveyIngestResult(
-            success=False,
-            inserted_rows=0,
-            skipped_rows=0,
-            errors=[
-                build_error(
-                    code="SURVEY_EMPTY",
-                    message="Survey file had no rows.",
+    filename = upload_file.filename or "survey.csv"
+    tmp_dir = base_dir / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_dir / f"{uuid4()}{Path(filename).suffix.lower()}"
+
+    result = SurveyIngestResult(success=False, ingest_id=ingest_id)
+    try:
+        try:
+            with metrics.stage(metrics.PIPELINE_SURVEY, "save"):
+                await save_upload(upload_file, tmp_path)
+        except Exception as exc:
+            if isinstance(exc, UploadTooLarge):
+                error = build_error(code=exc.code, message=str(exc))
+            else:
+                error = build_error(
+                    code="SURVEY_SAVE_ERROR", message=f"Failed to buffer upload: {exc}"
                 )
-            ],
+            result.errors.append(error)
+            return result
+
+        result = await run_in_threadpool(
+            process_survey_file,
+            file_path=tmp_path,
+            filename=filename,
+            workshop_id=workshop_id,
+            db=db,
+            progress=progress,
         )
+        result.ingest_id = ingest_id
+        return result
+    finally:
+        tmp_path.unlink(missing_ok=True)
+        progress_registry.registry.finish(progress, success=result.success)
 
-    columns = list(df.columns)
-    teacher_col = _match_column(columns, TEACHER_COLUMNS)
-    email_col = _match_column(columns, EMAIL_COLUMNS)
-    timestamp_col = _match_column(columns, TIMESTAMP_COLUMNS)
-
-    for idx, row in df.iterrows():
-        row_errors: List[ApiError] = []
-        teacher_name = None
-        teacher_email = None
-
-        if teacher_col:
-            value = row.get(teacher_col)
-            teacher_name = None if pd.isna(value) else str(value).strip()
-
-        if email_col:
-            value = row.get(email_col)
-            teacher_email = clean_email(None if pd.isna(value) else str(value))
-
-        normalized_teacher = normalize_name(teacher_name)
-
-        teacher_id = None
-        if normalized_teacher or teacher_email:
-            teacher_id, teacher_error = find_or_create_teacher(
-                db=db,
-                normalized_name=normalized_teacher,
-                email=teacher_email,
-                original_name=teacher_name,
+
+def process_survey_file(
+    *,
+    file_path: Path,
+    filename: str,
+    workshop_id: Optional[int],
+    db: Session,
+    batch_size: int = BATCH_SIZE,
+    chunk_rows: int = CHUNK_ROWS,
+    progress: Optional[IngestProgress] = None,
+) -> SurveyIngestResult:
+    """
+    Ingest a survey export chunk by chunk: each chunk is normalized and
+    written before the next one is read, so memory stays bounded by
+    `chunk_rows` regardless of the file size.
+
+    A file that fails to load part way through keeps the batches already
+    committed: the result reports them in `inserted_rows` together with
+    `SURVEY_LOAD_ERROR`.
+    """
+    errors: List[ApiError] = []
+    warnings: List[ApiError] = []
+    inserted = 0
+    skipped = 0
+    duplicates = 0
+    seen = 0
+    batch: List[Tuple[Any, Dict[str, Any], TeacherKey]] = []
+    resolver = TeacherResolver(db)
+    started = time.perf_counter()
+
+    def write_batch() -> None:
+        nonlocal inserted, skipped, duplicates, batch
+        with metrics.stage(metrics.PIPELINE_SURVEY, "db_write"):
+            batch_inserted, batch_duplicates, batch_errors, batch_warnings = _write_batch(
+                db, resolver, batch
             )
-            if teacher_error:
-                row_errors.append(teacher_error.copy(update={"row_index": idx}))
-        else:
-            row_errors.append(
-                build_error(
-                    code="TEACHER_INFO_MISSING",
-                    message="Teacher name/email missing for survey row.",
-                    row_index=idx,
+        inserted += batch_inserted
+        duplicates += batch_duplicates
+        skipped += len(batch) - batch_inserted - batch_duplicates
+        errors.extend(batch_errors)
+        warnings.extend(batch_warnings)
+        batch = []
+        if progress is not None:
+            progress.inserted_rows = inserted
+            progress.skipped_rows = skipped
+            progress.duplicate_rows = duplicates
+
+    load_error: Optional[ApiError] = None
+    frames = _iter_frames(file_path, filename, chunk_rows)
+    column_types = ColumnTypes()
+    while True:
+        try:
+            with metrics.stage(metrics.PIPELINE_SURVEY, "read"):
+                df = next(frames, None)
+        except Exception as exc:
+            message = str(exc)
+            if seen:
+                message += (
+                    f" (rows before row {seen} were already written and are counted in"
+                    " inserted_rows; ingesting the corrected file again skips them as"
+                    " duplicates)"
                 )
+            load_error = build_error(
+                code="SURVEY_LOAD_ERROR",
+                message=message,
+                row_index=seen or None,
             )
-            skipped += 1
-            errors.extend(row_errors)
+            break
+        if df is None:
+            break
+        if df.empty:
             continue
+        df = column_types.conform(df)
+        seen += len(df)
+        if progress is not None:
+            progress.rows_seen = seen
+
+        columns = list(df.columns)
+        teacher_col = _match_column(columns, TEACHER_COLUMNS)
+        email_col = _match_column(columns, EMAIL_COLUMNS)
+        timestamp_col = _match_column(columns, TIMESTAMP_COLUMNS)
+
+        with metrics.stage(metrics.PIPELINE_SURVEY, "normalize"):
+            rows = _normalize_frame(
+                df, teacher_col=teacher_col, email_col=email_col, timestamp_col=timestamp_col
+            )
+        del df
+        for idx, row_raw, teacher_name, teacher_email, normalized_teacher, parsed in rows:
+            row_errors: List[ApiError] = []
 
-        submitted_at = None
-        submitted_iso = None
-        if timestamp_col:
-            value = row.get(timestamp_col)
-            if pd.notna(value):
-                parsed = pd.to_datetime(value, dayfirst=True, errors="coerce")
+            if not (normalized_teacher or teacher_email):
+                row_errors.append(
+                    build_error(
+                        code="TEACHER_INFO_MISSING",
+                        message="Teacher name/email missing for survey row.",
+                        row_index=idx,
+                    )
+                )
+                skipped += 1
+                errors.extend(row_errors)
+                continue
+
+            submitted_at = None
+            submitted_iso = None
+            if parsed is not None:
                 if pd.isna(parsed):
                     row_errors.append(
                         build_error(
@@ -190,44 +617,60 @@ def process_survey_file(
                         submitted_at = submitted_at.astimezone(timezone.utc)
                     submitted_iso = submitted_at.isoformat()
 
-        row_raw = _row_to_dict(row)
-        normalized_payload = {
-            "teacher_name": teacher_name,
-            "teacher_email": teacher_email,
-            "normalized_teacher_name": normalized_teacher,
-            "submitted_at": submitted_iso,
-            "workshop_id": workshop_id,
-        }
-
-        response = SurveyResponse(
-            teacher_id=teacher_id,
-            workshop_id=workshop_id,
-            submitted_at=submitted_at,
-            raw_data=row_raw,
-            normalized_data=normalized_payload,
-        )
+            normalized_payload = {
+                "teacher_name": teacher_name,
+                "teacher_email": teacher_email,
+                "normalized_teacher_name": normalized_teacher,
+                "submitted_at": submitted_iso,
+                "workshop_id": workshop_id,
+            }
 
-        try:
-            db.add(response)
-            db.commit()
-            inserted += 1
-        except Exception as exc:
-            db.rollback()
-            row_errors.append(
-                build_error(
-                    code="SURVEY_DB_ERROR",
-                    message=f"Unable to store survey row: {exc}",
-                    row_index=idx,
+            batch.append(
+                (
+                    idx,
+                    {
+                        "workshop_id": workshop_id,
+                        "submitted_at": submitted_at,
+                        "raw_data": row_raw,
+                        "normalized_data": normalized_payload,
+                        "fingerprint": _row_fingerprint(row_raw, workshop_id),
+                    },
+                    (normalized_teacher, teacher_email, teacher_name),
                 )
             )
-            skipped += 1
+            errors.extend(row_errors)
+
+            if len(batch) >= batch_size:
+                write_batch()
+
+        if progress is not None:
+            progress.skipped_rows = skipped
 
-        errors.extend(row_errors)
+    write_batch()
+    metrics.observe_survey(
+        seen=seen,
+        inserted=inserted,
+        duplicates=duplicates,
+        skipped=skipped,
+        seconds=time.perf_counter() - started,
+    )
+
+    if load_error is not None:
+        errors.append(load_error)
+    elif seen == 0:
+        errors.append(
+            build_error(
+                code="SURVEY_EMPTY",
+                message="Survey file had no rows.",
+            )
+        )
 
     success = skipped == 0 and len(errors) == 0
     return SurveyIngestResult(
         success=success,
         inserted_rows=inserted,
         skipped_rows=skipped,
+        duplicate_rows=duplicates,
         errors=errors,
+        warnings=warnings,
     )
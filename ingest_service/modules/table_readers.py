@@ -0,0 +1,198 @@
+"""
+Chunked readers for tabular uploads (CSV/TSV, XLSX, JSON).
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence
+
+import ijson
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+
+
+def _int_cell(value: float) -> Any:
+    if value != value:
+        return None
+    return int(value) if value.is_integer() else value
+
+
+class ColumnTypes:
+    """
+    Holds later chunks to the numeric column types of the first chunk.
+
+    pandas infers types per chunk: an int column reads as float64 in a chunk
+    with a blank, and a column with a blank in the first chunk reads as
+    int64 in a chunk without one. Such columns are converted back (ints and
+    None, or floats); every other column, genuine floats included, is left
+    as read.
+    """
+
+    def __init__(self) -> None:
+        self.kinds: Dict[Any, str] = {}
+
+    def conform(self, df: pd.DataFrame) -> pd.DataFrame:
+        for position, (column, dtype) in enumerate(df.dtypes.items()):
+            first = self.kinds.setdefault(column, dtype.kind)
+            if first in "iu" and dtype.kind == "f":
+                cells = [_int_cell(value) for value in df.iloc[:, position].tolist()]
+                df.isetitem(position, pd.Series(cells, index=df.index, dtype=object))
+            elif first == "f" and dtype.kind in "iu":
+                df.isetitem(position, df.iloc[:, position].astype(float))
+        return df
+
+
+def iter_csv(file_path: Path, chunk_rows: int, sep: str = ",") -> Iterator[pd.DataFrame]:
+    """
+    Yield the file as DataFrames of at most `chunk_rows` rows. Types are
+    inferred per chunk; see `ColumnTypes`.
+    """
+    with pd.read_csv(file_path, sep=sep, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def _excel_value(cell: Any) -> Any:
+    # Mirrors pandas' openpyxl reader so chunks parse like `read_excel`.
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        if value == cell.value:
+            return value
+        return float(cell.value)
+    return cell.value
+
+
+def _open_workbook(handle: BinaryIO):
+    # A file object, because openpyxl rejects paths without an .xlsx suffix
+    # and blob store paths have none.
+    return load_workbook(handle, read_only=True, data_only=True, keep_links=False)
+
+
+def xlsx_sheet_names(file_path: Path) -> List[str]:
+    with file_path.open("rb") as handle:
+        workbook = _open_workbook(handle)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+
+
+def iter_xlsx(
+    file_path: Path, chunk_rows: int, sheet_index: int = 0
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield one worksheet (the first by default) as DataFrames of at most
+    `chunk_rows` rows, streamed through openpyxl's read-only mode.
+
+    Cells beyond the header row become `Unnamed: N` columns, as with
+    `read_excel`; when they first appear in a later chunk, that chunk and
+    the following ones get the extra columns.
+    """
+    with file_path.open("rb") as handle:
+        workbook = _open_workbook(handle)
+        try:
+            sheet = workbook.worksheets[sheet_index]
+            columns: Optional[List[Any]] = None
+            width = 0
+            offset = 0
+            pending: List[List[Any]] = []
+            blank_run: List[List[Any]] = []
+
+            def frame(rows: List[List[Any]]) -> pd.DataFrame:
+                nonlocal columns, offset
+                rows = [row + [""] * (width - len(row)) for row in rows]
+                if columns is None:
+                    df = TextParser(rows, header=0).read()
+                    columns = list(df.columns)
+                else:
+                    columns += [f"Unnamed: {index}" for index in range(len(columns), width)]
+                    df = TextParser(rows, header=None, names=columns).read()
+                df.index = pd.RangeIndex(offset, offset + len(df))
+                offset += len(df)
+                return df
+
+            for row in sheet.iter_rows():
+                values = [_excel_value(cell) for cell in row]
+                while values and values[-1] == "":
+                    values.pop()
+                if not width and not values:
+                    continue
+                width = max(width, len(values))
+                if not values:
+                    # Trailing blank rows are dropped, inner ones kept as NaN rows.
+                    blank_run.append(values)
+                    continue
+                pending.extend(blank_run)
+                blank_run = []
+                pending.append(values)
+                # The first chunk also carries the header row.
+                if len(pending) >= chunk_rows + (columns is None):
+                    yield frame(pending)
+                    pending = []
+            if pending:
+                yield frame(pending)
+        finally:
+            workbook.close()
+
+
+def _json_prefix(file_path: Path) -> Sequence[str]:
+    with file_path.open("rb") as handle:
+        for event_prefix, event, _ in ijson.parse(handle):
+            if event == "start_array" and event_prefix == "":
+                return ["item"]
+            if event == "start_map" and event_prefix == "":
+                return ["rows.item", "data.item"]
+            break
+    raise ValueError("JSON payload must be a list or contain 'rows'/'data'.")
+
+
+def iter_json_records(
+    file_path: Path, chunk_rows: int, *, whole_payload: bool = False
+) -> Iterator[List[Any]]:
+    """
+    Yield the items of a top-level JSON list, or of its `rows` (else `data`)
+    list, in lists of at most `chunk_rows`. With `whole_payload`, any other
+    document is yielded as a single record instead of raising.
+    """
+    try:
+        prefixes = _json_prefix(file_path)
+    except ValueError:
+        if not whole_payload:
+            raise
+        with file_path.open("r", encoding="utf-8") as handle:
+            yield [json.load(handle)]
+        return
+    seen = 0
+    for prefix in prefixes:
+        with file_path.open("rb") as handle:
+            records: List[Any] = []
+            for record in ijson.items(handle, prefix, use_float=True):
+                records.append(record)
+                if len(records) >= chunk_rows:
+                    yield records
+                    seen += len(records)
+                    records = []
+            if records:
+                yield records
+                seen += len(records)
+        if seen:
+            # Like `payload.get("rows") or payload.get("data")`.
+            return
+    if whole_payload and len(prefixes) > 1:
+        with file_path.open("r", encoding="utf-8") as handle:
+            yield [json.load(handle)]
+
+
+def iter_json(file_path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    offset = 0
+    for records in iter_json_records(file_path, chunk_rows):
+        yield pd.DataFrame(records, index=range(offset, offset + len(records)))
+        offset += len(records)
@@ -0,0 +1,513 @@
+"""
+Columnar (Parquet) storage for tables extracted from raw documents.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from .schemas import ApiError
+from .table_readers import ColumnTypes, iter_csv, iter_json_records, iter_xlsx, xlsx_sheet_names
+from .utils import build_error
+
+# "jsonb" keeps tables in `raw_document.table_data`; "parquet" writes a
+# sidecar file next to the upload and stores only its schema and row count.
+STORAGE = os.getenv("RAW_TABLE_STORAGE", "jsonb").lower()
+COMPRESSION = os.getenv("RAW_TABLE_COMPRESSION", "zstd")
+ROW_GROUP_ROWS = max(1, int(os.getenv("RAW_TABLE_ROW_GROUP_ROWS", "65536")))
+# Rows parsed at a time. The first chunk of each table is the sample its
+# Parquet column types are inferred from.
+CHUNK_ROWS = max(1, int(os.getenv("RAW_TABLE_CHUNK_ROWS", "50000")))
+# Rows kept per table in `table_data` JSONB (0 = no limit, the default).
+# Parquet sidecars are written in full.
+MAX_ROWS = max(0, int(os.getenv("RAW_TABLE_MAX_ROWS", "0")))
+MAX_SLICE_ROWS = 10_000
+
+FILTER_OPS = {
+    "eq": pc.equal,
+    "ne": pc.not_equal,
+    "lt": pc.less,
+    "le": pc.less_equal,
+    "gt": pc.greater,
+    "ge": pc.greater_equal,
+}
+
+_local_fs = fs.LocalFileSystem(use_mmap=True)
+
+
+class TableQueryError(ValueError):
+    code = "RAW_TABLE_BAD_QUERY"
+
+
+@dataclass
+class TableSlice:
+    schema: List[Dict[str, str]]
+    row_count: int
+    rows: List[Dict[str, Any]]
+    has_more: bool
+
+
+def _cell_text(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _column_array(values: pd.Series) -> pa.Array:
+    """
+    Arrow array for a column, falling back to strings (JSON for nested
+    values) when its Python values do not share one Arrow type.
+    """
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.array([_cell_text(value) for value in values], type=pa.string())
+
+
+def frame_to_arrow(df: pd.DataFrame) -> pa.Table:
+    names = [str(name) for name in df.columns]
+    arrays = [_column_array(df.iloc[:, position]) for position in range(len(names))]
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def records_to_arrow(records: Sequence[Any]) -> Optional[pa.Table]:
+    """
+    Arrow table for a JSON payload; `None` when it is not a list of objects.
+    """
+    if not records or not all(isinstance(record, dict) for record in records):
+        return None
+    return frame_to_arrow(pd.DataFrame.from_records(records))
+
+
+def schema_fields(schema: pa.Schema) -> List[Dict[str, str]]:
+    return [{"name": field.name, "type": str(field.type)} for field in schema]
+
+
+Chunk = Union[pd.DataFrame, List[Any]]
+
+
+def _safe_table_records(df: pd.DataFrame) -> list:
+    float_columns = [name for name, dtype in df.dtypes.items() if dtype.kind == "f"]
+    records = df.where(pd.notnull(df), None).to_dict(orient="records")
+    if float_columns:
+        # `where` cannot put None into a float column; it stays NaN there.
+        for record in records:
+            for name in float_columns:
+                value = record[name]
+                if value != value:
+                    record[name] = None
+    return records
+
+
+def _conform(values: pd.Series, target: pa.DataType) -> Tuple[pa.Array, int]:
+    """
+    Cast a later chunk's column to the type inferred from the sample.
+    Returns the array and how many cells could not be represented (stored
+    as null).
+    """
+    try:
+        return pa.array(values, type=target, from_pandas=True), 0
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    if pa.types.is_string(target):
+        return pa.array([_cell_text(value) for value in values], type=target), 0
+    cells: List[Any] = []
+    lost = 0
+    for value in values:
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            cells.append(None)
+            continue
+        try:
+            cells.append(pa.scalar(value).cast(target).as_py())
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            cells.append(None)
+            lost += 1
+    return pa.array(cells, type=target), lost
+
+
+class _ParquetSink:
+    """
+    Streams chunks into a Parquet file whose schema comes from the first
+    chunk; later chunks are cast to it.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.schema: Optional[pa.Schema] = None
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.row_count = 0
+        self.lost_cells: Dict[str, int] = {}
+        self.extra_columns: Dict[str, None] = {}
+        self.skipped_records = 0
+
+    def write(self, chunk: Chunk) -> bool:
+        if isinstance(chunk, list):
+            records = [record for record in chunk if isinstance(record, dict)]
+            self.skipped_records += len(chunk) - len(records)
+            chunk = pd.DataFrame.from_records(records)
+        if self.schema is None:
+            table = frame_to_arrow(chunk)
+            self.schema = pa.schema(
+                [
+                    pa.field(item.name, pa.string() if pa.types.is_null(item.type) else item.type)
+                    for item in table.schema
+                ]
+            )
+            table = table.cast(self.schema)
+            self.writer = pq.ParquetWriter(str(self.path), self.schema, compression=COMPRESSION)
+        else:
+            positions = {str(name): index for index, name in enumerate(chunk.columns)}
+            for name in positions:
+                if name not in self.schema.names:
+                    self.extra_columns[name] = None
+            arrays = []
+            for item in self.schema:
+                position = positions.get(item.name)
+                if position is None:
+                    arrays.append(pa.nulls(len(chunk), item.type))
+                    continue
+                array, lost = _conform(chunk.iloc[:, position], item.type)
+                if lost:
+                    self.lost_cells[item.name] = self.lost_cells.get(item.name, 0) + lost
+                arrays.append(array)
+            table = pa.Table.from_arrays(arrays, schema=self.schema)
+        self.writer.write_table(table, row_group_size=ROW_GROUP_ROWS)
+        self.row_count += table.num_rows
+        return True
+
+    def close(self, sheet: Optional[str]) -> Tuple[Dict[str, Any], Any, List[ApiError]]:
+        if self.writer is not None:
+            self.writer.close()
+        warnings = [
+            build_error(
+                code="RAW_TABLE_TYPE_MISMATCH",
+                message=(
+                    f"{lost} value(s) did not match the sampled type "
+                    f"{self.schema.field(name).type} and were stored as null."
+                ),
+                column=name,
+            )
+            for name, lost in self.lost_cells.items()
+        ]
+        if self.extra_columns:
+            warnings.append(
+                build_error(
+                    code="RAW_TABLE_EXTRA_COLUMNS",
+                    message=(
+                        "Columns first seen after the sampled rows were dropped: "
+                        f"{', '.join(self.extra_columns)}."
+                    ),
+                )
+            )
+        if self.skipped_records:
+            warnings.append(
+                build_error(
+                    code="RAW_TABLE_SKIPPED_RECORDS",
+                    message=f"{self.skipped_records} JSON item(s) were not objects and were dropped.",
+                )
+            )
+        meta = {
+            "sheet": sheet,
+            "path": str(self.path),
+            "row_count": self.row_count,
+            "columns": schema_fields(self.schema) if self.schema is not None else [],
+        }
+        return meta, None, warnings
+
+
+class _RecordsSink:
+    """
+    Collects up to `max_rows` rows as JSON-ready records for `table_data`.
+    """
+
+    def __init__(self, max_rows: int) -> None:
+        self.max_rows = max_rows
+        self.records: List[Any] = []
+        self.truncated = False
+        self.column_types = ColumnTypes()
+
+    def write(self, chunk: Chunk) -> bool:
+        room = self.max_rows - len(self.records) if self.max_rows else len(chunk)
+        if len(chunk) > room:
+            self.truncated = True
+            chunk = chunk.iloc[:room] if isinstance(chunk, pd.DataFrame) else chunk[:room]
+        if isinstance(chunk, pd.DataFrame):
+            self.records.extend(_safe_table_records(self.column_types.conform(chunk)))
+        else:
+            self.records.extend(chunk)
+        return not self.truncated
+
+    def close(self, sheet: Optional[str]) -> Tuple[Dict[str, Any], Any, List[ApiError]]:
+        warnings = []
+        if self.truncated:
+            warnings.append(
+                build_error(
+                    code="RAW_TABLE_TRUNCATED",
+                    message=f"Only the first {self.max_rows} rows were stored.",
+                )
+            )
+        meta = {"sheet": sheet, "path": None, "row_count": len(self.records), "columns": None}
+        return meta, self.records, warnings
+
+
+@dataclass
+class ExtractedTables:
+    # A list of records, `{sheet: records}` for workbooks with several
+    # sheets, or None when every table went to a Parquet sidecar.
+    table_data: Any = None
+    # One entry per table: sheet, sidecar path, row count and columns.
+    sheets: List[Dict[str, Any]] = field(default_factory=list)
+    warnings: List[ApiError] = field(default_factory=list)
+
+    @property
+    def row_count(self) -> int:
+        return sum(sheet["row_count"] for sheet in self.sheets)
+
+
+def _table_sources(
+    file_path: Path, suffix: str, chunk_rows: int
+) -> List[Tuple[Optional[str], Callable[[], Iterator[Chunk]]]]:
+    if suffix in {".csv", ".tsv"}:
+        sep = "," if suffix == ".csv" else "\t"
+        return [(None, lambda: iter_csv(file_path, chunk_rows, sep))]
+    if suffix == ".xlsx":
+        return [
+            (name, lambda index=index: iter_xlsx(file_path, chunk_rows, index))
+            for index, name in enumerate(xlsx_sheet_names(file_path))
+        ]
+    if suffix == ".xls":
+        # xlrd has no row-streaming reader for the legacy format.
+        frames = pd.read_excel(file_path, sheet_name=None)
+        return [(str(name), lambda df=df: iter([df])) for name, df in frames.items()]
+    if suffix == ".json":
+        return [(None, lambda: iter_json_records(file_path, chunk_rows, whole_payload=True))]
+    raise ValueError(f"Unsupported table format '{suffix}'.")
+
+
+def extract_tables(
+    file_path: Path,
+    suffix: str,
+    sidecar_stem: Path,
+    *,
+    storage: str = STORAGE,
+    chunk_rows: int = CHUNK_ROWS,
+    max_rows: int = MAX_ROWS,
+) -> ExtractedTables:
+    """
+    Stream every table of an upload (each worksheet of a workbook) chunk by
+    chunk into a Parquet sidecar or into JSONB records (capped at
+    `max_rows`, if set). With Parquet, memory is bounded by `chunk_rows`
+    rather than by the file. JSON payloads that are not a list of objects
+    always stay in JSONB.
+
+    `table_data` is a list of records, except for workbooks with several
+    sheets, which get `{sheet: records}`.
+    """
+    sources = _table_sources(file_path, suffix, chunk_rows)
+    result = ExtractedTables()
+    data: Dict[Optional[str], Any] = {}
+    for index, (sheet, chunks) in enumerate(sources):
+        sink: Optional[Union[_ParquetSink, _RecordsSink]] = None
+        for chunk in chunks():
+            if sink is None:
+                objects = isinstance(chunk, pd.DataFrame) or all(
+                    isinstance(record, dict) for record in chunk
+                )
+                if storage == "parquet" and objects:
+                    suffix_part = f".{index}.parquet" if len(sources) > 1 else ".parquet"
+                    sink = _ParquetSink(sidecar_stem.with_name(sidecar_stem.name + suffix_part))
+                else:
+                    sink = _RecordsSink(max_rows)
+            if not sink.write(chunk):
+                break
+        if sink is None:
+            if suffix != ".json":
+                continue
+            # An empty JSON list is still an (empty) table.
+            sink = _RecordsSink(max_rows)
+        meta, records, warnings = sink.close(sheet)
+        result.sheets.append(meta)
+        result.warnings.extend(
+            warning.copy(update={"message": f"Sheet '{sheet}': {warning.message}"})
+            if sheet and len(sources) > 1
+            else warning
+            for warning in warnings
+        )
+        if records is not None:
+            data[sheet] = records
+    if data:
+        result.table_data = next(iter(data.values())) if len(sources) == 1 else data
+    return result
+
+
+def parse_filters(filters: Iterable[str], schema: pa.Schema) -> Optional[pc.Expression]:
+    """
+    Turn `column:op:value` strings (op in eq, ne, lt, le, gt, ge) into one
+    Arrow expression; values are cast to the column's type.
+    """
+    expression: Optional[pc.Expression] = None
+    for raw in filters:
+        column, sep, rest = raw.partition(":")
+        op, sep2, value = rest.partition(":")
+        if not sep or not sep2 or op not in FILTER_OPS:
+            raise TableQueryError(
+                f"Invalid filter '{raw}'; expected column:op:value with op in "
+                f"{', '.join(FILTER_OPS)}."
+            )
+        if column not in schema.names:
+            raise TableQueryError(f"Unknown column '{column}'.")
+        field_type = schema.field(column).type
+        try:
+            scalar = pa.scalar(value).cast(field_type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as exc:
+            raise TableQueryError(
+                f"Filter value '{value}' does not fit column '{column}' ({field_type})."
+            ) from exc
+        condition = FILTER_OPS[op](pc.field(column), scalar)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _check_columns(columns: Optional[Sequence[str]], schema: pa.Schema) -> Optional[List[str]]:
+    if not columns:
+        return None
+    unknown = [column for column in columns if column not in schema.names]
+    if unknown:
+        raise TableQueryError(f"Unknown column(s): {', '.join(unknown)}.")
+    return list(columns)
+
+
+def _json_cell(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value
+
+
+def _rows(table: pa.Table) -> List[Dict[str, Any]]:
+    return [
+        {key: _json_cell(value) for key, value in row.items()}
+        for row in table.to_pylist()
+    ]
+
+
+def _take(batches: Iterable[pa.RecordBatch], offset: int, limit: int) -> Tuple[pa.Table, bool]:
+    """
+    Rows `offset..offset+limit` of a batch stream, reading one row past the
+    slice to tell whether more rows follow, then stopping.
+    """
+    taken: List[pa.RecordBatch] = []
+    wanted = limit + 1
+    schema = None
+    for batch in batches:
+        schema = batch.schema
+        if offset >= batch.num_rows:
+            offset -= batch.num_rows
+            continue
+        part = batch.slice(offset, wanted)
+        offset = 0
+        taken.append(part)
+        wanted -= part.num_rows
+        if wanted <= 0:
+            break
+    if not taken:
+        return (pa.Table.from_batches([], schema=schema) if schema else pa.table({})), False
+    table = pa.Table.from_batches(taken)
+    return table.slice(0, limit), table.num_rows > limit
+
+
+def read_parquet_slice(
+    path: str,
+    *,
+    columns: Optional[Sequence[str]] = None,
+    filters: Sequence[str] = (),
+    offset: int = 0,
+    limit: int = 100,
+) -> TableSlice:
+    """
+    Read a projection and row slice of a Parquet sidecar through a
+    memory-mapped file. Without filters only the row groups covering the
+    slice are decoded; with filters the predicate is pushed down to the
+    scan (row groups whose statistics rule it out are skipped) and the scan
+    stops as soon as the slice is full.
+    """
+    parquet = pq.ParquetFile(path, memory_map=True)
+    schema = parquet.schema_arrow
+    selected = _check_columns(columns, schema)
+    expression = parse_filters(filters, schema)
+    row_count = parquet.metadata.num_rows
+    limit = max(0, min(limit, MAX_SLICE_ROWS))
+
+    if expression is None:
+        groups: List[int] = []
+        first = 0
+        start = 0
+        for index in range(parquet.metadata.num_row_groups):
+            rows = parquet.metadata.row_group(index).num_rows
+            if start + rows > offset and start < offset + limit:
+                if not groups:
+                    first = start
+                groups.append(index)
+            start += rows
+        table = (
+            parquet.read_row_groups(groups, columns=selected)
+            if groups
+            else schema.empty_table().select(selected or schema.names)
+        )
+        table = table.slice(offset - first if groups else 0, limit)
+        has_more = offset + limit < row_count
+    else:
+        dataset = ds.dataset(path, format="parquet", filesystem=_local_fs)
+        scanner = dataset.scanner(columns=selected, filter=expression)
+        table, has_more = _take(scanner.to_batches(), offset, limit)
+
+    fields = schema_fields(pa.schema([schema.field(name) for name in (selected or schema.names)]))
+    return TableSlice(schema=fields, row_count=row_count, rows=_rows(table), has_more=has_more)
+
+
+def read_records_slice(
+    records: Sequence[Any],
+    *,
+    columns: Optional[Sequence[str]] = None,
+    filters: Sequence[str] = (),
+    offset: int = 0,
+    limit: int = 100,
+) -> TableSlice:
+    """
+    Same as `read_parquet_slice` for a table kept in `table_data` JSONB.
+    """
+    table = records_to_arrow(records)
+    if table is None:
+        raise TableQueryError("Table data is not a list of records.")
+    selected = _check_columns(columns, table.schema)
+    expression = parse_filters(filters, table.schema)
+    limit = max(0, min(limit, MAX_SLICE_ROWS))
+    if expression is not None:
+        table = table.filter(expression)
+    if selected:
+        table = table.select(selected)
+    page = table.slice(offset, limit)
+    return TableSlice(
+        schema=schema_fields(table.schema),
+        row_count=len(records),
+        rows=_rows(page),
+        has_more=offset + limit < table.num_rows,
+    )
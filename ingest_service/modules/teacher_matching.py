@@ -0,0 +1,264 @@
+"""
+Fuzzy teacher name matching backed by an in-memory blocking index.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .models_db import Teacher
+
+# Off by default: with it, a new name close to an existing teacher's is
+# merged into that teacher instead of creating a row.
+FUZZY_ENABLED = os.getenv("TEACHER_FUZZY_MATCH", "0").lower() not in {"0", "false", "no"}
+# Minimum similarity (0..1) for a name to be matched to an existing teacher.
+MATCH_THRESHOLD = float(os.getenv("TEACHER_MATCH_THRESHOLD", "0.94"))
+# Candidates scoring within this distance of the best one make a match ambiguous.
+AMBIGUITY_MARGIN = float(os.getenv("TEACHER_MATCH_MARGIN", "0.02"))
+# Score of an initial ("j") against a full token starting with it ("jan").
+INITIAL_SCORE = 0.9
+# Blocks larger than this (common first names) are only scanned when a name
+# has no smaller block; the surname blocks are selective enough on their own.
+MAX_BLOCK_SIZE = int(os.getenv("TEACHER_MATCH_MAX_BLOCK", "256"))
+REFRESH_CHUNK = 5000
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+Tokens = Tuple[str, ...]
+
+
+def name_tokens(normalized_name: Optional[str]) -> Tokens:
+    """
+    Alphanumeric tokens of a name already passed through `normalize_name`.
+    """
+    if not normalized_name:
+        return ()
+    return tuple(TOKEN_RE.findall(normalized_name))
+
+
+def soundex(token: str) -> str:
+    code = token[0]
+    last = SOUNDEX_CODES.get(token[0], "")
+    for char in token[1:]:
+        digit = SOUNDEX_CODES.get(char, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if char not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+
+def blocking_keys(tokens: Tokens) -> Set[str]:
+    """
+    Keys under which a name is filed. Two names are compared only when they
+    share a key, so the keys must be coarse enough to catch the variants we
+    want to merge:
+
+    - every full token paired with the initial of each other token, which
+      covers reordered names ("novak jan") and abbreviations ("j novak");
+    - the same with the token's Soundex code, for spelling slips;
+    - the sorted tokens themselves, for single-token names.
+    """
+    keys = {"tok:" + " ".join(sorted(tokens))}
+    for position, token in enumerate(tokens):
+        if len(token) < 2:
+            continue
+        code = soundex(token)
+        for other_position, other in enumerate(tokens):
+            if other_position != position:
+                keys.add(f"ini:{token}|{other[0]}")
+                keys.add(f"sx:{code}|{other[0]}")
+    return keys
+
+
+def _token_similarity(left: str, right: str) -> float:
+    if left == right:
+        return 1.0
+    if len(left) == 1 or len(right) == 1:
+        return INITIAL_SCORE if left[0] == right[0] else 0.0
+    return SequenceMatcher(None, left, right).ratio()
+
+
+def similarity(left: Tokens, right: Tokens) -> float:
+    """
+    Order-insensitive name similarity in 0..1: tokens are paired greedily
+    with their best counterpart and unpaired tokens count as zero.
+    """
+    if not left or not right:
+        return 0.0
+    if sorted(left) == sorted(right):
+        return 1.0
+    shorter, longer = sorted((left, right), key=len)
+    remaining = list(longer)
+    total = 0.0
+    for token in shorter:
+        best_position, best_score = None, 0.0
+        for position, other in enumerate(remaining):
+            score = _token_similarity(token, other)
+            if score > best_score:
+                best_position, best_score = position, score
+        if best_position is not None:
+            total += best_score
+            remaining.pop(best_position)
+    return 2 * total / (len(left) + len(right))
+
+
+@dataclass
+class FuzzyMatch:
+    """
+    Best-scoring candidates for a name. More than one key means the name
+    is ambiguous and should not be merged automatically.
+    """
+
+    score: float
+    keys: List[Hashable] = field(default_factory=list)
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.keys) > 1
+
+
+class NameIndex:
+    """
+    Blocking index from name keys to the items (teacher ids, staged
+    entries, ...) filed under them.
+    """
+
+    def __init__(self) -> None:
+        self._blocks: Dict[str, Set[Hashable]] = {}
+        self._names: Dict[Hashable, Tuple[Tokens, Optional[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, key: Hashable, normalized_name: Optional[str], email: Optional[str]) -> None:
+        tokens = name_tokens(normalized_name)
+        if not tokens or key in self._names:
+            return
+        self._names[key] = (tokens, email.lower() if email else None)
+        for block in blocking_keys(tokens):
+            self._blocks.setdefault(block, set()).add(key)
+
+    def clear(self) -> None:
+        self._blocks.clear()
+        self._names.clear()
+
+    def candidates(self, tokens: Tokens) -> Set[Hashable]:
+        blocks = [self._blocks[key] for key in blocking_keys(tokens) if key in self._blocks]
+        selective = [block for block in blocks if len(block) <= MAX_BLOCK_SIZE]
+        if not selective and blocks:
+            selective = [min(blocks, key=len)]
+        found: Set[Hashable] = set()
+        for block in selective:
+            found.update(block)
+        return found
+
+    def match(
+        self,
+        normalized_name: Optional[str],
+        email: Optional[str] = None,
+        *,
+        threshold: float = MATCH_THRESHOLD,
+        margin: float = AMBIGUITY_MARGIN,
+    ) -> Optional[FuzzyMatch]:
+        """
+        Best candidate scoring at least `threshold`. Candidates with a
+        different email are never matched: they are a different person.
+        """
+        tokens = name_tokens(normalized_name)
+        if not tokens:
+            return None
+        email = email.lower() if email else None
+        scored: List[Tuple[float, Hashable]] = []
+        for key in self.candidates(tokens):
+            candidate_tokens, candidate_email = self._names[key]
+            if email and candidate_email and email != candidate_email:
+                continue
+            score = similarity(tokens, candidate_tokens)
+            if score >= threshold:
+                scored.append((score, key))
+        if not scored:
+            return None
+        best = max(score for score, _ in scored)
+        rivals = sorted(
+            ((score, key) for score, key in scored if best - score <= margin),
+            key=lambda item: -item[0],
+        )
+        return FuzzyMatch(score=best, keys=[key for _, key in rivals])
+
+
+class TeacherIndex(NameIndex):
+    """
+    Process-wide `NameIndex` over the `teacher` table, keyed by teacher id.
+
+    `refresh` costs one aggregate query when nothing changed and otherwise
+    only loads teachers newer than the last one seen. The index is rebuilt
+    from scratch when the row count disagrees with what was loaded (rows
+    deleted, or committed late with a lower id).
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self._max_id = 0
+        self._loaded = 0
+
+    def refresh(self, db: Session) -> None:
+        with self._lock:
+            count, max_id = db.execute(
+                select(func.count(Teacher.id), func.max(Teacher.id))
+            ).one()
+            max_id = max_id or 0
+            if max_id < self._max_id:
+                self._reset()
+            if max_id > self._max_id:
+                self._load(db, after=self._max_id)
+            if count != self._loaded:
+                self._reset()
+                self._load(db, after=0)
+
+    def match(self, *args, **kwargs) -> Optional[FuzzyMatch]:  # type: ignore[override]
+        with self._lock:
+            return super().match(*args, **kwargs)
+
+    def _reset(self) -> None:
+        self.clear()
+        self._max_id = 0
+        self._loaded = 0
+
+    def _load(self, db: Session, *, after: int) -> None:
+        while True:
+            rows = db.execute(
+                select(Teacher.id, Teacher.normalized_name, Teacher.email)
+                .where(Teacher.id > after)
+                .order_by(Teacher.id)
+                .limit(REFRESH_CHUNK)
+            ).all()
+            for row in rows:
+                self.add(row.id, row.normalized_name, row.email)
+            self._loaded += len(rows)
+            if not rows:
+                break
+            after = rows[-1].id
+            self._max_id = max(self._max_id, after)
+
+
+teacher_index = TeacherIndex()
@@ -0,0 +1,324 @@
+"""
+Batch teacher resolution for ingests that repeat the same teachers.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple, TypeVar
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .db import dialect_insert
+from .models_db import Teacher
+from .teacher_matching import FUZZY_ENABLED, NameIndex, teacher_index
+from .schemas import ApiError
+from .utils import build_error
+
+# Keeps `IN (...)` lists under the bind parameter limits of both backends.
+LOOKUP_CHUNK = 500
+
+TeacherKey = Tuple[Optional[str], Optional[str], Optional[str]]
+T = TypeVar("T")
+
+
+@dataclass
+class _Entry:
+    id: Optional[int] = None
+    full_name: Optional[str] = None
+    normalized_name: Optional[str] = None
+    email: Optional[str] = None
+    error: Optional[str] = None
+    error_code: str = "TEACHER_CREATE_ERROR"
+    # Set for names merged into another teacher by fuzzy matching.
+    alias_of: Optional["_Entry"] = None
+    score: Optional[float] = None
+
+
+class TeacherResolution(NamedTuple):
+    teacher_id: Optional[int]
+    error: Optional[ApiError] = None
+    # Reports a fuzzy merge, so it can be audited.
+    warning: Optional[ApiError] = None
+
+
+def _chunks(values: Sequence[T]) -> Iterable[Sequence[T]]:
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        yield values[start : start + LOOKUP_CHUNK]
+
+
+class TeacherResolver:
+    """
+    Resolves `(normalized_name, email, original_name)` to teacher ids in
+    bulk: email first, then normalized name, otherwise create.
+
+    Known teachers are kept in dictionaries for the lifetime of the resolver,
+    so create one per ingest: every distinct email or name costs at most one
+    batched lookup, and new teachers are inserted together with
+    `INSERT ... ON CONFLICT DO NOTHING`. They are committed right away, so
+    the cached ids stay valid when the caller later rolls back its rows.
+
+    With `fuzzy=True`, names without an exact match are looked up in the
+    blocking index of `teacher_matching` before a new teacher is created,
+    so "Novák Jan" and "J. Novák" resolve to an existing "Jan Novák". Every
+    key resolved that way carries a `TEACHER_FUZZY_MATCH` warning.
+    """
+
+    def __init__(self, db: Session, *, fuzzy: bool = FUZZY_ENABLED) -> None:
+        self.db = db
+        self.fuzzy = fuzzy
+        self._by_email: Dict[str, _Entry] = {}
+        self._by_name: Dict[str, _Entry] = {}
+        self._checked_emails: Set[str] = set()
+        self._checked_names: Set[str] = set()
+
+    def resolve(
+        self,
+        *,
+        normalized_name: Optional[str],
+        email: Optional[str],
+        original_name: Optional[str],
+    ) -> TeacherResolution:
+        return self.resolve_many([(normalized_name, email, original_name)])[0]
+
+    def resolve_many(self, keys: Sequence[TeacherKey]) -> List[TeacherResolution]:
+        """
+        Resolve keys in order; a teacher created for an earlier key is
+        matched by later ones just as sequential inserts would be.
+        """
+        self._prefetch(keys)
+        if self.fuzzy and any(
+            self._match(name, email) is None for name, email, _ in keys if name
+        ):
+            teacher_index.refresh(self.db)
+        entries: List[Optional[_Entry]] = []
+        staged: List[_Entry] = []
+        staged_index = NameIndex()
+        for normalized_name, email, original_name in keys:
+            entry = self._match(normalized_name, email)
+            if entry is None and self.fuzzy and normalized_name:
+                entry = self._match_fuzzy(normalized_name, email, staged, staged_index)
+            if entry is None and (normalized_name or email):
+                entry = _Entry(
+                    full_name=original_name,
+                    normalized_name=normalized_name,
+                    email=email,
+                )
+                self._remember(entry)
+                if self.fuzzy:
+                    staged_index.add(len(staged), normalized_name, email)
+                staged.append(entry)
+            entries.append(entry)
+        for chunk in _chunks(staged):
+            self._create(chunk)
+        if staged:
+            self._commit(staged)
+
+        results: List[TeacherResolution] = []
+        for entry in entries:
+            if entry is None:
+                results.append(
+                    TeacherResolution(
+                        None,
+                        build_error(
+                            code="TEACHER_MATCH_ERROR",
+                            message="Teacher information missing (no name/email provided).",
+                        ),
+                    )
+                )
+                continue
+            target = entry.alias_of or entry
+            if target.error:
+                results.append(
+                    TeacherResolution(
+                        None, build_error(code=target.error_code, message=target.error)
+                    )
+                )
+            elif entry.alias_of is not None:
+                warning = build_error(
+                    code="TEACHER_FUZZY_MATCH",
+                    message=(
+                        f"Teacher '{entry.normalized_name}' was merged into teacher "
+                        f"{target.id} by name similarity {entry.score:.2f}."
+                    ),
+                )
+                results.append(TeacherResolution(target.id, None, warning))
+            else:
+                results.append(TeacherResolution(target.id))
+        return results
+
+    def _match(
+        self, normalized_name: Optional[str], email: Optional[str]
+    ) -> Optional[_Entry]:
+        if email and email.lower() in self._by_email:
+            return self._by_email[email.lower()]
+        if normalized_name and normalized_name in self._by_name:
+            return self._by_name[normalized_name]
+        return None
+
+    def _match_fuzzy(
+        self,
+        normalized_name: str,
+        email: Optional[str],
+        staged: Sequence[_Entry],
+        staged_index: NameIndex,
+    ) -> Optional[_Entry]:
+        """
+        Match against stored teachers first, then against teachers staged
+        earlier in this batch. The outcome, including ambiguity, is
+        remembered under the new name and email like an exact match.
+        """
+        match = teacher_index.match(normalized_name, email)
+        if match is not None:
+            if match.ambiguous:
+                candidates = ", ".join(str(key) for key in sorted(match.keys))
+                entry = _Entry(
+                    normalized_name=normalized_name,
+                    email=email,
+                    error=(
+                        f"Teacher '{normalized_name}' is similar to several "
+                        f"teachers ({candidates})."
+                    ),
+                    error_code="TEACHER_AMBIGUOUS",
+                )
+            else:
+                entry = _Entry(
+                    normalized_name=normalized_name,
+                    email=email,
+                    alias_of=_Entry(id=match.keys[0]),
+                    score=match.score,
+                )
+        else:
+            match = staged_index.match(normalized_name, email)
+            if match is None or match.ambiguous:
+                return None
+            entry = _Entry(
+                normalized_name=normalized_name,
+                email=email,
+                alias_of=staged[match.keys[0]],
+                score=match.score,
+            )
+        self._by_name.setdefault(normalized_name, entry)
+        if email:
+            self._by_email.setdefault(email.lower(), entry)
+        return entry
+
+    def _remember(self, entry: _Entry) -> None:
+        if entry.email:
+            self._by_email.setdefault(entry.email.lower(), entry)
+        if entry.normalized_name:
+            self._by_name.setdefault(entry.normalized_name, entry)
+
+    def _prefetch(self, keys: Sequence[TeacherKey]) -> None:
+        emails = sorted(
+            {
+                email.lower()
+                for _, email, _ in keys
+                if email and email.lower() not in self._checked_emails
+            }
+        )
+        names = sorted(
+            {
+                name
+                for name, _, _ in keys
+                if name and name not in self._checked_names
+            }
+        )
+        for chunk in _chunks(emails):
+            rows = self.db.execute(
+                select(Teacher).where(func.lower(Teacher.email).in_(chunk))
+            ).scalars()
+            for teacher in rows:
+                self._remember(self._entry_for(teacher))
+        for chunk in _chunks(names):
+            rows = self.db.execute(
+                select(Teacher)
+                .where(Teacher.normalized_name.in_(chunk))
+                .order_by(Teacher.id)
+            ).scalars()
+            for teacher in rows:
+                self._remember(self._entry_for(teacher))
+        self._checked_emails.update(emails)
+        self._checked_names.update(names)
+
+    def _commit(self, staged: Sequence[_Entry]) -> None:
+        """
+        Make new teachers durable before any row refers to them. If that
+        fails they are forgotten, so later keys look them up again.
+        """
+        try:
+            self.db.commit()
+        except Exception as exc:
+            self.db.rollback()
+            for entry in staged:
+                entry.id = None
+                entry.error = f"Failed to create teacher: {exc}"
+            self._forget(staged)
+
+    def _forget(self, entries: Sequence[_Entry]) -> None:
+        dropped = {id(entry) for entry in entries}
+        for cache, checked in (
+            (self._by_email, self._checked_emails),
+            (self._by_name, self._checked_names),
+        ):
+            for key, entry in list(cache.items()):
+                if id(entry) in dropped or id(entry.alias_of) in dropped:
+                    del cache[key]
+                    checked.discard(key)
+
+    @staticmethod
+    def _entry_for(teacher: Teacher) -> _Entry:
+        return _Entry(
+            id=teacher.id,
+            full_name=teacher.full_name,
+            normalized_name=teacher.normalized_name,
+            email=teacher.email,
+        )
+
+    def _create(self, staged: Sequence[_Entry]) -> None:
+        insert = dialect_insert(self.db)
+        try:
+            with self.db.begin_nested():
+                created = self.db.execute(
+                    insert(Teacher)
+                    .values(
+                        [
+                            {
+                                "full_name": entry.full_name,
+                                "normalized_name": entry.normalized_name,
+                                "email": entry.email,
+                            }
+                            for entry in staged
+                        ]
+                    )
+                    .on_conflict_do_nothing()
+                    .returning(Teacher.id, Teacher.email, Teacher.normalized_name)
+                ).all()
+        except Exception as exc:
+            for entry in staged:
+                entry.error = f"Failed to create teacher: {exc}"
+            return
+
+        by_email = {row.email.lower(): row.id for row in created if row.email}
+        by_name = {row.normalized_name: row.id for row in created if not row.email}
+        for entry in staged:
+            if entry.email:
+                entry.id = by_email.get(entry.email.lower())
+            else:
+                entry.id = by_name.get(entry.normalized_name)
+
+        # Emails skipped by ON CONFLICT were inserted concurrently elsewhere.
+        conflicted = [entry for entry in staged if entry.id is None and entry.email]
+        for chunk in _chunks(sorted({entry.email.lower() for entry in conflicted})):
+            rows = self.db.execute(
+                select(Teacher.id, Teacher.email).where(
+                    func.lower(Teacher.email).in_(chunk)
+                )
+            ).all()
+            existing = {row.email.lower(): row.id for row in rows}
+            for entry in conflicted:
+                entry.id = existing.get(entry.email.lower(), entry.id)
+        for entry in staged:
+            if entry.id is None:
+                entry.error = "Failed to create teacher: no id returned."
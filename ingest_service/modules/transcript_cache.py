@@ -0,0 +1,223 @@
+"""
+Content-addressed transcript cache.
+
+Entries map `sha256(audio) + transcription settings` to an existing
+`AudioRecording`, so re-uploads of the same file reuse its transcript instead
+of running Whisper again. Concurrent uploads of the same content in one
+process share a single in-flight transcription.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, delete, not_, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import transcription
+from .db import dialect_insert
+from .model_registry import ALLOWED_SIZES, ModelSpec
+from .models_db import AudioRecording, TranscriptCacheEntry, TranscriptSegment
+
+CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE", "1") not in {"0", "false", "no"}
+MAX_ENTRIES = max(1, int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "10000")))
+# Bump to drop every cached transcript, e.g. after upgrading faster-whisper.
+CACHE_VERSION = os.getenv("TRANSCRIPT_CACHE_VERSION", "1")
+
+_in_flight: Dict[str, "asyncio.Future[transcription.Transcript]"] = {}
+
+
+def config_key(spec: Optional[ModelSpec] = None, word_timestamps: bool = False) -> str:
+    return f"{transcription.config_key(spec, word_timestamps)}/v{CACHE_VERSION}"
+
+
+def cache_key(
+    content_sha256: str,
+    spec: Optional[ModelSpec] = None,
+    word_timestamps: bool = False,
+) -> str:
+    return f"{content_sha256}:{config_key(spec, word_timestamps)}"
+
+
+def lookup(
+    db: Session,
+    content_sha256: Optional[str],
+    spec: Optional[ModelSpec] = None,
+    word_timestamps: bool = False,
+) -> Optional[transcription.Transcript]:
+    """
+    Return the cached transcript, with its segments, for this content and
+    configuration, if any.
+    """
+    if not CACHE_ENABLED or not content_sha256:
+        return None
+    row = db.execute(
+        select(
+            AudioRecording.id,
+            AudioRecording.transcript_text,
+            AudioRecording.duration_sec,
+        )
+        .join(TranscriptCacheEntry, TranscriptCacheEntry.audio_id == AudioRecording.id)
+        .where(
+            TranscriptCacheEntry.cache_key
+            == cache_key(content_sha256, spec, word_timestamps)
+        )
+    ).first()
+    if row is None:
+        return None
+    segments = db.execute(
+        select(
+            TranscriptSegment.start_sec,
+            TranscriptSegment.end_sec,
+            TranscriptSegment.text,
+            TranscriptSegment.words,
+        )
+        .where(TranscriptSegment.audio_id == row.id)
+        .order_by(TranscriptSegment.seq)
+    ).all()
+    return transcription.Transcript(
+        text=row.transcript_text,
+        duration_sec=row.duration_sec,
+        segments=[
+            transcription.Segment(
+                start=segment.start_sec,
+                end=segment.end_sec,
+                text=segment.text,
+                words=segment.words,
+            )
+            for segment in segments
+        ],
+    )
+
+
+def record(
+    db: Session,
+    *,
+    content_sha256: Optional[str],
+    audio_id: UUID,
+    hit: bool,
+    spec: Optional[ModelSpec] = None,
+    word_timestamps: bool = False,
+) -> None:
+    """
+    Register a stored recording with the cache. Runs in the caller's
+    transaction; the recording must already be added to `db`.
+    """
+    if not CACHE_ENABLED or not content_sha256:
+        return
+    now = datetime.now(timezone.utc)
+    key = cache_key(content_sha256, spec, word_timestamps)
+    if hit:
+        db.execute(
+            update(TranscriptCacheEntry)
+            .where(TranscriptCacheEntry.cache_key == key)
+            .values(last_hit_at=now, hit_count=TranscriptCacheEntry.hit_count + 1)
+        )
+        return
+
+    db.flush()
+    insert = dialect_insert(db)
+    db.execute(
+        insert(TranscriptCacheEntry)
+        .values(
+            cache_key=key,
+            content_sha256=content_sha256,
+            config_key=config_key(spec, word_timestamps),
+            audio_id=audio_id,
+            created_at=now,
+            last_hit_at=now,
+            hit_count=0,
+        )
+        .on_conflict_do_nothing()
+    )
+    evict(db)
+
+
+def evict(db: Session, max_entries: int = MAX_ENTRIES) -> None:
+    """
+    Drop the least recently used entries beyond `max_entries`.
+    """
+    overflow = (
+        select(TranscriptCacheEntry.cache_key)
+        .order_by(TranscriptCacheEntry.last_hit_at.desc())
+        .offset(max_entries)
+    )
+    db.execute(
+        delete(TranscriptCacheEntry)
+        .where(TranscriptCacheEntry.cache_key.in_(overflow))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def invalidate(db: Session, *, all_entries: bool = False) -> int:
+    """
+    Remove entries for models that are no longer enabled or produced with
+    other decoding settings / cache version (or every entry with
+    `all_entries=True`). Called at startup so a configuration change never
+    serves transcripts from a previous setup.
+    """
+    statement = delete(TranscriptCacheEntry)
+    if not all_entries:
+        current_suffix = f"/{transcription.settings_key()}/v{CACHE_VERSION}"
+        enabled_model = or_(
+            *[
+                TranscriptCacheEntry.config_key.startswith(f"{size}/")
+                for size in ALLOWED_SIZES
+            ]
+        )
+        statement = statement.where(
+            not_(
+                and_(
+                    TranscriptCacheEntry.config_key.endswith(current_suffix),
+                    enabled_model,
+                )
+            )
+        )
+    result = db.execute(statement)
+    db.commit()
+    return result.rowcount
+
+
+async def share_in_flight(
+    content_sha256: Optional[str],
+    spec: Optional[ModelSpec],
+    run: Callable[[], Awaitable[transcription.Transcript]],
+    word_timestamps: bool = False,
+) -> transcription.Transcript:
+    """
+    Run `run()` unless the same content is already being transcribed in this
+    process, in which case wait for that result instead.
+    """
+    if not CACHE_ENABLED or not content_sha256:
+        return await run()
+
+    key = cache_key(content_sha256, spec, word_timestamps)
+    pending = _in_flight.get(key)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except transcription.TranscriptionCancelled:
+            # The leader's client went away; transcribe for ourselves.
+            return await run()
+
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        result = await run()
+    except BaseException as exc:
+        if isinstance(exc, asyncio.CancelledError):
+            future.set_exception(transcription.TranscriptionCancelled("Leader cancelled."))
+        else:
+            future.set_exception(exc)
+        # Nobody else may be waiting; mark the exception as retrieved.
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        _in_flight.pop(key, None)
@@ -0,0 +1,412 @@
+"""
+Bounded worker pool that runs Whisper transcription off the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+
+from . import metrics
+from .audio_chunking import SAMPLING_RATE, plan_chunks
+from .model_registry import PRELOAD, ModelRegistry, ModelSpec, parse_specs
+
+LANGUAGE = os.getenv("WHISPER_LANG", "cs")
+POOL_KIND = os.getenv("WHISPER_POOL", "thread").lower()  # "thread" or "process"
+POOL_WORKERS = max(1, int(os.getenv("WHISPER_POOL_WORKERS", "1")))
+MAX_QUEUE_DEPTH = max(0, int(os.getenv("WHISPER_MAX_QUEUE", "8")))
+JOB_TIMEOUT_SEC = float(os.getenv("WHISPER_JOB_TIMEOUT_SEC", "3600"))
+DISCONNECT_POLL_SEC = 0.5
+BEAM_SIZE = 5
+# Recordings at least this long are split at silences and decoded in parallel.
+CHUNK_MIN_SEC = float(os.getenv("WHISPER_CHUNK_MIN_SEC", "600"))
+CHUNK_WORKERS = max(
+    1, int(os.getenv("WHISPER_CHUNK_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+)
+# One CTranslate2 worker per concurrent transcribe() call (pool threads x
+# chunks) by default, splitting the cores between them.
+NUM_WORKERS = int(
+    os.getenv(
+        "WHISPER_NUM_WORKERS",
+        str(CHUNK_WORKERS * (POOL_WORKERS if POOL_KIND == "thread" else 1)),
+    )
+)
+CPU_THREADS = int(
+    os.getenv(
+        "WHISPER_CPU_THREADS",
+        str(max(1, (os.cpu_count() or 1) // NUM_WORKERS) if NUM_WORKERS > 1 else 0),
+    )
+)
+
+registry = ModelRegistry(cpu_threads=CPU_THREADS, num_workers=NUM_WORKERS)
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_chunk_executor: Optional[ThreadPoolExecutor] = None
+_in_flight = 0
+
+
+class TranscriptionError(Exception):
+    """
+    Base error for transcription failures; `code` maps onto `ApiError.code`.
+    """
+
+    code = "AUDIO_TRANSCRIBE_ERROR"
+
+
+class TranscriptionQueueFull(TranscriptionError):
+    code = "AUDIO_QUEUE_FULL"
+
+
+class TranscriptionTimeout(TranscriptionError):
+    code = "AUDIO_TRANSCRIBE_TIMEOUT"
+
+
+class TranscriptionCancelled(TranscriptionError):
+    code = "AUDIO_TRANSCRIBE_CANCELLED"
+
+
+@dataclass
+class Segment:
+    start: float
+    end: float
+    text: str
+    words: Optional[List[Dict[str, Any]]] = None
+
+
+SegmentCallback = Callable[[Segment], None]
+
+
+@dataclass
+class Transcript:
+    text: str
+    duration_sec: Optional[int]
+    segments: List[Segment] = field(default_factory=list)
+    # Seconds spent per stage ("decode", "model_load", "transcribe") by the
+    # worker that produced it; empty for cached transcripts.
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def settings_key() -> str:
+    """
+    Identify the decoding settings shared by every model.
+    """
+    return f"{LANGUAGE}/beam{BEAM_SIZE}"
+
+
+def config_key(spec: Optional[ModelSpec] = None, word_timestamps: bool = False) -> str:
+    """
+    Identify everything that determines transcript output.
+    """
+    words = "+words" if word_timestamps else ""
+    return f"{(spec or ModelSpec()).key}{words}/{settings_key()}"
+
+
+def preload_models() -> None:
+    """
+    Load the models listed in `WHISPER_PRELOAD_MODELS` into this process.
+    """
+    registry.preload(parse_specs(PRELOAD))
+
+
+async def warm_up() -> None:
+    """
+    Preload models where transcriptions will run: in this process for the
+    thread pool, or in every worker process for the process pool.
+    """
+    if POOL_KIND == "process":
+        executor = _get_executor()
+        # Each submission forces a worker to spawn; its initializer preloads.
+        await asyncio.gather(
+            *[
+                asyncio.wrap_future(executor.submit(os.getpid))
+                for _ in range(POOL_WORKERS)
+            ]
+        )
+    else:
+        await asyncio.to_thread(preload_models)
+
+
+def _get_chunk_executor() -> ThreadPoolExecutor:
+    global _chunk_executor
+    if _chunk_executor is None:
+        with _executor_lock:
+            if _chunk_executor is None:
+                _chunk_executor = ThreadPoolExecutor(
+                    max_workers=CHUNK_WORKERS,
+                    thread_name_prefix="whisper-chunk",
+                )
+    return _chunk_executor
+
+
+def _decode_segments(
+    model: WhisperModel,
+    audio: np.ndarray,
+    offset_sec: float,
+    cancel_event: Optional[threading.Event],
+    word_timestamps: bool = False,
+    on_segment: Optional[SegmentCallback] = None,
+) -> List[Segment]:
+    # Whisper decodes lazily while the segment generator is consumed, so the
+    # cancel flag is checked (and `on_segment` fired) segment by segment.
+    segments, _ = model.transcribe(
+        audio,
+        language=LANGUAGE,
+        beam_size=BEAM_SIZE,
+        word_timestamps=word_timestamps,
+    )
+    decoded = []
+    for segment in segments:
+        if cancel_event is not None and cancel_event.is_set():
+            raise TranscriptionCancelled("Transcription cancelled.")
+        words = None
+        if word_timestamps and segment.words:
+            words = [
+                {
+                    "start": round(word.start + offset_sec, 3),
+                    "end": round(word.end + offset_sec, 3),
+                    "word": word.word.strip(),
+                    "probability": round(word.probability, 3),
+                }
+                for word in segment.words
+            ]
+        item = Segment(
+            start=round(segment.start + offset_sec, 3),
+            end=round(segment.end + offset_sec, 3),
+            text=segment.text.strip(),
+            words=words,
+        )
+        decoded.append(item)
+        if on_segment is not None:
+            on_segment(item)
+    return decoded
+
+
+def transcribe_audio(
+    model: WhisperModel,
+    audio: np.ndarray,
+    *,
+    cancel_event: Optional[threading.Event] = None,
+    chunk_executor: Optional[Executor] = None,
+    word_timestamps: bool = False,
+    on_segment: Optional[SegmentCallback] = None,
+) -> Transcript:
+    """
+    Transcribe decoded 16 kHz audio. With a `chunk_executor` the audio is
+    split at silences and the chunks are decoded concurrently, then stitched
+    back in order with their timestamps shifted by the chunk offset.
+
+    `on_segment` sees every segment in timeline order: as it is decoded for
+    a single chunk, or chunk by chunk once earlier chunks have finished.
+    """
+    chunks = [(0, len(audio))]
+    if chunk_executor is not None:
+        chunks = plan_chunks(audio)
+
+    if len(chunks) == 1:
+        segments = _decode_segments(
+            model, audio, 0.0, cancel_event, word_timestamps, on_segment
+        )
+    else:
+        futures = [
+            chunk_executor.submit(
+                _decode_segments,
+                model,
+                audio[start:end],
+                start / SAMPLING_RATE,
+                cancel_event,
+                word_timestamps,
+            )
+            for start, end in chunks
+        ]
+        segments = []
+        try:
+            for future in futures:
+                chunk_segments = future.result()
+                segments.extend(chunk_segments)
+                if on_segment is not None:
+                    for segment in chunk_segments:
+                        on_segment(segment)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    duration_sec: Optional[int] = None
+    if len(audio):
+        duration_sec = int(len(audio) / SAMPLING_RATE)
+    return Transcript(
+        text=" ".join(segment.text for segment in segments if segment.text),
+        duration_sec=duration_sec,
+        segments=segments,
+    )
+
+
+def transcribe_file(
+    audio_path: str,
+    cancel_event: Optional[threading.Event] = None,
+    spec: Optional[ModelSpec] = None,
+    word_timestamps: bool = False,
+    on_segment: Optional[SegmentCallback] = None,
+) -> Transcript:
+    """
+    Blocking transcription of a stored file. Runs inside a pool worker.
+    """
+    started = time.perf_counter()
+    audio = decode_audio(audio_path, sampling_rate=SAMPLING_RATE)
+    decoded = time.perf_counter()
+    chunk_executor = None
+    if CHUNK_WORKERS > 1 and len(audio) >= CHUNK_MIN_SEC * SAMPLING_RATE:
+        chunk_executor = _get_chunk_executor()
+    model = registry.get(spec or ModelSpec())
+    loaded = time.perf_counter()
+    transcript = transcribe_audio(
+        model,
+        audio,
+        cancel_event=cancel_event,
+        chunk_executor=chunk_executor,
+        word_timestamps=word_timestamps,
+        on_segment=on_segment,
+    )
+    transcript.timings = {
+        "decode": decoded - started,
+        "model_load": loaded - decoded,
+        "transcribe": time.perf_counter() - loaded,
+    }
+    return transcript
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if POOL_KIND == "process":
+                    _executor = ProcessPoolExecutor(
+                        max_workers=POOL_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=preload_models,
+                    )
+                else:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=POOL_WORKERS,
+                        thread_name_prefix="whisper",
+                    )
+    return _executor
+
+
+def queue_depth() -> int:
+    """
+    Number of transcriptions currently running or waiting for a worker.
+    """
+    return _in_flight
+
+
+def shutdown() -> None:
+    global _executor, _chunk_executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _chunk_executor is not None:
+            _chunk_executor.shutdown(wait=False, cancel_futures=True)
+            _chunk_executor = None
+
+
+def _abort(future: Future, cancel_event: Optional[threading.Event]) -> None:
+    # Queued jobs are dropped outright; a running thread job stops at the next
+    # segment. Running process jobs cannot be interrupted and finish unobserved.
+    future.cancel()
+    if cancel_event is not None:
+        cancel_event.set()
+
+
+async def transcribe(
+    audio_path: Path,
+    *,
+    spec: Optional[ModelSpec] = None,
+    word_timestamps: bool = False,
+    on_segment: Optional[SegmentCallback] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    timeout_sec: Optional[float] = None,
+) -> Transcript:
+    """
+    Run `transcribe_file` in the worker pool without blocking the event loop.
+
+    `on_segment` is called on the event loop for each decoded segment. The
+    process pool cannot call back across processes, so there it receives
+    all segments once the transcription has finished.
+
+    Raises `TranscriptionQueueFull` when the pool and its queue are saturated,
+    `TranscriptionTimeout` after `timeout_sec`, and `TranscriptionCancelled`
+    when `is_disconnected` reports that the client went away.
+    """
+    global _in_flight
+    if _in_flight >= POOL_WORKERS + MAX_QUEUE_DEPTH:
+        raise TranscriptionQueueFull(
+            f"Transcription queue is full ({_in_flight} jobs in flight)."
+        )
+
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        in_process = POOL_KIND == "process"
+        cancel_event = None if in_process else threading.Event()
+
+        def _forward(segment: Segment) -> None:
+            loop.call_soon_threadsafe(on_segment, segment)
+
+        # Process workers cannot call back into this loop.
+        forward = _forward if on_segment is not None and not in_process else None
+
+        future = _get_executor().submit(
+            transcribe_file,
+            str(audio_path),
+            cancel_event,
+            spec,
+            word_timestamps,
+            forward,
+        )
+        wrapped = asyncio.wrap_future(future)
+        # Abandoned jobs still finish (or raise) in the worker; swallow that.
+        wrapped.add_done_callback(lambda f: f.cancelled() or f.exception())
+        timeout = timeout_sec or JOB_TIMEOUT_SEC
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    _abort(future, cancel_event)
+                    raise TranscriptionTimeout(f"Transcription exceeded {timeout:g}s.")
+                done, _ = await asyncio.wait(
+                    {wrapped}, timeout=min(DISCONNECT_POLL_SEC, remaining)
+                )
+                if done:
+                    transcript = wrapped.result()
+                    metrics.observe_transcription(
+                        transcript.timings, transcript.duration_sec, loop.time() - started
+                    )
+                    if on_segment is not None and in_process:
+                        for segment in transcript.segments:
+                            on_segment(segment)
+                    return transcript
+                if is_disconnected is not None and await is_disconnected():
+                    _abort(future, cancel_event)
+                    raise TranscriptionCancelled("Client disconnected.")
+        except asyncio.CancelledError:
+            _abort(future, cancel_event)
+            raise
+    finally:
+        _in_flight -= 1
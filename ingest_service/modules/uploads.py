@@ -0,0 +1,93 @@
+"""
+Streaming helpers that persist uploads to disk in fixed-size chunks.
+"""
+
+from __future__ import annotations
+
+import codecs
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("INGEST_MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    code = "UPLOAD_TOO_LARGE"
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit.")
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    size_bytes: int
+    sha256: str
+
+
+def copy_stream(
+    source: BinaryIO, dest_path: Path, *, max_bytes: Optional[int] = MAX_UPLOAD_BYTES
+) -> StoredUpload:
+    """
+    Copy `source` to `dest_path` chunk by chunk while hashing it.
+
+    The partial file is removed when the size limit is hit or the copy fails.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with dest_path.open("wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        dest_path.unlink(missing_ok=True)
+        raise
+    return StoredUpload(path=dest_path, size_bytes=size, sha256=digest.hexdigest())
+
+
+async def save_upload(
+    upload_file: UploadFile,
+    dest_path: Path,
+    *,
+    max_bytes: Optional[int] = MAX_UPLOAD_BYTES,
+) -> StoredUpload:
+    """
+    Stream an `UploadFile` to `dest_path` without holding it in memory.
+    """
+    if max_bytes and upload_file.size is not None and upload_file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    await upload_file.seek(0)
+    return await run_in_threadpool(
+        copy_stream, upload_file.file, dest_path, max_bytes=max_bytes
+    )
+
+
+def read_text(path: Path, *, errors: str = "strict") -> str:
+    """
+    Decode a UTF-8 file chunk by chunk. With `errors="strict"` binary files
+    fail on the first invalid chunk instead of after reading everything.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors=errors)
+    parts = []
+    with path.open("rb") as handle:
+        while True:
+            chunk = handle.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
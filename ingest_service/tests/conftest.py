@@ -0,0 +1,36 @@
+"""
+Shared fixtures. The suite runs against an embedded SQLite database in a
+temporary `INGEST_DATA_DIR`; `modules.db` reads both settings on import,
+so they are set before any test module imports the service.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+os.environ.pop("DATABASE_URL", None)
+os.environ["INGEST_DATA_DIR"] = tempfile.mkdtemp(prefix="ingest-tests-")
+os.environ["WHISPER_PRELOAD_MODELS"] = ""
+
+
+@pytest.fixture
+def db():
+    """
+    A session on freshly created tables, dropped again after the test.
+    """
+    from modules import models_db  # noqa: F401  (registers the tables)
+    from sqlalchemy import text
+
+    from modules.db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        with engine.begin() as connection:
+            # Created by DDL next to `search_document`, not by the metadata.
+            connection.execute(text("DROP TABLE IF EXISTS search_document_fts"))
@@ -0,0 +1,193 @@
+import asyncio
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import update
+
+from modules import audio_jobs, transcription
+from modules.audio_module import _finish_job, _keep_lease
+from modules.model_registry import ModelSpec
+from modules.models_db import AudioJob, AudioRecording, Blob
+
+
+def _enqueue(db, *, sha256=None, age_sec=0):
+    job = audio_jobs.enqueue(
+        db,
+        job_id=uuid.uuid4(),
+        audio_path=Path("/tmp/recording.wav"),
+        content_sha256=sha256,
+        teacher_id=None,
+        workshop_id=None,
+        spec=ModelSpec(),
+    )
+    # Make the queue order explicit rather than relying on clock resolution.
+    db.execute(
+        update(AudioJob)
+        .where(AudioJob.id == job.id)
+        .values(created_at=audio_jobs._now() - timedelta(seconds=age_sec))
+    )
+    db.commit()
+    return job.id
+
+
+def _expire_lease(db, job_id):
+    db.execute(
+        update(AudioJob)
+        .where(AudioJob.id == job_id)
+        .values(lease_expires_at=audio_jobs._now() - timedelta(seconds=1))
+    )
+    db.commit()
+
+
+def test_claims_oldest_job_once(db):
+    newer = _enqueue(db, age_sec=0)
+    older = _enqueue(db, age_sec=10)
+
+    first = audio_jobs.claim_next(db, "worker-a")
+    second = audio_jobs.claim_next(db, "worker-b")
+
+    assert (first.id, first.attempts) == (older, 1)
+    assert (second.id, second.attempts) == (newer, 1)
+    assert audio_jobs.claim_next(db, "worker-c") is None
+    assert audio_jobs.count_active(db) == {"queued": 0, "running": 2}
+
+
+def test_expired_lease_is_claimed_again(db):
+    job_id = _enqueue(db)
+    audio_jobs.claim_next(db, "worker-a")
+    assert audio_jobs.claim_next(db, "worker-b") is None
+
+    _expire_lease(db, job_id)
+    reclaimed = audio_jobs.claim_next(db, "worker-b")
+
+    assert (reclaimed.id, reclaimed.attempts) == (job_id, 2)
+    # The first worker lost the job and can no longer extend it.
+    assert not audio_jobs.renew_lease(db, job_id, "worker-a")
+    assert audio_jobs.renew_lease(db, job_id, "worker-b")
+
+
+def test_renewed_lease_keeps_the_job(db):
+    job_id = _enqueue(db)
+    audio_jobs.claim_next(db, "worker-a")
+    _expire_lease(db, job_id)
+
+    assert audio_jobs.renew_lease(db, job_id, "worker-a")
+    assert audio_jobs.claim_next(db, "worker-b") is None
+
+
+def test_release_does_not_count_the_attempt(db):
+    job_id = _enqueue(db)
+    audio_jobs.claim_next(db, "worker-a")
+
+    audio_jobs.release(db, job_id, "worker-a")
+    again = audio_jobs.claim_next(db, "worker-b")
+
+    assert (again.id, again.attempts) == (job_id, 1)
+
+
+def test_exhausted_job_fails_and_releases_its_blob(db, monkeypatch):
+    monkeypatch.setattr(audio_jobs, "MAX_ATTEMPTS", 2)
+    db.add(Blob(sha256="ab" * 32, size_bytes=10, ref_count=1))
+    db.commit()
+    job_id = _enqueue(db, sha256="ab" * 32)
+
+    for worker in ("worker-a", "worker-b"):
+        assert audio_jobs.claim_next(db, worker).id == job_id
+        _expire_lease(db, job_id)
+    assert audio_jobs.claim_next(db, "worker-c") is None
+
+    assert audio_jobs.fail_exhausted(db) == 1
+    assert audio_jobs.fail_exhausted(db) == 0
+    job = db.get(AudioJob, job_id)
+    assert (job.status, job.error_code, job.attempts) == ("failed", "AUDIO_JOB_ABANDONED", 2)
+    assert db.get(Blob, "ab" * 32).ref_count == 0
+
+
+def test_mark_failed_releases_the_blob_once(db):
+    db.add(Blob(sha256="cd" * 32, size_bytes=10, ref_count=1))
+    db.commit()
+    job_id = _enqueue(db, sha256="cd" * 32)
+    audio_jobs.claim_next(db, "worker-a")
+
+    assert audio_jobs.mark_failed(
+        db, job_id, "worker-a", code="AUDIO_TRANSCRIBE_ERROR", message="boom"
+    )
+    assert not audio_jobs.mark_failed(
+        db, job_id, "worker-a", code="AUDIO_TRANSCRIBE_ERROR", message="boom"
+    )
+
+    assert db.get(Blob, "cd" * 32).ref_count == 0
+    assert audio_jobs.count_active(db) == {"queued": 0, "running": 0}
+
+
+@pytest.mark.parametrize("status", [audio_jobs.STATUS_DONE, audio_jobs.STATUS_FAILED])
+def test_finished_jobs_are_never_claimed(db, status):
+    job_id = _enqueue(db)
+    db.execute(update(AudioJob).where(AudioJob.id == job_id).values(status=status))
+    db.commit()
+
+    assert audio_jobs.claim_next(db, "worker-a") is None
+
+
+def _transcript(text):
+    return transcription.Transcript(
+        text=text,
+        duration_sec=2,
+        segments=[transcription.Segment(start=0.0, end=2.0, text=text)],
+    )
+
+
+def _claim_twice(db, sha256):
+    db.add(Blob(sha256=sha256, size_bytes=10, ref_count=1))
+    db.commit()
+    job_id = _enqueue(db, sha256=sha256)
+    stale = audio_jobs.claim_next(db, "worker-a")
+    _expire_lease(db, job_id)
+    current = audio_jobs.claim_next(db, "worker-b")
+    assert stale.id == current.id == job_id
+    return stale, current
+
+
+@pytest.mark.parametrize("stale_first", [False, True])
+def test_only_the_current_worker_finishes_a_reclaimed_job(db, stale_first):
+    sha256 = "12" * 32
+    stale, current = _claim_twice(db, sha256)
+    spec = ModelSpec()
+
+    finishers = [(stale, "stale"), (current, "current")]
+    for job, text in reversed(finishers) if not stale_first else finishers:
+        _finish_job(db, job, spec, _transcript(text), False)
+
+    job = db.get(AudioJob, current.id)
+    assert (job.status, job.worker_id, job.error_code) == ("done", "worker-b", None)
+    assert db.get(AudioRecording, current.id).transcript_text == "current"
+    # The stored recording keeps the blob's reference.
+    assert db.get(Blob, sha256).ref_count == 1
+
+
+def test_stale_worker_cannot_fail_or_requeue_a_reclaimed_job(db):
+    sha256 = "34" * 32
+    stale, current = _claim_twice(db, sha256)
+
+    assert not audio_jobs.mark_failed(
+        db, stale.id, "worker-a", code="AUDIO_TRANSCRIBE_ERROR", message="late"
+    )
+    audio_jobs.release(db, stale.id, "worker-a")
+
+    job = db.get(AudioJob, current.id)
+    assert (job.status, job.worker_id, job.attempts) == ("running", "worker-b", 2)
+    assert db.get(Blob, sha256).ref_count == 1
+
+
+def test_heartbeat_stops_once_the_lease_is_lost(db, monkeypatch):
+    stale, _ = _claim_twice(db, "56" * 32)
+    monkeypatch.setattr(audio_jobs, "LEASE_SEC", 0.03)
+    lost = asyncio.Event()
+
+    async def run():
+        await asyncio.wait_for(_keep_lease(stale.id, stale.worker_id, lost), timeout=5)
+
+    asyncio.run(run())
+    assert lost.is_set()
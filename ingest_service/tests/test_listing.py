@@ -0,0 +1,138 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from modules import listing
+from modules.db import AsyncSessionLocal, async_engine
+from modules.models_db import RawDocument, SurveyResponse
+
+START = datetime(2024, 9, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def _list_all(entity, *, limit, **filters):
+    """
+    Follow `next_cursor` to the end; returns the pages.
+    """
+
+    async def run():
+        pages = []
+        try:
+            async with AsyncSessionLocal() as session:
+                cursor = None
+                while True:
+                    page = await listing.list_rows(
+                        session, entity, cursor=cursor, limit=limit, **filters
+                    )
+                    pages.append(page)
+                    cursor = page.next_cursor
+                    if cursor is None:
+                        return pages
+        finally:
+            # Each test gets its own event loop; don't keep connections
+            # bound to this one.
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def surveys(db):
+    # Ties on submitted_at and rows without a time exercise both parts of
+    # the (time, id) key.
+    times = [START, START, START + timedelta(hours=1), None, START - timedelta(days=1), None]
+    times += [START + timedelta(minutes=minute) for minute in range(7)]
+    rows = [
+        SurveyResponse(
+            workshop_id=index % 2,
+            submitted_at=submitted_at,
+            raw_data={"index": index},
+            normalized_data={},
+        )
+        for index, submitted_at in enumerate(times)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return [(row.id, row.submitted_at) for row in rows]
+
+
+def _expected_order(rows):
+    timed = sorted((row for row in rows if row[1] is not None), key=lambda row: (row[1], row[0]))
+    untimed = sorted((row for row in rows if row[1] is None), key=lambda row: row[0])
+    return [row_id for row_id, _ in reversed(timed)] + [row_id for row_id, _ in reversed(untimed)]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5, 50])
+def test_pages_cover_every_row_once_in_order(surveys, limit):
+    pages = _list_all(listing.ENTITY_SURVEY, limit=limit)
+
+    ids = [item["id"] for page in pages for item in page.items]
+    assert ids == _expected_order(surveys)
+    assert all(len(page.items) == limit for page in pages[:-1])
+
+
+def test_filters_apply_on_every_page(surveys):
+    pages = _list_all(
+        listing.ENTITY_SURVEY,
+        limit=2,
+        workshop_id=0,
+        since=START,
+        until=START + timedelta(minutes=5),
+    )
+
+    # Stored times come back naive (UTC) from SQLite.
+    since, until = START.replace(tzinfo=None), (START + timedelta(minutes=5)).replace(tzinfo=None)
+    matching = {
+        row_id
+        for index, (row_id, submitted_at) in enumerate(surveys)
+        if index % 2 == 0 and submitted_at is not None and since <= submitted_at < until
+    }
+    expected = [row_id for row_id in _expected_order(surveys) if row_id in matching]
+    assert expected
+    assert [item["id"] for page in pages for item in page.items] == expected
+
+
+def test_heavy_fields_only_when_requested(surveys):
+    (default,) = _list_all(listing.ENTITY_SURVEY, limit=50)
+    (chosen,) = _list_all(listing.ENTITY_SURVEY, limit=50, fields=["raw_data"])
+
+    assert "raw_data" not in default.items[0]
+    # The cursor key columns are always included.
+    assert chosen.fields == ["id", "submitted_at", "raw_data"]
+    assert {item["raw_data"]["index"] for item in chosen.items} == set(range(len(surveys)))
+
+
+def test_uuid_keys_round_trip(db):
+    documents = [
+        RawDocument(
+            id=uuid.uuid4(),
+            uploaded_at=START,
+            original_filename=f"doc{index}.txt",
+            file_path=f"/tmp/doc{index}.txt",
+        )
+        for index in range(5)
+    ]
+    db.add_all(documents)
+    db.commit()
+
+    pages = _list_all(listing.ENTITY_RAW, limit=2)
+
+    ids = [item["id"] for page in pages for item in page.items]
+    assert ids == sorted((document.id for document in documents), reverse=True)
+
+
+def test_cursor_encoding_round_trips():
+    survey = listing.LISTINGS[listing.ENTITY_SURVEY]
+    raw = listing.LISTINGS[listing.ENTITY_RAW]
+    row_id = uuid.uuid4()
+
+    assert listing.decode_cursor(listing.encode_cursor(START, 42), survey) == (START, 42)
+    assert listing.decode_cursor(listing.encode_cursor(None, 7), survey) == (None, 7)
+    assert listing.decode_cursor(listing.encode_cursor(START, row_id), raw) == (START, row_id)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", listing.encode_cursor(START, "x")])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(listing.ListQueryError):
+        listing.decode_cursor(cursor, listing.LISTINGS[listing.ENTITY_SURVEY])
@@ -0,0 +1,98 @@
+import csv
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from modules.models_db import SurveyResponse
+from modules.survey_module import process_survey_file
+
+# "Score" is a genuine float column; "Pupils" is an int column whose
+# blanks fall in different chunks depending on the chunk size.
+ROWS = [
+    ["2024-09-01 08:00:00", "Jana Nováková", "jana@school.example", 3.5, 12, "ok"],
+    ["2024-09-02 08:00:00", "Petr Svoboda", "petr@school.example", 3.0, 9, ""],
+    ["2024-09-03 08:00:00", "Eva Dvořák", "eva@school.example", 4.0, "", "late"],
+    ["2024-09-04 08:00:00", "Tomáš Černá", "tomas@school.example", "", 15, "ok"],
+    ["2024-09-05 08:00:00", "Lucie Kučera", "lucie@school.example", 2.0, 7, "ok"],
+]
+HEADER = ["Timestamp", "Teacher name", "Email", "Score", "Pupils", "Comment"]
+
+
+def _per_row_raw_data(path):
+    """
+    `raw_data` as the per-row code built it from one whole-file read.
+    """
+    df = pd.read_csv(path)
+    records = []
+    for _, row in df.iterrows():
+        record = {}
+        for key, value in row.items():
+            if pd.isna(value):
+                record[key] = None
+            elif isinstance(value, np.generic):
+                record[key] = value.item()
+            else:
+                record[key] = value
+        records.append(record)
+    return records
+
+
+def _write(path, rows):
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def _ingest(db, path, chunk_rows):
+    result = process_survey_file(
+        file_path=path, filename=path.name, workshop_id=1, db=db, chunk_rows=chunk_rows
+    )
+    assert result.inserted_rows == len(ROWS)
+    return list(db.execute(select(SurveyResponse.raw_data).order_by(SurveyResponse.id)).scalars())
+
+
+def _types(records, column):
+    return [type(record[column]) for record in records]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_float_columns_keep_integral_floats(db, tmp_path, chunk_rows):
+    path = tmp_path / "survey.csv"
+    _write(path, ROWS)
+
+    stored = _ingest(db, path, chunk_rows)
+
+    assert [record["Score"] for record in stored] == [3.5, 3.0, 4.0, None, 2.0]
+    assert _types(stored, "Score") == [float, float, float, type(None), float]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_blank_in_first_chunk_matches_a_whole_file_read(db, tmp_path, chunk_rows):
+    # The first chunk types "Pupils" as float; later chunks follow it.
+    path = tmp_path / "survey.csv"
+    _write(path, ROWS[2:] + ROWS[:2])
+
+    stored = _ingest(db, path, chunk_rows)
+    expected = _per_row_raw_data(path)
+
+    assert stored == expected
+    for column in HEADER:
+        assert _types(stored, column) == _types(expected, column)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2])
+def test_later_blank_keeps_the_first_chunks_int_type(db, tmp_path, chunk_rows):
+    # A whole-file read would make all of "Pupils" float because of the
+    # blank in row 3; streaming cannot know that yet, so it keeps the ints
+    # of the first chunk and the blank becomes None.
+    path = tmp_path / "survey.csv"
+    _write(path, ROWS)
+
+    stored = _ingest(db, path, chunk_rows)
+
+    assert stored == _per_row_raw_data(path)
+    assert [record["Pupils"] for record in stored] == [12, 9, None, 15, 7]
+    assert _types(stored, "Pupils") == [int, int, type(None), int, int]
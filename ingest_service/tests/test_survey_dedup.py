@@ -0,0 +1,114 @@
+import csv
+import sqlite3
+
+import numpy as np
+from sqlalchemy import func, select
+
+from modules.db import engine
+from modules.models_db import SurveyResponse, Teacher
+from modules.survey_module import _row_fingerprint, process_survey_file
+
+
+def _write_survey(path, scores):
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["Timestamp", "Teacher name", "Email", "Score"])
+        for index, score in enumerate(scores):
+            writer.writerow(
+                [
+                    f"2024-09-{index + 1:02d} 08:00:00",
+                    f"Teacher {index}",
+                    f"teacher{index}@school.example",
+                    score,
+                ]
+            )
+
+
+def test_fingerprint_ignores_how_pandas_typed_the_value():
+    expected = _row_fingerprint({"Score": 3, "Comment": None, "Nested": {"a": [1, 2]}}, 1)
+
+    as_float = {"Score": 3.0, "Comment": None, "Nested": {"a": [1, 2]}}
+    as_numpy = {"Score": np.int64(3), "Comment": np.nan, "Nested": {"a": [1.0, np.int64(2)]}}
+    other = {"Score": 3.5, "Comment": None, "Nested": {"a": [1, 2]}}
+    assert _row_fingerprint(as_float, 1) == expected
+    assert _row_fingerprint(as_numpy, 1) == expected
+    assert _row_fingerprint(other, 1) != expected
+
+
+def test_fingerprint_is_scoped_to_the_workshop():
+    row = {"Score": 3}
+
+    assert _row_fingerprint(row, 1) != _row_fingerprint(row, 2)
+    assert _row_fingerprint(row, None) != _row_fingerprint(row, 1)
+
+
+def test_reingest_skips_every_row_as_duplicate(db, tmp_path):
+    path = tmp_path / "survey.csv"
+    _write_survey(path, [4, 5, "", 3, 2, 1])
+
+    first = process_survey_file(file_path=path, filename=path.name, workshop_id=1, db=db)
+    second = process_survey_file(file_path=path, filename=path.name, workshop_id=1, db=db)
+
+    assert first.success and first.inserted_rows == 6 and first.duplicate_rows == 0
+    assert second.inserted_rows == 0
+    assert second.duplicate_rows == 6
+
+
+def test_reingest_with_other_chunk_size_matches_the_same_rows(db, tmp_path):
+    # With one row per chunk, "Score" is an int column except in the chunk
+    # holding the blank, where pandas reads it as float; in one big chunk it
+    # is float throughout. Both must produce the same fingerprints.
+    path = tmp_path / "survey.csv"
+    _write_survey(path, [4, 5, "", 3, 2, 1])
+
+    first = process_survey_file(
+        file_path=path, filename=path.name, workshop_id=1, db=db, chunk_rows=1, batch_size=2
+    )
+    second = process_survey_file(
+        file_path=path, filename=path.name, workshop_id=1, db=db, chunk_rows=100
+    )
+
+    assert first.inserted_rows == 6
+    assert second.inserted_rows == 0
+    assert second.duplicate_rows == 6
+
+
+def test_repeated_rows_in_one_file_are_stored_once(db, tmp_path):
+    path = tmp_path / "survey.csv"
+    _write_survey(path, [4, 5])
+    lines = path.read_text(encoding="utf-8").splitlines()
+    path.write_text("\n".join(lines + lines[1:]) + "\n", encoding="utf-8")
+
+    result = process_survey_file(file_path=path, filename=path.name, workshop_id=1, db=db)
+
+    assert result.inserted_rows == 2
+    assert result.duplicate_rows == 2
+
+
+def test_failed_batch_commit_is_retried_row_by_row(db, tmp_path, monkeypatch):
+    path = tmp_path / "survey.csv"
+    _write_survey(path, [4, 5, 3])
+    commits = []
+    do_commit = engine.dialect.do_commit
+
+    def fail_batch_commit(dbapi_connection):
+        # The first commit stores the new teachers; the second one, the
+        # rows, loses the transaction as when the connection drops.
+        commits.append(dbapi_connection)
+        if len(commits) == 2:
+            dbapi_connection.rollback()
+            raise sqlite3.OperationalError("disk I/O error")
+        do_commit(dbapi_connection)
+
+    monkeypatch.setattr(engine.dialect, "do_commit", fail_batch_commit)
+    result = process_survey_file(file_path=path, filename=path.name, workshop_id=1, db=db)
+    monkeypatch.undo()
+
+    assert len(commits) > 2
+    assert result.errors == []
+    # Where the savepoint release already made the rows durable (pysqlite
+    # opens no transaction before a SAVEPOINT) the retry finds them stored.
+    assert result.inserted_rows + result.duplicate_rows == 3
+    assert db.scalar(select(func.count()).select_from(SurveyResponse)) == 3
+    orphans = select(func.count()).where(SurveyResponse.teacher_id.not_in(select(Teacher.id)))
+    assert db.scalar(orphans) == 0
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from modules.table_readers import ColumnTypes, iter_xlsx
+from modules.table_store import extract_tables
+
+# The third data row is wider than the header.
+ROWS = [
+    ["name", "pupils"],
+    ["Praha", 12],
+    ["Brno", 8],
+    ["Zlín", 5, "late note", None, 7],
+    ["Olomouc", 9],
+]
+
+
+def _write_xlsx(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_rows_wider_than_the_header_keep_their_cells(tmp_path, chunk_rows):
+    path = _write_xlsx(tmp_path / "wide.xlsx", ROWS)
+    expected = pd.read_excel(path, engine="openpyxl")
+
+    frames = list(iter_xlsx(path, chunk_rows))
+    combined = pd.concat(frames)
+
+    assert list(combined.columns) == list(expected.columns)
+    assert list(expected.columns) == ["name", "pupils", "Unnamed: 2", "Unnamed: 3", "Unnamed: 4"]
+    pd.testing.assert_frame_equal(combined, expected, check_dtype=False)
+
+
+def test_wide_rows_reach_jsonb_records(tmp_path):
+    path = _write_xlsx(tmp_path / "wide.xlsx", ROWS)
+
+    result = extract_tables(path, ".xlsx", tmp_path / "sidecar", storage="jsonb", chunk_rows=2)
+
+    late = result.table_data[2]
+    assert (late["Unnamed: 2"], late["Unnamed: 4"]) == ("late note", 7)
+    assert result.warnings == []
+
+
+def test_wide_rows_after_the_parquet_sample_are_reported(tmp_path):
+    path = _write_xlsx(tmp_path / "wide.xlsx", ROWS)
+
+    result = extract_tables(path, ".xlsx", tmp_path / "sidecar", storage="parquet", chunk_rows=2)
+
+    assert [warning.code for warning in result.warnings] == ["RAW_TABLE_EXTRA_COLUMNS"]
+    assert "Unnamed: 4" in result.warnings[0].message
+
+
+def test_column_types_follow_the_first_chunk():
+    types = ColumnTypes()
+    first = types.conform(
+        pd.DataFrame({"pupils": [12, 9], "score": [3.5, np.nan], "ratio": [0.5, 1.0]})
+    )
+    later = types.conform(
+        pd.DataFrame({"pupils": [np.nan, 15.0], "score": [3, 4], "ratio": [2.0, 3.0]})
+    )
+
+    assert first["pupils"].tolist() == [12, 9]
+    assert later["pupils"].tolist() == [None, 15]
+    assert [type(value) for value in later["pupils"]] == [type(None), int]
+    assert later["score"].dtype.kind == "f"
+    # Genuine float columns are left alone.
+    assert later["ratio"].tolist() == [2.0, 3.0] and later["ratio"].dtype.kind == "f"
+
+
+def test_jsonb_records_keep_float_columns_and_int_columns(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("id,score,pupils\n1,3.5,12\n2,3.0,9\n3,4.0,\n4,,15\n", encoding="utf-8")
+
+    result = extract_tables(path, ".csv", tmp_path / "sidecar", storage="jsonb", chunk_rows=2)
+
+    assert result.table_data == [
+        {"id": 1, "score": 3.5, "pupils": 12},
+        {"id": 2, "score": 3.0, "pupils": 9},
+        {"id": 3, "score": 4.0, "pupils": None},
+        {"id": 4, "score": None, "pupils": 15},
+    ]
+    assert [type(record["score"]) for record in result.table_data[:3]] == [float] * 3
+    assert [type(record["pupils"]) for record in result.table_data] == [int, int, type(None), int]
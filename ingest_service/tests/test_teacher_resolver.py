@@ -0,0 +1,53 @@
+import sqlite3
+
+from sqlalchemy import func, insert, select
+
+from modules.db import engine
+from modules.models_db import Teacher
+from modules.teacher_resolver import TeacherResolver
+
+KEY = ("jana novakova", "jana@school.example", "Jana Nováková")
+
+
+def _open_write_transaction(db):
+    # pysqlite only begins a transaction at the first write; without one the
+    # resolver's savepoint would commit on release by itself.
+    db.execute(insert(Teacher).values(full_name="Someone Else", email="else@school.example"))
+
+
+def test_created_teachers_survive_a_rollback_of_the_caller(db):
+    resolver = TeacherResolver(db, fuzzy=False)
+    _open_write_transaction(db)
+
+    (created,) = resolver.resolve_many([KEY])
+    db.rollback()
+    (again,) = resolver.resolve_many([KEY])
+
+    assert created.error is None
+    assert again.teacher_id == created.teacher_id
+    assert db.get(Teacher, created.teacher_id).email == "jana@school.example"
+
+
+def test_teachers_whose_commit_failed_are_created_again(db, monkeypatch):
+    resolver = TeacherResolver(db, fuzzy=False)
+    _open_write_transaction(db)
+    do_commit = engine.dialect.do_commit
+    failures = []
+
+    def fail_first_commit(dbapi_connection):
+        if not failures:
+            failures.append(dbapi_connection)
+            dbapi_connection.rollback()
+            raise sqlite3.OperationalError("disk I/O error")
+        do_commit(dbapi_connection)
+
+    monkeypatch.setattr(engine.dialect, "do_commit", fail_first_commit)
+    (failed,) = resolver.resolve_many([KEY])
+    monkeypatch.undo()
+    (created,) = resolver.resolve_many([KEY])
+
+    assert failed.teacher_id is None
+    assert failed.error.code == "TEACHER_CREATE_ERROR"
+    assert created.error is None
+    assert db.get(Teacher, created.teacher_id).email == "jana@school.example"
+    assert db.scalar(select(func.count()).select_from(Teacher)) == 1
@@ -0,0 +1,136 @@
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from modules import transcript_cache, transcription
+from modules.model_registry import ModelSpec
+from modules.models_db import AudioRecording, TranscriptCacheEntry, TranscriptSegment
+
+SHA = "ef" * 32
+
+
+def _cached_recording(db, *, spec=None, word_timestamps=False, sha256=SHA):
+    recording = AudioRecording(
+        id=uuid.uuid4(),
+        audio_path="/tmp/recording.wav",
+        transcript_text="dobrý den třído",
+        duration_sec=4,
+        content_sha256=sha256,
+    )
+    db.add(recording)
+    db.add_all(
+        [
+            TranscriptSegment(
+                audio_id=recording.id, seq=1, start_sec=2.0, end_sec=4.0, text="třído"
+            ),
+            TranscriptSegment(
+                audio_id=recording.id, seq=0, start_sec=0.0, end_sec=2.0, text="dobrý den"
+            ),
+        ]
+    )
+    transcript_cache.record(
+        db,
+        content_sha256=sha256,
+        audio_id=recording.id,
+        hit=False,
+        spec=spec,
+        word_timestamps=word_timestamps,
+    )
+    db.commit()
+    return recording.id
+
+
+def _cached_keys(db):
+    return set(db.execute(select(TranscriptCacheEntry.cache_key)).scalars())
+
+
+def test_key_changes_with_everything_that_shapes_the_transcript(monkeypatch):
+    language = transcription.LANGUAGE
+    base = transcript_cache.cache_key(SHA, ModelSpec("tiny", "int8"))
+    variants = [
+        transcript_cache.cache_key("00" * 32, ModelSpec("tiny", "int8")),
+        transcript_cache.cache_key(SHA, ModelSpec("base", "int8")),
+        transcript_cache.cache_key(SHA, ModelSpec("tiny", "float32")),
+        transcript_cache.cache_key(SHA, ModelSpec("tiny", "int8"), word_timestamps=True),
+    ]
+    monkeypatch.setattr(transcription, "LANGUAGE", "xx")
+    variants.append(transcript_cache.cache_key(SHA, ModelSpec("tiny", "int8")))
+    monkeypatch.setattr(transcription, "LANGUAGE", language)
+    monkeypatch.setattr(transcript_cache, "CACHE_VERSION", f"{transcript_cache.CACHE_VERSION}-new")
+    variants.append(transcript_cache.cache_key(SHA, ModelSpec("tiny", "int8")))
+
+    assert len({base, *variants}) == len(variants) + 1
+
+
+def test_lookup_returns_segments_for_the_same_settings_only(db, monkeypatch):
+    spec = ModelSpec("tiny", "int8")
+    _cached_recording(db, spec=spec)
+
+    hit = transcript_cache.lookup(db, SHA, spec)
+    assert hit.text == "dobrý den třído"
+    assert [segment.text for segment in hit.segments] == ["dobrý den", "třído"]
+
+    assert transcript_cache.lookup(db, SHA, ModelSpec("base", "int8")) is None
+    assert transcript_cache.lookup(db, SHA, spec, word_timestamps=True) is None
+    monkeypatch.setattr(transcript_cache, "CACHE_VERSION", f"{transcript_cache.CACHE_VERSION}-new")
+    assert transcript_cache.lookup(db, SHA, spec) is None
+
+
+def test_lookup_is_skipped_when_disabled(db, monkeypatch):
+    _cached_recording(db)
+    monkeypatch.setattr(transcript_cache, "CACHE_ENABLED", False)
+
+    assert transcript_cache.lookup(db, SHA) is None
+
+
+def test_invalidate_drops_entries_from_other_settings(db, monkeypatch):
+    language, version = transcription.LANGUAGE, transcript_cache.CACHE_VERSION
+    _cached_recording(db, spec=ModelSpec("tiny", "int8"), sha256="01" * 32)
+    _cached_recording(db, spec=ModelSpec("base", "int8"), sha256="02" * 32)
+    monkeypatch.setattr(transcription, "LANGUAGE", "xx")
+    _cached_recording(db, spec=ModelSpec("tiny", "int8"), sha256="03" * 32)
+    monkeypatch.setattr(transcription, "LANGUAGE", language)
+    monkeypatch.setattr(transcript_cache, "CACHE_VERSION", f"{version}-old")
+    _cached_recording(db, spec=ModelSpec("tiny", "int8"), sha256="04" * 32)
+    monkeypatch.setattr(transcript_cache, "CACHE_VERSION", version)
+    # "base" is no longer enabled.
+    monkeypatch.setattr(transcript_cache, "ALLOWED_SIZES", ["tiny"])
+
+    assert transcript_cache.invalidate(db) == 3
+    assert _cached_keys(db) == {transcript_cache.cache_key("01" * 32, ModelSpec("tiny", "int8"))}
+    assert transcript_cache.invalidate(db) == 0
+
+
+def test_invalidate_all_entries(db):
+    _cached_recording(db, sha256="01" * 32)
+    _cached_recording(db, sha256="02" * 32, word_timestamps=True)
+
+    assert transcript_cache.invalidate(db, all_entries=True) == 2
+    assert _cached_keys(db) == set()
+
+
+def test_hits_are_counted_and_least_recent_entries_evicted(db):
+    spec = ModelSpec("tiny", "int8")
+    first = _cached_recording(db, spec=spec, sha256="01" * 32)
+    _cached_recording(db, spec=spec, sha256="02" * 32)
+    transcript_cache.record(db, content_sha256="01" * 32, audio_id=first, hit=True, spec=spec)
+    db.commit()
+
+    entry = db.get(TranscriptCacheEntry, transcript_cache.cache_key("01" * 32, spec))
+    assert entry.hit_count == 1
+
+    transcript_cache.evict(db, max_entries=1)
+    db.commit()
+    assert _cached_keys(db) == {transcript_cache.cache_key("01" * 32, spec)}
+
+
+@pytest.mark.parametrize("sha256", [None, ""])
+def test_uploads_without_a_hash_are_not_cached(db, sha256):
+    recording = AudioRecording(id=uuid.uuid4(), audio_path="/tmp/a.wav", transcript_text="")
+    db.add(recording)
+    transcript_cache.record(db, content_sha256=sha256, audio_id=recording.id, hit=False)
+    db.commit()
+
+    assert _cached_keys(db) == set()
+    assert transcript_cache.lookup(db, sha256) is None